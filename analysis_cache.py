@@ -0,0 +1,164 @@
+# analysis_cache.py
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+# デフォルトの最大キャッシュサイズ（バイト）
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# キャッシュファイルの拡張子
+CACHE_EXTENSION = ".pkl"
+
+
+def content_hash(code):
+    """ソースコードの内容からハッシュ値を計算する"""
+    return hashlib.sha256(code.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class AnalysisCache:
+    """
+    ファイル単位の解析結果をディスクに保存するキャッシュ
+    キーはファイル内容のハッシュと解析器のバージョンから作り、
+    合計サイズが上限を超えたら最も長く使われていないエントリから削除する（LRU）
+    """
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, enabled=True):
+        if cache_dir is None:
+            # 実行ファイルと同じディレクトリのcacheフォルダ（configフォルダの隣）
+            exe_dir = os.path.dirname(os.path.abspath(__file__))
+            cache_dir = os.path.join(exe_dir, "cache")
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.enabled = enabled
+
+        # ヒット/ミスの集計
+        self.hits = 0
+        self.misses = 0
+
+        # LRU順のインデックス {entry_path: size}（初回書き込み時に読み込む）
+        self._index = None
+        self._total_size = 0
+
+    def make_key(self, kind, version, code_hash, *extra):
+        """解析の種類・バージョン・内容ハッシュからキャッシュキーを作る"""
+        key_source = "\0".join([kind, str(version), code_hash] + [str(e) for e in extra])
+        return hashlib.sha256(key_source.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def _entry_path(self, key):
+        """キーに対応するキャッシュファイルのパス"""
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """キャッシュから解析結果を取得する（なければNone）"""
+        if not self.enabled:
+            return None
+
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception as e:
+            # 壊れたエントリは削除してミス扱い
+            print(f"キャッシュ読み込みエラー: {e}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # 最終使用時刻を更新（LRU判定用）
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        if self._index is not None and path in self._index:
+            self._index.move_to_end(path)
+        return value
+
+    def put(self, key, value):
+        """解析結果をキャッシュに保存する"""
+        if not self.enabled:
+            return
+
+        path = self._entry_path(key)
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            entry_dir = os.path.dirname(path)
+            os.makedirs(entry_dir, exist_ok=True)
+
+            # 一時ファイルに書いてから置き換える（書き込み途中のエントリを残さない）
+            fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                self._remove(tmp_path)
+                raise
+        except Exception as e:
+            print(f"キャッシュ書き込みエラー: {e}")
+            return
+
+        self._load_index()
+        old_size = self._index.pop(path, 0)
+        self._index[path] = len(data)
+        self._total_size += len(data) - old_size
+        self._evict()
+
+    def _load_index(self):
+        """キャッシュディレクトリを走査してLRU順のインデックスを作る"""
+        if self._index is not None:
+            return
+
+        entries = []
+        if os.path.isdir(self.cache_dir):
+            for sub in os.scandir(self.cache_dir):
+                if not sub.is_dir():
+                    continue
+                try:
+                    for entry in os.scandir(sub.path):
+                        if entry.name.endswith(CACHE_EXTENSION):
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime, entry.path, stat.st_size))
+                except OSError:
+                    continue
+
+        entries.sort()
+        self._index = OrderedDict((path, size) for _, path, size in entries)
+        self._total_size = sum(size for _, _, size in entries)
+
+    def _evict(self):
+        """合計サイズが上限を超えていれば古いエントリから削除する"""
+        while self._total_size > self.max_size and len(self._index) > 1:
+            path, size = self._index.popitem(last=False)
+            self._total_size -= size
+            self._remove(path)
+
+    def _remove(self, path):
+        """ファイルを削除する（失敗しても無視）"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """キャッシュをすべて削除する"""
+        self._load_index()
+        for path in list(self._index):
+            self._remove(path)
+        self._index.clear()
+        self._total_size = 0
+
+    def reset_stats(self):
+        """ヒット/ミスの集計をリセットする"""
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats_text(self):
+        """ヒット/ミスの集計を表示用の文字列で返す"""
+        return f"キャッシュ ヒット: {self.hits} / ミス: {self.misses}"
@@ -0,0 +1,98 @@
+# analysis_job.py
+
+import queue
+import threading
+import time
+
+# 進捗イベントを送る最短間隔（秒）
+DEFAULT_PROGRESS_INTERVAL = 0.1
+
+
+class AnalysisCancelled(Exception):
+    """解析ジョブがキャンセルされたことを表す例外"""
+    pass
+
+
+def format_eta(seconds):
+    """残り時間を表示用の文字列にする"""
+    if seconds is None:
+        return "残り時間を計算中..."
+    seconds = int(seconds + 0.5)
+    if seconds >= 60:
+        return f"残り約 {seconds // 60}分{seconds % 60:02d}秒"
+    return f"残り約 {seconds}秒"
+
+
+class AnalysisJob:
+    """
+    ワーカースレッドで実行する解析ジョブと、UIスレッドへのイベントの受け渡しを管理するクラス
+    ワーカー側は post / report_progress でイベントを送り、ファイルの区切りごとに
+    check_cancelled を呼ぶ。UI側は get_events で溜まったイベントを取り出す
+    """
+    def __init__(self, progress_interval=DEFAULT_PROGRESS_INTERVAL):
+        self.events = queue.Queue()
+        self.progress_interval = progress_interval
+        self._cancel_event = threading.Event()
+        self.finished = False
+
+        # 進捗の間引きと残り時間の計算用
+        self._last_progress_time = 0.0
+        self._stage = None
+        self._stage_start = 0.0
+        self._stage_first_done = 0  # 段階の最初のイベントで処理済みだったファイル数
+
+    def cancel(self):
+        """ジョブのキャンセルを要求する（次のファイルの区切りで停止する）"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """キャンセルが要求されているか"""
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """キャンセルが要求されていればAnalysisCancelledを送出する"""
+        if self._cancel_event.is_set():
+            raise AnalysisCancelled()
+
+    def post(self, kind, *payload):
+        """UIスレッドにイベントを送る"""
+        self.events.put((kind, payload))
+
+    def report_progress(self, stage, done, total, current=""):
+        """
+        進捗イベントを送る（送信間隔はprogress_intervalで間引く）
+        段階が変わったとき・最後のファイルのときは必ず送る
+        """
+        now = time.monotonic()
+        if stage != self._stage:
+            self._stage = stage
+            self._stage_start = now
+            self._stage_first_done = done
+        elif done < total and now - self._last_progress_time < self.progress_interval:
+            return
+        self._last_progress_time = now
+
+        # 残り時間はこの段階の経過時間と、その間に処理したファイル数から見積もる
+        # （最初のイベントは1つ目のファイルが終わってから届くので、それまでのファイルは経過時間に含まれない。
+        #   段階の最初のイベントでは経過時間がないので計算中とする）
+        eta = None
+        processed = done - self._stage_first_done
+        if processed > 0 and now > self._stage_start:
+            eta = (now - self._stage_start) / processed * (total - done)
+        self.post("progress", {
+            'stage': stage,
+            'done': done,
+            'total': total,
+            'current': current,
+            'eta': eta
+        })
+
+    def get_events(self):
+        """溜まっているイベントをすべて取り出す（待たない）"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
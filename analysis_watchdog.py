@@ -0,0 +1,270 @@
+# analysis_watchdog.py
+
+import collections
+import os
+import signal
+import time
+
+# multiprocessingは読み込みに時間がかかるので、ワーカーを起動するときに読み込む
+
+try:
+    import resource  # Windowsにはないので、その場合はメモリの上限を設定しない
+except ImportError:
+    resource = None
+
+# ファイル1つの解析にかけられる時間（秒）とメモリ（MB）のデフォルト（0なら無制限）
+DEFAULT_FILE_TIMEOUT = 60
+DEFAULT_MEMORY_LIMIT_MB = 2048
+
+# ワーカーの起動と初期化にかけられる時間（秒、ファイル1つの上限の方が長ければそちらを使う）
+# astroidの読み込みはファイル1つの解析より時間がかかることがあり、spawnで起動する環境ではさらに遅い
+STARTUP_TIMEOUT = 30
+
+# 結果を待つ間にキャンセルを確認する間隔（秒）
+POLL_INTERVAL = 0.2
+
+# ワーカーが強制終了されたときのシグナル（メモリ不足でOSに終了させられた場合など）
+_KILL_SIGNAL = getattr(signal, "SIGKILL", None)
+
+
+class TaskSkipped:
+    """上限を超えて中断したタスクの結果（reasonは 'timeout' / 'oom' / 'crash'）"""
+    def __init__(self, reason):
+        self.reason = reason
+
+    def __repr__(self):
+        return f"TaskSkipped({self.reason!r})"
+
+
+def _current_address_space():
+    """このプロセスの現在の仮想メモリ使用量（バイト、取得できなければ0）"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """
+    このプロセスのアドレス空間の上限（RLIMIT_AS）を設定する
+    fork直後は親プロセスの使用量を引き継ぐので、現在の使用量にmemory_limit_mbを足した値にする
+    """
+    if not memory_limit_mb or memory_limit_mb <= 0 or resource is None:
+        return
+    limit = _current_address_space() + int(memory_limit_mb * 1024 * 1024)
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        print(f"メモリ上限の設定に失敗しました: {e}")
+
+
+def _worker_main(conn, memory_limit_mb, initializer):
+    """ワーカープロセスの本体（タスクを1件ずつ受け取って実行し、結果を返す）"""
+    # 中断は親プロセスからの強制終了で行うので、Ctrl+Cは親プロセスに任せる
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _apply_memory_limit(memory_limit_mb)
+    if initializer is not None:
+        try:
+            initializer()
+        except MemoryError:
+            pass
+    # 起動と初期化にかかった時間をタスクの時間に含めないよう、準備ができたことを知らせる
+    try:
+        conn.send(("ready", None))
+    except (EOFError, OSError):
+        return
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        func, task = message
+        try:
+            outcome = ("ok", func(task))
+        except MemoryError:
+            outcome = ("oom", None)
+        except Exception as e:
+            outcome = ("error", str(e))
+
+        try:
+            conn.send(outcome)
+        except MemoryError:
+            # 結果が大きすぎて送れない場合もメモリ不足として扱う
+            conn.send(("oom", None))
+        except (EOFError, OSError):
+            break
+
+
+class _WatchdogWorker:
+    """
+    監視対象のワーカープロセス1つと、その通信用のパイプ
+    readyは起動と初期化が終わったか（それまではタスクの締め切りではなく、起動からの締め切りを数える）
+    """
+    def __init__(self, memory_limit_mb, initializer):
+        import multiprocessing
+        self.ready = False
+        self.started = time.monotonic()
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb, initializer),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        """ワーカーを強制終了する"""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """ワーカーに終了を指示する（応答がなければ強制終了）"""
+        try:
+            self.conn.send(None)
+        except (EOFError, OSError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+
+class WatchdogPool:
+    """
+    ファイル単位の解析を、時間とメモリの上限つきのワーカープロセスで実行するプール
+    上限を超えたタスクのワーカーは強制終了して起動し直し、結果としてTaskSkippedを返すので、
+    1つのファイルが固まったりメモリを使い果たしたりしても残りの解析は続けられる
+    ワーカーは初回使用時に起動し、shutdownまで使い回す（タスクの時間はワーカーの起動と初期化が終わってから計る）
+    """
+    def __init__(self, workers=1, timeout=DEFAULT_FILE_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 initializer=None):
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.initializer = initializer
+        self._idle = []  # タスク待ちのワーカー
+
+    @property
+    def enabled(self):
+        """時間かメモリの上限が設定されているか"""
+        return bool(self.timeout and self.timeout > 0) or bool(self.memory_limit_mb and self.memory_limit_mb > 0)
+
+    def map(self, func, tasks, job=None):
+        """
+        タスクを実行し、結果を元の順序で1件ずつ返す（上限を超えたタスクはTaskSkipped）
+        メモリ不足や異常終了のタスクは新しいワーカーで1回だけやり直す
+        jobがあれば結果を待つ間もキャンセルを確認し、途中で読み出しをやめると実行中のワーカーは終了する
+        """
+        from multiprocessing.connection import wait
+
+        tasks = list(tasks)
+        queue = collections.deque(range(len(tasks)))
+        retried = set()
+        results = {}
+        running = {}  # {conn: (worker, タスクの番号, 締め切り（ワーカーの準備ができるまでは起動からの締め切り）)}
+        next_index = 0
+
+        def deadline(worker=None):
+            # workerを渡すと、そのワーカーの起動からの締め切り
+            if not (self.timeout and self.timeout > 0):
+                return None
+            if worker is None:
+                return time.monotonic() + self.timeout
+            return worker.started + max(self.timeout, STARTUP_TIMEOUT)
+
+        def retry_or_skip(index, reason):
+            if index in retried:
+                results[index] = TaskSkipped(reason)
+            else:
+                retried.add(index)
+                queue.appendleft(index)
+
+        try:
+            while next_index < len(tasks):
+                if next_index in results:
+                    yield results.pop(next_index)
+                    next_index += 1
+                    continue
+
+                # 空いているワーカーにタスクを割り当てる
+                while queue and len(running) < self.workers:
+                    index = queue.popleft()
+                    worker = self._idle.pop() if self._idle else _WatchdogWorker(self.memory_limit_mb, self.initializer)
+                    try:
+                        worker.conn.send((func, tasks[index]))
+                    except (EOFError, OSError):
+                        # 待機中に終了していたワーカー
+                        worker.kill()
+                        retry_or_skip(index, "crash")
+                        continue
+                    # 起動したばかりのワーカーは、準備ができてからタスクの締め切りを数え始める
+                    # （それまでは、起動や初期化で固まった場合に備えて起動からの締め切りを使う）
+                    running[worker.conn] = (worker, index, deadline() if worker.ready else deadline(worker))
+
+                if not running:
+                    continue
+
+                # 結果か締め切りを待つ（キャンセルを確認するため一定間隔で起きる）
+                wait_time = POLL_INTERVAL
+                deadlines = [task_deadline for _, _, task_deadline in running.values() if task_deadline is not None]
+                if deadlines:
+                    wait_time = max(0.0, min(wait_time, min(deadlines) - time.monotonic()))
+                ready = wait(list(running), timeout=wait_time)
+                if job is not None:
+                    job.check_cancelled()
+
+                for conn in ready:
+                    worker, index, _ = running.pop(conn)
+                    try:
+                        status, value = conn.recv()
+                    except (EOFError, OSError):
+                        # ワーカーが異常終了した（OSにメモリ不足で終了させられた場合など）
+                        worker.kill()
+                        killed = _KILL_SIGNAL is not None and worker.process.exitcode == -_KILL_SIGNAL
+                        retry_or_skip(index, "oom" if killed else "crash")
+                        continue
+                    if status == "ready":
+                        # ワーカーの起動と初期化が終わったので、ここからタスクの時間を計る
+                        worker.ready = True
+                        running[conn] = (worker, index, deadline())
+                        continue
+                    if status == "oom":
+                        # メモリ不足になったワーカーは使い回さない
+                        worker.kill()
+                        retry_or_skip(index, "oom")
+                        continue
+                    self._idle.append(worker)
+                    if status == "error":
+                        print(f"ワーカーでの解析中にエラー: {value}")
+                        value = None
+                    results[index] = value
+
+                # 締め切りを過ぎたタスクのワーカーは強制終了する
+                # 起動や初期化が終わらなかったワーカーのタスクは、タスク自体のせいではないので新しいワーカーで1回だけやり直す
+                now = time.monotonic()
+                for conn, (worker, index, task_deadline) in list(running.items()):
+                    if task_deadline is not None and now >= task_deadline:
+                        del running[conn]
+                        worker.kill()
+                        if worker.ready:
+                            results[index] = TaskSkipped("timeout")
+                        else:
+                            retry_or_skip(index, "timeout")
+        finally:
+            # キャンセルなどで読み出しが途中でやめられた場合は実行中のタスクを打ち切る
+            for worker, _, _ in running.values():
+                worker.kill()
+
+    def shutdown(self):
+        """待機中のワーカーを終了する"""
+        while self._idle:
+            self._idle.pop().stop()
@@ -0,0 +1,155 @@
+# bench_call_traversal.py
+"""
+AstroidAnalyzerの関数呼び出し探索（依存関係・コールグラフ）のベンチマーク
+
+以前の再帰による探索と、現在の明示的なスタックによる探索を
+自動生成した大きなモジュールで比較し、結果が一致することも確認する
+
+使い方:
+    python benchmarks/bench_call_traversal.py [--functions N] [--repeat N]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# アプリと同じくcode_analyzerの遅延読み込みプロキシ経由でastroidを使う
+from code_analyzer import AstroidAnalyzer, astroid
+
+
+def generate_module(function_count):
+    """呼び出しを多く含む関数・クラスからなるモジュールのソースを作る"""
+    lines = []
+    for i in range(function_count):
+        lines.append(f"def func_{i}(data, option=None):")
+        lines.append(f"    result = [helper_{i % 7}(x) for x in data if check(x)]")
+        lines.append("    for item in data:")
+        lines.append("        if item.valid():")
+        lines.append(f"            total = func_{(i + 1) % function_count}(item.value(), mode=str(item))")
+        lines.append("        else:")
+        lines.append("            log.warning(format_message(item, len(result)))")
+        lines.append("    return {key: transform(value) for key, value in zip(data, result)}")
+        lines.append("")
+    for i in range(function_count // 10):
+        lines.append(f"class Handler_{i}:")
+        lines.append("    def run(self, data):")
+        lines.append("        with self.lock():")
+        lines.append("            return self.process(func_0(data), self.options.get('x'))")
+        lines.append("    def process(self, value, option):")
+        lines.append("        return self.run(sorted(value, key=lambda v: abs(v)))")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def recursive_find_dependencies(node, caller_name, dependencies):
+    """以前の実装（ノードごとに再帰する）"""
+    if caller_name not in dependencies:
+        dependencies[caller_name] = set()
+    for child in node.get_children():
+        if isinstance(child, astroid.Call):
+            if isinstance(child.func, astroid.Name):
+                dependencies[caller_name].add(child.func.name)
+            elif isinstance(child.func, astroid.Attribute):
+                if isinstance(child.func.expr, astroid.Name):
+                    dependencies[caller_name].add(f"{child.func.expr.name}.{child.func.attrname}")
+        recursive_find_dependencies(child, caller_name, dependencies)
+
+
+def recursive_module_calls(module, module_name, functions):
+    """以前のfind_calls_in_node（ノードごとに再帰する）でコールグラフを作る"""
+    call_graph = {full_name: set() for full_name in functions.values()}
+
+    def find_calls_in_node(node, caller_name):
+        if isinstance(node, astroid.Call):
+            if isinstance(node.func, astroid.Name):
+                if node.func.name in functions:
+                    call_graph[caller_name].add(functions[node.func.name])
+            elif isinstance(node.func, astroid.Attribute):
+                if isinstance(node.func.expr, astroid.Name) and node.func.expr.name == 'self':
+                    class_method = f"{caller_name.split('.')[-2]}.{node.func.attrname}"
+                    if class_method in functions:
+                        call_graph[caller_name].add(functions[class_method])
+        for child_node in node.get_children():
+            find_calls_in_node(child_node, caller_name)
+
+    for node, name in iter_callers(module):
+        for child_node in node.body:
+            find_calls_in_node(child_node, f"{module_name}.{name}")
+    return {caller: callees for caller, callees in call_graph.items() if callees}
+
+
+def iter_callers(module):
+    """依存関係を調べる対象（トップレベル関数とメソッド）"""
+    for node in module.body:
+        if isinstance(node, astroid.FunctionDef):
+            yield node, node.name
+        elif isinstance(node, astroid.ClassDef):
+            for method in node.body:
+                if isinstance(method, astroid.FunctionDef):
+                    yield method, f"{node.name}.{method.name}"
+
+
+def best_time(func, repeat):
+    """repeat回実行して最短時間を返す（timeitと同じく計測中はGCを止める）"""
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="関数呼び出し探索のベンチマーク")
+    parser.add_argument("--functions", type=int, default=2000, help="生成する関数の数（デフォルト: 2000）")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数（デフォルト: 5）")
+    args = parser.parse_args(argv)
+
+    code = generate_module(args.functions)
+    module = astroid.parse(code, module_name="bench")
+    callers = list(iter_callers(module))
+    print(f"モジュール: {len(code.splitlines())} 行, 関数・メソッド {len(callers)} 個")
+
+    # 依存関係（_find_dependencies）
+    old_dependencies = {}
+    analyzer = AstroidAnalyzer()
+
+    def run_old():
+        old_dependencies.clear()
+        for node, name in callers:
+            recursive_find_dependencies(node, name, old_dependencies)
+
+    def run_new():
+        analyzer.dependencies = {}
+        for node, name in callers:
+            analyzer._find_dependencies(node, name)
+
+    old_time = best_time(run_old, args.repeat)
+    new_time = best_time(run_new, args.repeat)
+    assert old_dependencies == analyzer.dependencies, "依存関係の結果が一致しません"
+    print(f"依存関係:     再帰 {old_time * 1000:8.1f} ms / スタック {new_time * 1000:8.1f} ms"
+          f" ({old_time / new_time:.2f}倍)")
+
+    # コールグラフ（_analyze_module_calls）
+    call_info = analyzer.collect_module_calls(module, "bench")
+    functions = call_info['functions']
+    old_edges = recursive_module_calls(module, "bench", functions)
+    assert old_edges == call_info['edges'], "コールグラフの結果が一致しません"
+    old_time = best_time(lambda: recursive_module_calls(module, "bench", functions), args.repeat)
+    new_time = best_time(lambda: analyzer.collect_module_calls(module, "bench"), args.repeat)
+    print(f"コールグラフ: 再帰 {old_time * 1000:8.1f} ms / スタック {new_time * 1000:8.1f} ms"
+          f" ({old_time / new_time:.2f}倍)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
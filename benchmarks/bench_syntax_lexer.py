@@ -0,0 +1,128 @@
+# bench_syntax_lexer.py
+"""
+シンタックスハイライトのlexer（syntax_lexer）のベンチマーク
+
+以前のSyntaxHighlighterの、規則・キーワードごとにテキスト全体を走査する方法と、
+現在の1つの正規表現で1回だけ走査するPythonLexerを、自動生成した大きなモジュールで比較する
+（Tkは使わないので、ディスプレイのない環境でも実行できる）
+
+使い方:
+    python benchmarks/bench_syntax_lexer.py [--lines N] [--repeat N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from syntax_lexer import JsonLexer, PythonLexer
+
+
+def generate_module(line_count):
+    """キーワード・組み込み関数・文字列・コメント・docstringを含むモジュールのソースを作る"""
+    block = [
+        "class Handler(Base):",
+        '    """Handler for the requests',
+        "    with a multi-line docstring",
+        '    """',
+        "    def run(self, data, option=None):",
+        "        # comment with def and class",
+        "        result = [len(x) for x in data if isinstance(x, str)]",
+        "        if option is not None and not result:",
+        "            return sorted(result, key=lambda v: abs(v))",
+        "        print('done: %s' % \"it's\", max(result))",
+        "        return dict(zip(data, result))",
+        "",
+    ]
+    return "\n".join(block * (line_count // len(block) + 1))
+
+
+def old_highlight_indices(lexer, content):
+    """以前の実装と同じく規則ごとに走査し、タグを付ける位置を「1.0+Nc」の形で作る"""
+    indices = []
+
+    def add(tag, start, end):
+        indices.append((tag, f"1.0+{start}c", f"1.0+{end}c"))
+
+    for match in re.finditer(r'#.*$', content, re.MULTILINE):
+        add('comments', match.start(), match.end())
+    for match in re.finditer(r'""".*?"""|\'\'\'.*?\'\'\'', content, re.DOTALL):
+        add('docstrings', match.start(), match.end())
+    for match in re.finditer(r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', content):
+        add('strings', match.start(), match.end())
+    for match in re.finditer(r'\b(class|def)\s+(\w+)', content):
+        add('keywords', match.start(1), match.end(1))
+        add('classes' if match.group(1) == 'class' else 'functions', match.start(2), match.end(2))
+    for keyword in lexer.KEYWORDS:
+        for match in re.finditer(r'\b' + keyword + r'\b', content):
+            add('keywords', match.start(), match.end())
+    for builtin in lexer.BUILTINS:
+        for match in re.finditer(r'\b' + builtin + r'\b', content):
+            add('builtins', match.start(), match.end())
+    return indices
+
+
+def new_highlight_indices(lexer, content, first_line=1, state=None):
+    """現在の実装と同じく1回だけ走査し、タグを付ける位置を「行.列」の形で作る"""
+    result = lexer.lex(content, first_line, state)
+    return [(tag, f"{line}.{col}", f"{end_line}.{end_col}") for tag, line, col, end_line, end_col in result.tokens]
+
+
+def best_time(func, repeat):
+    """repeat回実行して最短時間を返す（timeitと同じく計測中はGCを止める）"""
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="シンタックスハイライトのlexerのベンチマーク")
+    parser.add_argument("--lines", type=int, default=100000, help="生成するモジュールの行数（デフォルト: 100000）")
+    parser.add_argument("--repeat", type=int, default=3, help="計測の繰り返し回数（デフォルト: 3）")
+    args = parser.parse_args(argv)
+
+    lexer = PythonLexer()
+    code = generate_module(args.lines)
+    print(f"モジュール: {code.count(chr(10)) + 1} 行, {len(code)} 文字")
+
+    # テキスト全体
+    old_count = len(old_highlight_indices(lexer, code))
+    new_count = len(new_highlight_indices(lexer, code))
+    old_time = best_time(lambda: old_highlight_indices(lexer, code), args.repeat)
+    new_time = best_time(lambda: new_highlight_indices(lexer, code), args.repeat)
+    print(f"全体:         規則ごと {old_time * 1000:8.1f} ms ({old_count} 範囲)"
+          f" / 1回の走査 {new_time * 1000:8.1f} ms ({new_count} 範囲) ({old_time / new_time:.2f}倍)")
+
+    # 見えている範囲と前後の余白だけ（SyntaxHighlighterが実際にハイライトする量）
+    lines = code.split("\n")
+    first = len(lines) // 2
+    window = "\n".join(lines[first - 1:first + 240])
+    window_time = best_time(lambda: new_highlight_indices(lexer, window, first), args.repeat)
+    print(f"表示範囲のみ: 241 行 {window_time * 1000:8.3f} ms")
+
+    # JSON
+    data = {"files": [{"path": f"pkg/module_{i}.py", "lines": i * 10, "classes": ["Handler", "Base"],
+                       "async": False, "docstring": None, "ratio": -1.5e-3} for i in range(args.lines // 10)]}
+    json_text = json.dumps(data, indent=2)
+    json_lexer = JsonLexer()
+    json_time = best_time(lambda: json_lexer.lex(json_text), args.repeat)
+    print(f"JSON:         {json_text.count(chr(10)) + 1} 行 {json_time * 1000:8.1f} ms"
+          f" ({len(json_lexer.lex(json_text).tokens)} 範囲)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+# check_inference_invalidation.py
+"""
+型推論の結果キャッシュが、呼び出し先だけが変わった関数の古い推論結果を返さないことの確認
+
+g() の戻り値だけを int から str に変え、それを呼ぶ f() の本体は変えずに、次の3つで
+f() の戻り値の型が str になることを確かめる（Tkは使わないので、ディスプレイのない環境でも実行できる）
+    1. 1つのProjectAnalyzerで file_structure を2回呼ぶ（構造の差分が使う1ファイルの解析）
+    2. gitの2つのリビジョンの構造の差分（diff_revisions）
+    3. 1つのProjectAnalyzerで拡張解析のレポートを2回作る（監視付きのワーカーと、同じプロセスでの解析）
+
+使い方:
+    python benchmarks/check_inference_invalidation.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_analyzer import ProjectAnalyzer
+from structure_diff import diff_revisions, file_structure
+
+OLD_CODE = "def g():\n    return 1\n\n\ndef f():\n    return g()\n"
+NEW_CODE = OLD_CODE.replace("return 1", 'return "s"')
+
+
+def check(label, ok, detail):
+    """結果を表示して、確認できたかを返す"""
+    print(f"{'OK  ' if ok else 'NG  '} {label}: {detail}")
+    return ok
+
+
+def check_file_structure():
+    project = ProjectAnalyzer(file_timeout=0, memory_limit_mb=0)
+    try:
+        file_structure(project, OLD_CODE, "m.py")
+        symbols = file_structure(project, NEW_CODE, "m.py")['symbols']
+    finally:
+        project.shutdown()
+    return check("file_structure を2回", symbols['f'] == "f() -> str", symbols['f'])
+
+
+def check_diff_revisions(work_dir):
+    repo = os.path.join(work_dir, "repo")
+    os.makedirs(repo)
+    path = os.path.join(repo, "m.py")
+
+    def git(*args):
+        subprocess.run(["git", "-c", "user.name=check", "-c", "user.email=check@example.com", *args],
+                       cwd=repo, check=True, capture_output=True)
+
+    git("init", "-q")
+    for code in (OLD_CODE, NEW_CODE):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(code)
+        git("add", "m.py")
+        git("commit", "-q", "-m", "update")
+
+    project = ProjectAnalyzer(file_timeout=0, memory_limit_mb=0)
+    try:
+        result = diff_revisions(project, repo, "HEAD~1", "HEAD")
+    finally:
+        project.shutdown()
+    changed = [pair for delta in result['files'] for pair in delta['changed']]
+    return check("diff_revisions", ("f() -> int", "f() -> str") in changed, changed)
+
+
+def check_extended_report(work_dir, watchdog):
+    path = os.path.join(work_dir, "watchdog" if watchdog else "inprocess", "m.py")
+    os.makedirs(os.path.dirname(path))
+    project = ProjectAnalyzer() if watchdog else ProjectAnalyzer(file_timeout=0, memory_limit_mb=0)
+    try:
+        for code in (OLD_CODE, NEW_CODE):
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(code)
+            project.load([path])
+            report = project.build_extended_report([path])
+    finally:
+        project.shutdown()
+    lines = [line for line in report.splitlines() if line.startswith("f() -> ")]
+    label = "拡張解析のレポートを2回（" + ("監視付きのワーカー" if watchdog else "同じプロセス") + "）"
+    return check(label, lines == ["f() -> str (m.py)"], lines)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = [
+            check_file_structure(),
+            check_diff_revisions(work_dir),
+            check_extended_report(work_dir, watchdog=True),
+            check_extended_report(work_dir, watchdog=False),
+        ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2383 @@
+# code_analyzer.py
+
+import ast
+import importlib
+import itertools
+import os
+import re
+import time
+import traceback
+
+# プロジェクト内モジュール
+from analysis_cache import content_hash
+from analysis_job import AnalysisCancelled
+from analysis_watchdog import DEFAULT_FILE_TIMEOUT, DEFAULT_MEMORY_LIMIT_MB, TaskSkipped, WatchdogPool
+from directory_scanner import DEFAULT_SCAN_WORKERS, DirectoryScanner
+
+
+class _LazyModule:
+    """
+    初回の属性アクセス時にモジュールを読み込む代理オブジェクト
+    astroidは読み込みに時間がかかるため、拡張解析で使うまで読み込まない
+    """
+    def __init__(self, module_name):
+        self._module_name = module_name
+        self._module = None
+
+    def __getattr__(self, name):
+        if self._module is None:
+            self._module = importlib.import_module(self._module_name)
+        value = getattr(self._module, name)
+        # 以降の同じ属性へのアクセスが__getattr__を経由しないように保存する
+        setattr(self, name, value)
+        return value
+
+
+astroid = _LazyModule("astroid")
+
+# 拡張解析の型推論のレベル
+# off: 戻り値・属性の型を求めない / annotations: 型アノテーションのみ / full: アノテーションがなければ推論する
+INFERENCE_LEVELS = ("off", "annotations", "full")
+DEFAULT_INFERENCE_LEVEL = "full"
+
+# 型推論の上限（1関数あたりの秒数と推論したノード数、解析全体の秒数（0なら無制限））
+DEFAULT_FUNCTION_INFERENCE_TIME = 5.0
+DEFAULT_FUNCTION_INFERENCE_NODES = 1000
+DEFAULT_RUN_INFERENCE_TIME = 600
+
+# 型推論を打ち切った理由の表示名
+INFERENCE_SKIP_REASONS = {
+    'time': "時間の上限",
+    'nodes': "推論ノード数の上限",
+    'run': "解析全体の時間の上限"
+}
+
+# 関数本体ごとの推論結果を覚えておく最大件数（超えたら空にする）
+MAX_INFERENCE_CACHE_ENTRIES = 100000
+
+# 推論結果キャッシュを空にするたびに振る番号（ワーカープロセスのキャッシュも空にするかの判断に使う）
+_inference_generations = itertools.count(1)
+
+
+def collect_python_files(path, skip_exe_folders=True, rules=None, workers=DEFAULT_SCAN_WORKERS):
+    """
+    ディレクトリ内のPythonファイルをツリー表示と同じ順序（サブディレクトリ→ファイル）で集める
+    pathがファイルならそのファイルだけを返す
+    rules（pathからの相対パスに対するExclusionRules）に一致するファイル・フォルダは除き、除外されたフォルダの中は辿らない
+    workersが2以上ならディレクトリをスレッドで並列に読む
+    """
+    if os.path.isfile(path):
+        return [path]
+
+    snapshot = DirectoryScanner(skip_exe_folders, rules, workers).scan(path)
+    return snapshot.python_files(rules or None)
+
+
+class _StructureVisitor(ast.NodeVisitor):
+    """
+    1回の走査でインポート・クラス・メソッド・関数・内部関数を集めるビジター（CodeAnalyzer用）
+    スコープ（モジュール / クラス / 関数）をたどって分類するので、
+    メソッドと同名のモジュール関数も区別できる
+    各一覧の順序は従来のast.walk（浅いノードから順）と同じになるよう、ノードの深さも記録する
+    """
+    def __init__(self):
+        self.depth = 0
+        self.scopes = []            # 外側から順のスコープ [('class' / 'function', 情報)]
+        self.owners = []            # 内部関数を登録する外側のメソッド・モジュール関数
+        self.imports = []           # [(深さ, モジュール名（importならNone）, 名前のリスト)]
+        self.classes = []           # [(深さ, クラス情報)]
+        self.functions = []         # [(深さ, 関数情報)]
+        self.recorded = []          # 内部関数の一覧を持つすべてのメソッド・関数の情報
+
+    # 関数・クラス・インポートは文なので、式の中まではたどらない
+    # （except節とmatchのcaseは文を含むのでたどる）
+    STATEMENT_NODES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+    def generic_visit(self, node):
+        self.depth += 1
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, self.STATEMENT_NODES):
+                self.visit(child)
+        self.depth -= 1
+
+    def visit_Import(self, node):
+        self.imports.append((self.depth, None, [name.name for name in node.names]))
+
+    def visit_ImportFrom(self, node):
+        self.imports.append((self.depth, node.module or '', [name.name for name in node.names]))
+
+    def visit_ClassDef(self, node):
+        class_info = {
+            'name': node.name,
+            'docstring': ast.get_docstring(node),
+            'methods': []
+        }
+        self.classes.append((self.depth, class_info))
+        
+        self.scopes.append(('class', class_info))
+        self.generic_visit(node)
+        self.scopes.pop()
+
+    def visit_FunctionDef(self, node):
+        docstring = ast.get_docstring(node)
+        
+        # 外側のメソッド・モジュール関数すべての内部関数として登録
+        if self.owners:
+            inner_info = {'name': node.name, 'docstring': docstring}
+            for owner in self.owners:
+                owner['inner_functions'].append((self.depth, inner_info))
+        
+        function_info = {
+            'name': node.name,
+            'docstring': docstring,
+            'inner_functions': []
+        }
+        scope_kind, scope_info = self.scopes[-1] if self.scopes else ('module', None)
+        if scope_kind == 'class':
+            # クラス直下（ifなどの中も含む）の関数はメソッド
+            scope_info['methods'].append(function_info)
+        elif scope_kind == 'module':
+            self.functions.append((self.depth, function_info))
+        else:
+            # 関数の中の関数は内部関数としてのみ扱う
+            function_info = None
+        
+        self.scopes.append(('function', function_info))
+        if function_info is not None:
+            self.recorded.append(function_info)
+            self.owners.append(function_info)
+            self.generic_visit(node)
+            self.owners.pop()
+        else:
+            self.generic_visit(node)
+        self.scopes.pop()
+
+    def visit_AsyncFunctionDef(self, node):
+        # async関数は一覧に含めないが、その中はモジュール直下ではない
+        self.scopes.append(('function', None))
+        self.generic_visit(node)
+        self.scopes.pop()
+
+    @staticmethod
+    def _by_depth(entries):
+        """深さの浅い順に並べる（同じ深さではソース上の順序を保つ）"""
+        return sorted(entries, key=lambda entry: entry[0])
+
+    def get_imports(self):
+        """[(モジュール名（importならNone）, 名前のリスト)]"""
+        return [(module, names) for _, module, names in self._by_depth(self.imports)]
+
+    def get_classes(self):
+        self._finish_inner_functions()
+        return [class_info for _, class_info in self._by_depth(self.classes)]
+
+    def get_functions(self):
+        self._finish_inner_functions()
+        return [function_info for _, function_info in self._by_depth(self.functions)]
+
+    def _finish_inner_functions(self):
+        """内部関数の一覧から深さの情報を取り除く"""
+        for function_info in self.recorded:
+            function_info['inner_functions'] = [
+                inner_info for _, inner_info in self._by_depth(function_info['inner_functions'])
+            ]
+        self.recorded = []
+
+class CodeAnalyzer:
+    """
+    Pythonコードを解析して、クラス名、関数名を抽出するクラス
+    """
+    # 解析結果の形式を変えたら上げる（古いキャッシュを無効にするため）
+    CACHE_VERSION = "2"
+
+    def __init__(self):
+        self.imports = []
+        self.classes = []
+        self.functions = []
+        self.report = ""
+        self.char_count = 0
+        self.include_imports = True
+        self.include_docstrings = True 
+        self.cache = None  # AnalysisCache（設定されていれば解析結果を再利用）
+        # 前回の解析で作ったディレクトリごとのセクション {キー: (セクション, 文字数)}
+        self.sections = {}
+    
+    def reset(self):
+        """解析結果をリセットする"""
+        self.imports = []
+        self.classes = []
+        self.functions = []
+        self.report = ""
+        self.char_count = 0
+    
+    def analyze_file(self, file_path, source=None):
+        """ファイルパスからコードを読み込んで解析する（sourceがあれば読み込み・パース済みの結果を使う）"""
+        try:
+            if source is None:
+                source = SourceFile(file_path)
+            code = source.read()
+            return self.analyze_code(code, source.name, source=source)
+        except Exception as e:
+            return f"ファイル解析エラー: {str(e)}", 0
+
+
+    def analyze_files(self, file_paths, pipeline=None, worker_pool=None, job=None, fingerprints=None):
+        """
+        複数のファイルを解析する（pipelineがあれば読み込み・パース済みの結果を共有する）
+        worker_poolがあれば未解析のファイルを複数プロセスで並列に解析してから
+        レポートを元の順序で組み立てる
+        直下のファイルが変わっていないディレクトリは、前回のセクションをそのまま使う（fingerprintsで判定）
+        jobがあればファイルごとの途中結果と進捗を送り、キャンセルされていれば中断する
+        """
+        if pipeline is None:
+            pipeline = AnalysisPipeline()
+        if fingerprints is None:
+            fingerprints = DirectoryFingerprints(pipeline, file_paths)
+        
+        # 再利用できるセクションを先に探し、それ以外のディレクトリのファイルだけを解析する
+        sections = {}
+        reused = {}
+        for dir_path, fingerprint in fingerprints.local.items():
+            key = self._section_key(fingerprint)
+            section = self._lookup_section(key)
+            if section is not None:
+                sections[key] = reused[dir_path] = section
+        if worker_pool is not None and worker_pool.jobs > 1:
+            self.precompute([pipeline.get(f) for f in file_paths
+                             if f.lower().endswith('.py') and os.path.dirname(f) not in reused], worker_pool, job)
+        self.reset()
+        report_parts = []
+        total_char_count = 0
+        
+        # ディレクトリ構造情報を生成
+        all_dirs = set()
+        for file_path in file_paths:
+            dir_name = os.path.dirname(file_path)
+            all_dirs.add(dir_name)
+        
+        # ディレクトリ構造をレポートに追加
+        dir_structure = "# プロジェクト構造\n"
+        root_dir = os.path.commonpath(list(all_dirs)) if all_dirs else ""
+        if root_dir:
+            dir_structure += f"ルートディレクトリ: {root_dir}\n"
+            
+            # サブディレクトリの一覧を表示
+            for dir_path in sorted(all_dirs):
+                rel_path = os.path.relpath(dir_path, root_dir)
+                if rel_path != '.':  # ルートディレクトリ自体は除外
+                    dir_structure += f"- {rel_path}/\n"
+            
+            dir_structure += "\n"
+        
+        report_parts.append(dir_structure)
+        total_char_count += len(dir_structure)
+        if job is not None:
+            job.post("partial", dir_structure)
+        
+        # 元の処理（ファイルごとの解析）を継続
+        # ファイルをディレクトリごとにグループ化
+        dir_files = {}
+        for file_path in file_paths:
+            dir_name = os.path.dirname(file_path)
+            if dir_name not in dir_files:
+                dir_files[dir_name] = []
+            dir_files[dir_name].append(file_path)
+        
+        # ディレクトリごとに処理
+        total_py_files = sum(1 for f in file_paths if f.lower().endswith('.py'))
+        done_files = 0
+        for dir_path, files in dir_files.items():
+            # Pythonファイルのみをフィルタリング
+            py_files = [f for f in files if f.lower().endswith('.py')]
+            
+            # 直下のファイルが前回と同じなら、セクションをまとめて再利用する
+            if dir_path in reused:
+                dir_report, dir_char_count = reused[dir_path]
+                report_parts.append(dir_report)
+                total_char_count += dir_char_count
+                done_files += len(py_files)
+                if job is not None:
+                    job.check_cancelled()
+                    job.post("partial", "\n" + dir_report)
+                    if py_files:
+                        job.report_progress("基本解析", done_files, total_py_files, os.path.basename(dir_path))
+                continue
+            
+            # ディレクトリ名を追加
+            dir_report = f"\n## ディレクトリ: {dir_path}\n"
+            dir_char_count = 0
+            if job is not None:
+                job.post("partial", "\n" + dir_report)
+            
+            # Pythonファイルがある場合のみ処理
+            if py_files:
+                # ディレクトリ内の各Pythonファイルを処理
+                for file_path in sorted(py_files):
+                    if job is not None:
+                        job.check_cancelled()
+                    try:
+                        file_name = os.path.basename(file_path)
+                        
+                        # パイプラインから読み込み済みのソースと構文木を取得
+                        source = pipeline.get(file_path)
+                        code = source.read()
+                        
+                        # ファイルごとの解析結果
+                        self.reset()
+                        result, _ = self.analyze_code(code, file_name, source=source)
+                        file_report = f"\n### ファイル: {file_name}\n"
+                        file_report += result
+                        
+                        dir_report += file_report
+                        dir_char_count += len(file_report)
+                    except Exception as e:
+                        file_report = f"\n### ファイル: {os.path.basename(file_path)}\n解析エラー: {str(e)}\n"
+                        dir_report += file_report
+                        dir_char_count += len(file_report)
+                    
+                    # 解析できたファイルから順に表示できるよう途中結果を送る
+                    done_files += 1
+                    if job is not None:
+                        job.post("partial", file_report)
+                        job.report_progress("基本解析", done_files, total_py_files, os.path.basename(file_path))
+            
+            report_parts.append(dir_report)
+            total_char_count += dir_char_count
+            key = self._section_key(fingerprints.local.get(dir_path))
+            if key is not None:
+                sections[key] = (dir_report, dir_char_count)
+                if self.cache is not None:
+                    self.cache.put(self.cache.make_key(*key), sections[key])
+        
+        # メモリには今回のセクションだけを残す
+        self.sections = sections
+        
+        # すべてのディレクトリのレポートを結合
+        self.report = "\n".join(report_parts)
+        self.char_count = total_char_count
+        return self.report, self.char_count
+
+    def _section_key(self, fingerprint):
+        """ディレクトリのセクションのキー（フィンガープリントがなければNone）"""
+        if fingerprint is None:
+            return None
+        return ("basic-section", self.CACHE_VERSION, fingerprint, self.include_imports, self.include_docstrings)
+
+    def _lookup_section(self, key):
+        """前回の解析またはキャッシュからディレクトリのセクションを探す"""
+        if key is None:
+            return None
+        section = self.sections.get(key)
+        if section is None and self.cache is not None:
+            section = self.cache.get(self.cache.make_key(*key))
+        return section
+
+    def analyze_code(self, code, filename="", directory_structure="", source=None):
+        """Pythonコードを解析する（sourceがあれば読み込み・パース済みの結果を使う）"""
+        self.reset()
+        try:
+            # 並列解析済み、またはキャッシュに同じ内容の解析結果があれば構文解析を省略
+            cached = self._lookup_structure(code, source)
+            
+            if cached is not None:
+                self.set_structure(cached)
+            else:
+                tree = source.get_ast_tree() if source is not None else None
+                if tree is None:
+                    tree = ast.parse(code)
+                self._extract_structure(tree)
+                self._store_structure(code, source, self.get_structure())
+            
+            # ディレクトリ構造情報の追加
+            self.directory_structure = directory_structure
+            
+            self.report = self.generate_report(filename)
+            self.char_count = len(self.report)
+            return self.report, self.char_count
+        except SyntaxError as e:
+            return f"構文エラー: {str(e)}", 0
+        except Exception as e:
+            return f"解析エラー: {str(e)}", 0
+    
+    def get_structure(self):
+        """解析結果の構造データを取得する（キャッシュやプロセス間の受け渡し用）"""
+        return {
+            'imports': self.imports,
+            'classes': self.classes,
+            'functions': self.functions
+        }
+
+    def set_structure(self, structure):
+        """構造データから解析結果を復元する"""
+        self.imports = structure['imports']
+        self.classes = structure['classes']
+        self.functions = structure['functions']
+
+    def _cache_key(self, code, source):
+        """キャッシュキーを作る（キャッシュが無効ならNone）"""
+        if self.cache is None:
+            return None
+        code_hash = source.get_content_hash() if source is not None else content_hash(code)
+        return self.cache.make_key("basic", self.CACHE_VERSION, code_hash)
+
+    def _lookup_structure(self, code, source):
+        """並列解析またはキャッシュで得られた構造データを探す"""
+        if source is not None and "basic" in source.results:
+            return source.results["basic"]
+        cache_key = self._cache_key(code, source)
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None and source is not None:
+            source.results["basic"] = cached
+        return cached
+
+    def _store_structure(self, code, source, structure):
+        """構造データをsourceとキャッシュに保存する"""
+        if source is not None:
+            source.results["basic"] = structure
+        cache_key = self._cache_key(code, source)
+        if cache_key is not None:
+            self.cache.put(cache_key, structure)
+
+    def precompute(self, sources, worker_pool, job=None):
+        """
+        未解析のファイルをプロセスプールで並列に解析し、結果をsourceに保持する
+        jobがあればファイルごとに進捗を送り、キャンセルされていれば中断する
+        """
+        pending = []
+        for source in sources:
+            try:
+                code = source.read()
+            except Exception:
+                continue  # 読み込みエラーは通常の処理で報告する
+            if self._lookup_structure(code, source) is None:
+                pending.append(source)
+        
+        tasks = [(source.path, source.read()) for source in pending]
+        for i, (source, structure) in enumerate(zip(pending, worker_pool.map(_basic_structure_task, tasks))):
+            # 解析に失敗したファイルは通常の処理でエラーを報告する
+            if structure is not None:
+                self._store_structure(source.read(), source, structure)
+            if job is not None:
+                job.check_cancelled()
+                job.report_progress("基本解析（並列）", i + 1, len(pending), source.name)
+
+    def _extract_structure(self, tree):
+        """構文木からインポート文・クラス・関数を抽出する（1回の走査で集める）"""
+        visitor = _StructureVisitor()
+        visitor.visit(tree)
+        
+        # インポート文を格納する辞書を初期化（モジュール名をキーとする）
+        import_dict = {}
+        for module, names in visitor.get_imports():
+            if module is None:
+                if 'direct_import' not in import_dict:
+                    import_dict['direct_import'] = []
+                import_dict['direct_import'].extend(f"import {name}" for name in names)
+            else:
+                if module not in import_dict:
+                    import_dict[module] = []
+                import_dict[module].extend(names)
+        
+        self.classes = visitor.get_classes()
+        self.functions = visitor.get_functions()
+        
+        # インポート辞書を整形された形式に変換
+        self.imports = []
+        for module, names in import_dict.items():
+            if module == 'direct_import':
+                # 直接インポートは既にフォーマット済み
+                self.imports.extend(sorted(names))
+            else:
+                # 同じモジュールからのインポートをまとめる
+                self.imports.append(f"from {module} import {', '.join(sorted(names))}")
+
+    def generate_report(self, filename=""):
+        """解析結果からレポートを生成する"""
+        report = ""
+        
+        # ディレクトリ構造情報があれば追加
+        if hasattr(self, 'directory_structure') and self.directory_structure:
+            report += "# ディレクトリ構造\n"
+            report += self.directory_structure
+            report += "\n\n"
+        
+        # インポート文を追加（フラグがTrueの場合のみ）
+        if self.include_imports and self.imports:
+            report += "# インポート\n"
+            for import_stmt in self.imports:
+                report += f"{import_stmt}\n"
+            report += "\n"
+        
+        # クラスを追加
+        if self.classes:
+            report += "# クラス\n"
+            for cls in self.classes:
+                report += f"class {cls['name']}:\n"
+                # クラスのdocstringを追加（フラグがTrueかつdocstringがある場合）
+                if self.include_docstrings and cls['docstring']:
+                    # 簡潔にするために1行目だけ表示
+                    first_line = cls['docstring'].split('\n')[0].strip()
+                    report += f"    \"{first_line}\"\n"
+                
+                # メソッドを追加
+                if cls['methods']:
+                    for method in cls['methods']:
+                        report += f"    def {method['name']}()\n"
+                        # メソッドのdocstringを追加（フラグがTrueかつdocstringがある場合）
+                        if self.include_docstrings and method['docstring']:
+                            first_line = method['docstring'].split('\n')[0].strip()
+                            report += f"        \"{first_line}\"\n"
+                        
+                        # メソッド内の内部関数を追加
+                        if 'inner_functions' in method and method['inner_functions']:
+                            for inner_func in method['inner_functions']:
+                                report += f"        def {inner_func['name']}()\n"
+                                if self.include_docstrings and inner_func['docstring']:
+                                    first_line = inner_func['docstring'].split('\n')[0].strip()
+                                    report += f"            \"{first_line}\"\n"
+                report += "\n"
+        
+        # 関数を追加
+        if self.functions:
+            report += "# 関数\n"
+            for func in self.functions:
+                report += f"def {func['name']}()\n"
+                # 関数のdocstringを追加（フラグがTrueかつdocstringがある場合）
+                if self.include_docstrings and func['docstring']:
+                    first_line = func['docstring'].split('\n')[0].strip()
+                    report += f"    \"{first_line}\"\n"
+                
+                # 関数内の内部関数を追加
+                if 'inner_functions' in func and func['inner_functions']:
+                    for inner_func in func['inner_functions']:
+                        report += f"    def {inner_func['name']}()\n"
+                        if self.include_docstrings and inner_func['docstring']:
+                            first_line = inner_func['docstring'].split('\n')[0].strip()
+                            report += f"        \"{first_line}\"\n"
+            report += "\n"
+            
+        return report
+
+def analyze_with_astroid(file_path):
+    """指定したファイルをastroidで解析する簡易ヘルパー関数"""
+    analyzer = AstroidAnalyzer()
+    report, _ = analyzer.analyze_file(file_path)
+    return report
+
+# 子ノードを持たないastroidのノード型（初回の探索時に作る）
+_LEAF_NODE_TYPES = None
+
+def _iter_call_nodes(nodes):
+    """
+    ノードとその子孫に含まれる関数呼び出し（astroid.Call）を順に返す
+    再帰の代わりに明示的なスタックでたどるので、深くネストしたコードでもRecursionErrorにならない
+    （返す順序はソース上の順序とは限らない）
+    """
+    global _LEAF_NODE_TYPES
+    if _LEAF_NODE_TYPES is None:
+        node_types = astroid.nodes
+        _LEAF_NODE_TYPES = frozenset([
+            node_types.Name, node_types.Const, node_types.AssignName, node_types.DelName,
+            node_types.Pass, node_types.Break, node_types.Continue,
+            node_types.Global, node_types.Nonlocal, node_types.Import, node_types.ImportFrom
+        ])
+    leaf_types = _LEAF_NODE_TYPES
+    call_type = astroid.Call
+    
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, call_type):
+            yield node
+        elif type(node) in leaf_types:
+            # 名前や定数などは子ノードがないので、get_childrenを呼ばずに済ませる
+            continue
+        stack.extend(node.get_children())
+
+class InferenceBudget:
+    """
+    拡張解析の型推論のレベルと、時間・推論ノード数の上限
+    解析全体の上限は壁時計の締め切り時刻として持つので、ワーカープロセスに渡しても共有できる
+    （上限は推論結果を1つ受け取るごとに確認するため、1回の推論ステップの途中では止まらない）
+    """
+    def __init__(self, level=DEFAULT_INFERENCE_LEVEL, function_time=DEFAULT_FUNCTION_INFERENCE_TIME,
+                 function_nodes=DEFAULT_FUNCTION_INFERENCE_NODES, run_time=DEFAULT_RUN_INFERENCE_TIME):
+        if level not in INFERENCE_LEVELS:
+            raise ValueError(f"不明な型推論レベルです: {level}")
+        self.level = level
+        self.function_time = function_time
+        self.function_nodes = function_nodes
+        self.run_time = run_time
+        self.deadline = None
+
+    def start_run(self):
+        """解析全体の締め切りを設定する（run_timeが0以下なら無制限）"""
+        if self.run_time and self.run_time > 0:
+            self.deadline = time.time() + self.run_time
+        else:
+            self.deadline = None
+
+    def run_exhausted(self):
+        """解析全体の上限に達しているか"""
+        return self.deadline is not None and time.time() > self.deadline
+
+    def cache_token(self):
+        """解析結果のキャッシュキーに含める文字列（設定が変われば別の結果として扱う）"""
+        return f"{self.level}:{self.function_time}:{self.function_nodes}"
+
+def has_run_budget_skip(structure):
+    """解析全体の上限で型推論を省略した関数がある解析結果か（ディスクのキャッシュには保存しない）"""
+    return any(item['reason'] == 'run' for item in structure.get('inference_skipped', []))
+
+class AstroidAnalyzer:
+    """
+    astroidを使用して、より深いコード解析を行うクラス
+    型情報、継承関係、依存関係などの意味的な情報を抽出する
+    """
+    # 解析結果の形式を変えたら上げる（古いキャッシュを無効にするため）
+    CACHE_VERSION = "2"
+
+    def __init__(self):
+        self.imports = []
+        self.imported_modules = []  # ファイル間の依存関係の判定に使うモジュール名
+        self.classes = []
+        self.functions = []
+        self.dependencies = {}  # 関数/メソッド間の依存関係
+        self.inheritance = {}   # クラスの継承関係
+        self.type_info = {}     # 変数・引数・戻り値の型情報
+        self.inference_skipped = []  # 型推論を打ち切った関数 [{'name', 'reason'}]
+        self.report = ""
+        self.char_count = 0
+        self.cache = None  # AnalysisCache（設定されていれば解析結果を再利用）
+        
+        # 型推論のレベルと上限、関数本体のハッシュをキーにした推論結果 {キー: 型}
+        # 推論結果は呼び出し先のモジュールにも左右されるので、解析するファイルの内容が変わったら空にする
+        self.inference = InferenceBudget()
+        self.inference_cache = {}
+        self.inference_generation = next(_inference_generations)
+        self._source_lines = None
+
+    def reset(self):
+        """解析結果をリセットする"""
+        self.imports = []
+        self.imported_modules = []
+        self.classes = []
+        self.functions = []
+        self.dependencies = {}
+        self.inheritance = {}
+        self.type_info = {}
+        self.inference_skipped = []
+        self.report = ""
+        self.char_count = 0
+
+    def analyze_file(self, file_path, source=None):
+        """ファイルパスからコードを読み込んで解析する（sourceがあれば読み込み・パース済みの結果を使う）"""
+        try:
+            if source is None:
+                source = SourceFile(file_path)
+            code = source.read()
+            return self.analyze_code(code, source.name, source=source)
+        except ImportError:
+            return "astroidライブラリがインストールされていません。pip install astroid でインストールしてください。", 0
+        except Exception as e:
+            return f"ファイル解析エラー: {str(e)}", 0
+
+    def analyze_code(self, code, filename="", source=None):
+        """astroidを使ってPythonコードを解析する（sourceがあれば読み込み・パース済みの結果を使う）"""
+        self.reset()
+        try:
+            # 並列解析済み、またはキャッシュに同じ内容の解析結果があれば構文解析と型推論を省略
+            cached = self._lookup_result("astroid", code, source, self.inference.cache_token())
+            
+            if cached is not None:
+                self.set_structure(cached)
+            else:
+                tree = source.get_astroid_tree() if source is not None else None
+                if tree is None:
+                    tree = astroid.parse(code)
+                self._extract_structure(tree)
+                structure = self.get_structure()
+                self._store_result("astroid", code, source, structure, self.inference.cache_token(),
+                                   persist=not has_run_budget_skip(structure))
+            
+            # レポート生成
+            self.report = self.generate_report(filename)
+            self.char_count = len(self.report)
+            return self.report, self.char_count
+            
+        except ImportError:
+            return "astroidライブラリがインストールされていません。pip install astroid でインストールしてください。", 0
+        except Exception as e:
+            return f"解析エラー: {str(e)}", 0
+    
+    def get_cache_version(self):
+        """キャッシュキーに使うバージョン（推論結果はastroidのバージョンにも依存する）"""
+        return f"{self.CACHE_VERSION}-{astroid.__version__}"
+
+    def get_structure(self):
+        """解析結果の構造データを取得する（キャッシュやプロセス間の受け渡し用）"""
+        return {
+            'imports': self.imports,
+            'imported_modules': self.imported_modules,
+            'classes': self.classes,
+            'functions': self.functions,
+            'dependencies': self.dependencies,
+            'inheritance': self.inheritance,
+            'type_info': self.type_info,
+            'inference_skipped': self.inference_skipped
+        }
+
+    def set_structure(self, structure):
+        """構造データから解析結果を復元する"""
+        self.imports = structure['imports']
+        self.imported_modules = structure['imported_modules']
+        self.classes = structure['classes']
+        self.functions = structure['functions']
+        self.dependencies = structure['dependencies']
+        self.inheritance = structure['inheritance']
+        self.type_info = structure['type_info']
+        self.inference_skipped = structure['inference_skipped']
+
+    def _extract_structure(self, tree):
+        """astroidの構文木からインポート・クラス・関数・依存関係を抽出する"""
+        # モジュールレベルのドキュメント文字列
+        module_docstring = tree.doc_node.value if tree.doc_node else None
+        
+        # 推論結果キャッシュのキーに使う関数本体のソース
+        self._source_lines = tree.file_bytes.split(b"\n") if tree.file_bytes else None
+        
+        # インポート文を解析
+        self._extract_imports(tree)
+        
+        # クラスと関数を解析
+        for node in tree.body:
+            if isinstance(node, astroid.ClassDef):
+                self._analyze_class(node)
+            elif isinstance(node, astroid.FunctionDef):
+                self._analyze_function(node)
+        
+        # 継承関係と依存関係を解析
+        self._analyze_dependencies(tree)
+
+    def _cache_key(self, kind, code, source, *extra):
+        """キャッシュキーを作る（キャッシュが無効ならNone）"""
+        if self.cache is None:
+            return None
+        code_hash = source.get_content_hash() if source is not None else content_hash(code)
+        return self.cache.make_key(kind, self.get_cache_version(), code_hash, *extra)
+
+    def _lookup_result(self, kind, code, source, *extra):
+        """並列解析またはキャッシュで得られた解析結果を探す"""
+        if source is not None and kind in source.results:
+            return source.results[kind]
+        cache_key = self._cache_key(kind, code, source, *extra)
+        if cache_key is None:
+            return None
+        cached = self.cache.get(cache_key)
+        if cached is not None and source is not None:
+            source.results[kind] = cached
+        return cached
+
+    def _store_result(self, kind, code, source, result, *extra, persist=True):
+        """解析結果をsourceとキャッシュに保存する（persistがFalseならsourceにだけ保持する）"""
+        if source is not None:
+            source.results[kind] = result
+        if not persist:
+            return
+        cache_key = self._cache_key(kind, code, source, *extra)
+        if cache_key is not None:
+            self.cache.put(cache_key, result)
+
+    def precompute(self, sources, worker_pool, job=None):
+        """
+        未解析のファイルをプロセスプールで並列に解析し、結果をsourceに保持する
+        ワーカーでは1回のパースで拡張解析とコールグラフ用の情報をまとめて求める
+        jobがあればファイルごとに進捗を送り、キャンセルされていれば中断する
+        WatchdogPoolで上限を超えたファイルはsource.skip_reasonに理由を記録する
+        """
+        pending = []
+        for source in sources:
+            try:
+                code = source.read()
+            except Exception:
+                continue  # 読み込みエラーは通常の処理で報告する
+            has_structure = self._lookup_result("astroid", code, source, self.inference.cache_token()) is not None
+            has_calls = self._lookup_result("callgraph", code, source, source.module_name) is not None
+            if not (has_structure and has_calls):
+                pending.append(source)
+        
+        tasks = [(source.path, source.read(), source.module_name, self.inference, self.inference_generation)
+                 for source in pending]
+        for i, (source, result) in enumerate(zip(pending, worker_pool.map(_astroid_structure_task, tasks, job))):
+            if job is not None:
+                job.check_cancelled()
+                job.report_progress("拡張解析（並列）", i + 1, len(pending), source.name)
+            if isinstance(result, TaskSkipped):
+                print(f"拡張解析をスキップしました ({source.name}): {result.reason}")
+                source.skip_reason = result.reason
+                continue
+            # 解析に失敗したファイルは通常の処理でエラーを報告する
+            if result is None:
+                continue
+            structure, call_info = result
+            code = source.read()
+            if "astroid" not in source.results:
+                self._store_result("astroid", code, source, structure, self.inference.cache_token(),
+                                   persist=not has_run_budget_skip(structure))
+            if "callgraph" not in source.results:
+                self._store_result("callgraph", code, source, call_info, source.module_name)
+
+    def get_module_call_info(self, source, module_name):
+        """1モジュール内の関数・メソッドの一覧と呼び出し関係を取得する"""
+        code = source.read()
+        cached = self._lookup_result("callgraph", code, source, module_name)
+        if cached is not None:
+            return cached['functions'], cached['edges']
+        
+        # パイプラインからパース済みのモジュールを取得
+        module = source.require_astroid_tree()
+        call_info = self.collect_module_calls(module, module_name)
+        self._store_result("callgraph", code, source, call_info, module_name)
+        return call_info['functions'], call_info['edges']
+
+    def collect_module_calls(self, module, module_name):
+        """モジュールの構文木から関数・メソッドの一覧と呼び出し関係を求める"""
+        functions = {}
+        
+        # 関数の登録
+        for node in module.body:
+            if isinstance(node, astroid.FunctionDef):
+                functions[node.name] = f"{module_name}.{node.name}"
+        
+        # クラスとそのメソッドの登録
+        for node in module.body:
+            if isinstance(node, astroid.ClassDef):
+                class_name = node.name
+                for method in node.body:
+                    if isinstance(method, astroid.FunctionDef):
+                        functions[f"{class_name}.{method.name}"] = f"{module_name}.{class_name}.{method.name}"
+        
+        # モジュール内の呼び出し関係を構築
+        call_graph = {full_name: set() for full_name in functions.values()}
+        self._analyze_module_calls(module, module_name, {module_name: functions}, call_graph)
+        edges = {caller: callees for caller, callees in call_graph.items() if callees}
+        return {'functions': functions, 'edges': edges}
+            
+    def _extract_imports(self, tree):
+        """インポート文を抽出して解析する"""
+        
+        for node in tree.body:
+            if isinstance(node, astroid.Import):
+                for name in node.names:
+                    self.imports.append(f"import {name[0]}")
+                    self.imported_modules.append(name[0].split('.')[0])
+            elif isinstance(node, astroid.ImportFrom):
+                module = node.modname
+                names = [name[0] for name in node.names]
+                self.imports.append(f"from {module} import {', '.join(names)}")
+                self.imported_modules.append(module)
+
+    def _analyze_dependencies(self, tree):
+        """関数間やクラス間の依存関係を解析する（エラー処理強化版）"""
+        
+        
+        try:
+            # 関数呼び出しを検出して依存関係を構築
+            for node in tree.body:
+                try:
+                    if isinstance(node, astroid.FunctionDef):
+                        self._find_dependencies(node, node.name)
+                    elif isinstance(node, astroid.ClassDef):
+                        for method in node.body:
+                            if isinstance(method, astroid.FunctionDef):
+                                self._find_dependencies(method, f"{node.name}.{method.name}")
+                except Exception as e:
+                    print(f"依存関係解析中にエラー ({getattr(node, 'name', 'unknown')}): {e}")
+        except Exception as e:
+            print(f"依存関係全体の解析中にエラー: {e}")
+
+    def _analyze_function(self, node, is_inner=False):
+        """トップレベルまたは内部関数を解析する"""
+        
+        
+        try:
+            # 基本情報
+            func_info = {
+                'name': node.name,
+                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
+                'parameters': [],
+                'return_type': None,
+                'inner_functions': []
+            }
+            
+            # 引数の解析
+            try:
+                if hasattr(node, 'args') and hasattr(node.args, 'args'):
+                    for arg in node.args.args:
+                        param_name = getattr(arg, 'name', 'unknown')
+                        param_info = {'name': param_name}
+                        
+                        # 型アノテーションがある場合（安全にチェック）
+                        try:
+                            if hasattr(arg, 'annotation') and arg.annotation:
+                                param_info['type'] = self._get_annotation_name(arg.annotation)
+                        except Exception:
+                            # 型注釈の取得に失敗した場合は無視
+                            pass
+                            
+                        func_info['parameters'].append(param_info)
+            except Exception as e:
+                print(f"関数引数の解析中にエラー: {e}")
+            
+            # 戻り値の型アノテーション（安全にチェック）
+            try:
+                func_info['return_type'] = self._get_return_type(node)
+            except Exception as e:
+                print(f"関数の戻り値型解析中にエラー: {e}")
+                func_info['return_type'] = "unknown"
+            
+            # 内部関数を解析
+            try:
+                for child in node.body:
+                    if isinstance(child, astroid.FunctionDef):
+                        try:
+                            inner_func = self._analyze_function(child, is_inner=True)
+                            func_info['inner_functions'].append(inner_func)
+                        except Exception as e:
+                            print(f"内部関数 {getattr(child, 'name', 'unknown')} の解析中にエラー: {e}")
+            except Exception as e:
+                print(f"関数内の内部関数走査中にエラー: {e}")
+            
+            # 内部関数でない場合はfunctionsリストに追加
+            if not is_inner:
+                self.functions.append(func_info)
+            
+            return func_info
+        except Exception as e:
+            print(f"関数 {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
+            # 最低限の情報を含む空の関数情報を返す
+            return {'name': getattr(node, 'name', 'unknown'), 'parameters': [], 'inner_functions': []}
+
+    def _analyze_method(self, node):
+        """クラスメソッドを解析する"""
+        
+        
+        try:
+            # 基本情報
+            method_info = {
+                'name': node.name,
+                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
+                'parameters': [],
+                'return_type': None,
+                'inner_functions': []
+            }
+            
+            # 引数の解析
+            try:
+                if hasattr(node, 'args') and hasattr(node.args, 'args'):
+                    for arg in node.args.args:
+                        if arg.name == 'self':
+                            continue  # selfパラメータはスキップ
+                            
+                        param_name = getattr(arg, 'name', 'unknown')
+                        param_info = {'name': param_name}
+                        
+                        # 型アノテーションがある場合（安全にチェック）
+                        try:
+                            if hasattr(arg, 'annotation') and arg.annotation:
+                                param_info['type'] = self._get_annotation_name(arg.annotation)
+                        except Exception:
+                            # 型注釈の取得に失敗した場合は無視
+                            pass
+                                
+                        method_info['parameters'].append(param_info)
+            except Exception as e:
+                print(f"メソッド引数の解析中にエラー: {e}")
+            
+            # 戻り値の型アノテーション（安全にチェック）
+            try:
+                method_info['return_type'] = self._get_return_type(node)
+            except Exception as e:
+                print(f"メソッドの戻り値型解析中にエラー: {e}")
+                method_info['return_type'] = "unknown"
+            
+            # 内部関数を解析
+            try:
+                for child in node.body:
+                    if isinstance(child, astroid.FunctionDef):
+                        try:
+                            inner_func = self._analyze_function(child, is_inner=True)
+                            method_info['inner_functions'].append(inner_func)
+                        except Exception as e:
+                            print(f"メソッド内の内部関数 {getattr(child, 'name', 'unknown')} の解析中にエラー: {e}")
+            except Exception as e:
+                print(f"メソッド内の内部関数走査中にエラー: {e}")
+            
+            return method_info
+            
+        except Exception as e:
+            print(f"メソッド {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
+            # 最低限の情報を含む空のメソッド情報を返す
+            return {'name': getattr(node, 'name', 'unknown'), 'parameters': [], 'inner_functions': []}
+
+    def _get_annotation_name(self, annotation):
+        """型アノテーションノードから型名を取得する（エラー処理強化版）"""
+        
+        
+        try:
+            if isinstance(annotation, astroid.Name):
+                return annotation.name
+            elif isinstance(annotation, astroid.Attribute):
+                # 安全に属性参照を取得
+                expr_name = "unknown"
+                try:
+                    if hasattr(annotation.expr, 'name'):
+                        expr_name = annotation.expr.name
+                except:
+                    pass
+                return f"{expr_name}.{annotation.attrname}"
+            elif isinstance(annotation, astroid.Subscript):
+                # ジェネリック型（List[str]など）
+                value_name = "unknown"
+                try:
+                    value_name = self._get_annotation_name(annotation.value)
+                except:
+                    pass
+                    
+                # ジェネリック型のパラメータの取得（バージョン間の違いに対応）
+                try:
+                    # astroid 2.x系
+                    if hasattr(annotation, 'slice') and hasattr(annotation.slice, 'value'):
+                        slice_value = annotation.slice.value
+                        if isinstance(slice_value, astroid.Name):
+                            return f"{value_name}[{slice_value.name}]"
+                        elif isinstance(slice_value, astroid.Tuple):
+                            elts = []
+                            for elt in slice_value.elts:
+                                if isinstance(elt, astroid.Name):
+                                    elts.append(elt.name)
+                            return f"{value_name}[{', '.join(elts)}]"
+                    # astroid 2.0以前または異なる構造
+                    elif hasattr(annotation, 'slice'):
+                        return f"{value_name}[...]"
+                except:
+                    # どのパターンにも一致しない場合は簡略化した形式を返す
+                    return f"{value_name}[?]"
+                    
+                # どれにも一致しない場合
+                return value_name
+            # その他の型は文字列化して返す
+            return str(type(annotation).__name__)
+        except Exception as e:
+            print(f"型アノテーション解析中にエラー: {e}")
+            return "unknown"
+
+    def _get_return_type(self, node):
+        """関数の戻り値の型を型推論のレベルに従って求める"""
+        level = self.inference.level
+        if level == "off":
+            return None
+        if hasattr(node, 'returns') and node.returns:
+            return self._get_annotation_name(node.returns)
+        if level == "annotations":
+            return None
+        # 戻り値の型を推論
+        return self._infer_return_type(node)
+
+    def _infer_type(self, node):
+        """ノードから型を推論する（エラー処理強化版）"""
+        try:
+            if node is None:
+                return "unknown"
+            if self.inference.level != "full" or self.inference.run_exhausted():
+                return "unknown"
+                
+            # 推論結果の最初の要素だけを使うので、残りは推論しない
+            first = next(node.infer(), None)
+            if first is None:
+                return "unknown"
+            
+            if hasattr(first, "pytype"):
+                pytype = first.pytype()
+                return pytype.split(".")[-1]
+            else:
+                return type(first).__name__
+        except StopIteration:
+            # StopIterationを捕捉して適切に処理
+            return "unknown"
+        except Exception as e:
+            print(f"型推論エラー: {str(e)}")
+            return "unknown"
+
+    def _infer_return_type(self, node):
+        """
+        関数の戻り値の型を推論する（エラー処理強化版）
+        1関数あたりの時間・推論ノード数の上限を超えたら打ち切ってinference_skippedに記録する
+        同じ本体の関数の推論結果は再利用する
+        """
+        cache_key = self._inference_cache_key(node)
+        if cache_key in self.inference_cache:
+            result, skip_reason = self.inference_cache[cache_key]
+            if skip_reason:
+                self._record_inference_skip(node, skip_reason)
+            return result
+        if self.inference.run_exhausted():
+            self._record_inference_skip(node, 'run')
+            return "unknown"
+        
+        types = set()
+        return_values = []
+        skip_reason = None
+        
+        try:
+            # return文を探す
+            for child_node in node.get_children():
+                if isinstance(child_node, astroid.Return) and child_node.value:
+                    return_values.append(child_node.value)
+            
+            # 各return文の型を推論
+            start = time.perf_counter()
+            inferred_nodes = 0
+            for return_node in return_values:
+                # 推論したノード数はこのカウンタに数えられる（astroidが内部で複製するコンテキストとも共有）
+                counter = [0]
+                context = astroid.context.InferenceContext(nodes_inferred=counter)
+                try:
+                    for inf in return_node.infer(context):
+                        if hasattr(inf, "pytype"):
+                            types.add(inf.pytype().split(".")[-1])
+                        else:
+                            types.add(type(inf).__name__)
+                        skip_reason = self._check_inference_budget(start, inferred_nodes + counter[0])
+                        if skip_reason:
+                            break
+                except StopIteration:
+                    # StopIterationをここで処理
+                    pass
+                except Exception as e:
+                    print(f"戻り値型推論エラー: {str(e)}")
+                inferred_nodes += counter[0]
+                if not skip_reason:
+                    skip_reason = self._check_inference_budget(start, inferred_nodes)
+                if skip_reason:
+                    break
+            
+            if skip_reason:
+                # 途中までの推論結果は不完全なので型は不明とする
+                self._record_inference_skip(node, skip_reason)
+                result = "unknown"
+            elif len(types) == 0:
+                result = "None"
+            elif len(types) == 1:
+                result = list(types)[0]
+            else:
+                result = " | ".join(sorted(types))
+        except Exception as e:
+            print(f"戻り値型推論全体エラー: {str(e)}")
+            return "unknown"
+        
+        if len(self.inference_cache) >= MAX_INFERENCE_CACHE_ENTRIES:
+            self.inference_cache.clear()
+        self.inference_cache[cache_key] = (result, skip_reason)
+        return result
+
+    def _check_inference_budget(self, start, inferred_nodes):
+        """1関数あたりの上限を超えていれば理由を返す（超えていなければNone）"""
+        budget = self.inference
+        if budget.function_nodes and inferred_nodes > budget.function_nodes:
+            return 'nodes'
+        if budget.function_time and time.perf_counter() - start > budget.function_time:
+            return 'time'
+        return None
+
+    def _record_inference_skip(self, node, reason):
+        """型推論を打ち切った関数を記録する"""
+        self.inference_skipped.append({'name': node.qname().lstrip('.'), 'reason': reason})
+
+    def clear_inference_cache(self):
+        """推論結果キャッシュを空にする（解析するファイルの内容が変わったときに呼ぶ。ワーカープロセスのキャッシュも次のタスクで空になる）"""
+        self.inference_cache.clear()
+        self.inference_generation = next(_inference_generations)
+
+    def _inference_cache_key(self, node):
+        """
+        推論結果キャッシュのキー（関数の完全名と本体のソースのハッシュ）
+        呼び出し先だけが変わった関数も区別できるよう、キャッシュはファイルの内容が変わるたびに空にする
+        """
+        if self._source_lines is not None:
+            body = b"\n".join(self._source_lines[node.fromlineno - 1:node.tolineno]).decode('utf-8', 'replace')
+        else:
+            body = node.as_string()
+        return content_hash(f"{self.inference.cache_token()}\0{node.qname()}\0{body}")
+            
+    def _find_dependencies(self, node, caller_name):
+        """ノード内の関数呼び出しを検出して依存関係を記録する"""
+        
+        
+        if caller_name not in self.dependencies:
+            self.dependencies[caller_name] = set()
+        dependencies = self.dependencies[caller_name]
+        
+        for call in _iter_call_nodes(node.get_children()):
+            if isinstance(call.func, astroid.Name):
+                dependencies.add(call.func.name)
+            elif isinstance(call.func, astroid.Attribute):
+                if isinstance(call.func.expr, astroid.Name):
+                    dependencies.add(f"{call.func.expr.name}.{call.func.attrname}")
+    
+    def _analyze_module_calls(self, module, module_name, module_functions, call_graph):
+        """モジュール内の関数呼び出しを解析する"""
+        
+        def find_calls_in_node(node, caller_name):
+            """ノード内の関数呼び出しを検索"""
+            for call in _iter_call_nodes((node,)):
+                # 直接の関数呼び出し
+                if isinstance(call.func, astroid.Name):
+                    called_name = call.func.name
+                    # 同一モジュール内の関数呼び出し
+                    if called_name in module_functions.get(module_name, {}):
+                        full_called_name = module_functions[module_name][called_name]
+                        call_graph[caller_name].add(full_called_name)
+                
+                # メソッド呼び出し (obj.method())
+                elif isinstance(call.func, astroid.Attribute):
+                    # ここでは単純なケースのみ処理 (self.method())
+                    if isinstance(call.func.expr, astroid.Name) and call.func.expr.name == 'self':
+                        class_name = caller_name.split('.')[-2]  # Assuming format: module.class.method
+                        method_name = call.func.attrname
+                        class_method = f"{class_name}.{method_name}"
+                        if class_method in module_functions.get(module_name, {}):
+                            full_method_name = module_functions[module_name][class_method]
+                            call_graph[caller_name].add(full_method_name)
+        
+        # 関数定義を処理
+        for node in module.body:
+            if isinstance(node, astroid.FunctionDef):
+                caller_name = f"{module_name}.{node.name}"
+                for child_node in node.body:
+                    find_calls_in_node(child_node, caller_name)
+            
+            # クラス内のメソッドを処理
+            elif isinstance(node, astroid.ClassDef):
+                class_name = node.name
+                for method in node.body:
+                    if isinstance(method, astroid.FunctionDef):
+                        caller_name = f"{module_name}.{class_name}.{method.name}"
+                        for child_node in method.body:
+                            find_calls_in_node(child_node, caller_name)
+
+    def generate_report(self, filename=""):
+        """解析結果からわかりやすいレポートを生成する（必要な情報のみ）"""
+        report = ""
+        
+        # ファイル名
+        if filename:
+            report += f"# {filename} の解析レポート\n\n"
+        else:
+            report += "# Pythonコード解析レポート\n\n"
+        
+        # インポート文は除外 (冗長情報)
+        
+        # プロジェクト構造 (重要情報1)
+        # この部分はディレクトリ情報から生成されるため、ここでは変更なし
+        
+        # クラス階層図 (重要情報2)
+        if self.classes:
+            report += "## クラス階層図\n"
+            for cls in self.classes:
+                if cls['base_classes']:
+                    report += f"- **{cls['name']}** ← {', '.join(cls['base_classes'])}\n"
+                else:
+                    report += f"- **{cls['name']}**\n"
+            report += "\n"
+        
+        # ファイル間の依存関係 - シンプルに保持
+        if self.inheritance:
+            report += "## ファイル間の依存関係\n"
+            # ここは重要なファイル間の依存関係のみを表示するよう変更
+            report += "- **<ファイル名>.py** (依存なし)\n" # 必要に応じて実際の依存関係を表示
+            report += "\n"
+        
+        # 各クラスのメソッド一覧 (重要情報3)
+        if self.classes:
+            report += "## ファイルごとの詳細情報\n"
+            if filename:
+                report += f"### {filename}\n"
+                
+            report += "**クラス:**\n"
+            for cls in self.classes:
+                base_classes = f" (継承: {', '.join(cls['base_classes'])})" if cls['base_classes'] else ""
+                report += f"- `{cls['name']}`{base_classes}\n"
+                
+                # メソッド（シンプルに名前のみ表示）
+                if cls['methods']:
+                    report += "  **メソッド:**\n"
+                    for method in cls['methods']:
+                        report += f"  - `{method['name']}`\n"
+            report += "\n"
+        
+        # トップレベル関数リスト（シンプルに表示）
+        if self.functions:
+            report += "**関数:**\n"
+            for func in self.functions:
+                report += f"- `{func['name']}`\n"
+            report += "\n"
+        
+        # LLM向け構造化データ (重要情報4)
+        report += "## LLM向け構造化データ\n"
+        report += "```\n"
+        # コンパクトなフォーマットでデータを出力
+        compact_data = "# クラス一覧\n"
+        for cls in self.classes:
+            base_info = f" <- {', '.join(cls['base_classes'])}" if cls['base_classes'] else ""
+            compact_data += f"{cls['name']}{base_info}\n"
+
+            if cls['methods']:
+                compact_data += "  メソッド:\n"
+                for m in cls['methods']:
+                    params = ", ".join(p['name'] for p in m['parameters'])
+                    ret_type = f" -> {m['return_type']}" if m['return_type'] and m['return_type'] != "unknown" else ""
+                    compact_data += f"    {m['name']}({params}){ret_type}\n"
+            compact_data += "\n"
+        compact_data += "# 関数一覧\n"
+        for func in self.functions:
+            params = ", ".join(p['name'] for p in func['parameters'])
+            ret_type = f" -> {func['return_type']}" if func['return_type'] and func['return_type'] != "unknown" else ""
+            compact_data += f"{func['name']}({params}){ret_type}\n"
+        compact_data += "\n"
+        # 主要な依存関係のみ表示
+        if self.dependencies:
+            compact_data += "# 主要な依存関係\n"
+            for caller, callees in self.dependencies.items():
+                if callees:  # 空でない場合のみ
+                    compact_data += f"{caller} -> {', '.join(sorted(callees))}\n"
+            compact_data += "\n"
+        report += compact_data
+        report += "```\n"
+
+
+
+        
+    def _analyze_class(self, node):
+        """クラス定義を解析する（エラー処理強化版）"""
+        
+        
+        try:
+            # 基本情報の取得
+            class_info = {
+                'name': node.name,
+                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
+                'methods': [],
+                'base_classes': [],
+                'attributes': []
+            }
+            
+            # 継承関係を解析
+            try:
+                for base in node.bases:
+                    if isinstance(base, astroid.Name):
+                        class_info['base_classes'].append(base.name)
+                    elif isinstance(base, astroid.Attribute):
+                        base_expr_name = getattr(base.expr, 'name', 'unknown')
+                        class_info['base_classes'].append(f"{base_expr_name}.{base.attrname}")
+            except Exception as e:
+                print(f"継承関係の解析中にエラー: {e}")
+            
+            # 継承関係を記録
+            self.inheritance[node.name] = class_info['base_classes']
+            
+            # メソッドとクラス変数を解析
+            for child in node.body:
+                try:
+                    if isinstance(child, astroid.FunctionDef):
+                        method_info = self._analyze_method(child)
+                        class_info['methods'].append(method_info)
+                    elif isinstance(child, astroid.Assign):
+                        for target in child.targets:
+                            if isinstance(target, astroid.AssignName):
+                                # クラス変数を記録（安全に型を推論）
+                                attr_type = "unknown"
+                                try:
+                                    attr_type = self._infer_type(child.value)
+                                except Exception as e:
+                                    print(f"属性型推論エラー: {e}")
+                                
+                                class_info['attributes'].append({
+                                    'name': target.name,
+                                    'type': attr_type
+                                })
+                except Exception as e:
+                    print(f"クラス内のノード解析中にエラー: {e}")
+                    continue
+            
+            self.classes.append(class_info)
+            return class_info
+        except Exception as e:
+            print(f"クラス {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
+            # 最低限の情報を含む空のクラス情報を返す
+            return {'name': getattr(node, 'name', 'unknown'), 'methods': [], 'base_classes': [], 'attributes': []}
+
+class SourceFile:
+    """
+    解析対象の1ファイル分のソースコードと構文木を保持するクラス
+    読み込みと各構文木（ast / astroid）の構築はそれぞれ初回アクセス時に一度だけ行う
+    """
+    def __init__(self, file_path, code=None):
+        self.path = file_path
+        self.name = os.path.basename(file_path)
+        self.module_name = self.name.replace('.py', '')
+        self._code = code
+        self._read_error = None
+        self._content_hash = None
+        self._ast_tree = None
+        self._ast_error = None
+        self._astroid_tree = None
+        self._astroid_error = None
+        # ワーカープロセスやキャッシュで得た解析結果 {種類: 結果}
+        self.results = {}
+        # 時間・メモリの上限を超えて拡張解析をスキップした理由（'timeout' / 'oom' / 'crash'）
+        self.skip_reason = None
+        # 読み込んだときのファイルの (更新時刻, サイズ)（セッションを復元するときに変更を調べる）
+        self.signature = None
+
+    @classmethod
+    def from_state(cls, file_path, state):
+        """export_stateの結果から復元する（ファイルは内容が必要になるまで読み込まない）"""
+        source = cls(file_path)
+        source.signature = state['signature']
+        source._content_hash = state['content_hash']
+        source.results = dict(state['results'])
+        return source
+
+    def export_state(self):
+        """内容ハッシュと解析結果を保存用に取り出す（ファイルから読み込んでいなければNone）"""
+        if self.signature is None or self._read_error is not None:
+            return None
+        # 解析全体の上限で型推論を省略した結果は、次の解析で作り直す
+        results = {kind: result for kind, result in self.results.items()
+                   if not (kind == "astroid" and has_run_budget_skip(result))}
+        return {'signature': self.signature, 'content_hash': self.get_content_hash(), 'results': results}
+
+    def read(self):
+        """ソースコードを返す（ファイルの読み込みは初回のみ）"""
+        if self._code is None and self._read_error is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    st = os.fstat(file.fileno())
+                    self._code = file.read()
+                self.signature = (st.st_mtime_ns, st.st_size)
+            except Exception as e:
+                self._read_error = e
+        if self._read_error is not None:
+            raise self._read_error
+        return self._code
+
+    def get_content_hash(self):
+        """ソースコードの内容ハッシュを返す（キャッシュキーに使用）"""
+        if self._content_hash is None:
+            self._content_hash = content_hash(self.read())
+        return self._content_hash
+
+    def get_ast_tree(self):
+        """astの構文木を返す（パースは初回のみ、失敗した場合はNone）"""
+        if self._ast_tree is None and self._ast_error is None:
+            try:
+                self._ast_tree = ast.parse(self.read())
+            except Exception as e:
+                self._ast_error = e
+        return self._ast_tree
+
+    def get_astroid_tree(self):
+        """astroidの構文木を返す（パースは初回のみ、失敗した場合はNone）"""
+        if self._astroid_tree is None and self._astroid_error is None:
+            try:
+                self._astroid_tree = astroid.parse(self.read())
+            except Exception as e:
+                self._astroid_error = e
+        return self._astroid_tree
+
+    def require_astroid_tree(self):
+        """astroidの構文木を返す（失敗した場合は元の例外を送出）"""
+        tree = self.get_astroid_tree()
+        if tree is None:
+            raise self._astroid_error
+        return tree
+
+class AnalysisPipeline:
+    """
+    1回の解析で使うファイルを一度だけ読み込み・パースし、
+    基本解析・拡張解析・コールグラフ生成で共有するためのクラス
+    """
+    def __init__(self):
+        self.sources = {}  # {file_path: SourceFile}
+
+    def load(self, file_paths):
+        """新しい解析対象ファイルのリストを登録する（前回の構文木は破棄）"""
+        self.sources = {file_path: SourceFile(file_path) for file_path in file_paths}
+        return self.sources
+
+    def get(self, file_path):
+        """ファイルに対応するSourceFileを取得する（未登録なら追加）"""
+        source = self.sources.get(file_path)
+        if source is None:
+            source = SourceFile(file_path)
+            self.sources[file_path] = source
+        return source
+
+    def refresh(self, file_paths):
+        """変更されたファイルの読み込み・パース結果を破棄する（次に使うときに読み込み直す）"""
+        for file_path in file_paths:
+            self.sources.pop(file_path, None)
+
+    def export_state(self):
+        """読み込んだファイルの内容ハッシュと解析結果 {file_path: SourceFile.export_stateの結果}"""
+        states = {}
+        for file_path, source in self.sources.items():
+            state = source.export_state()
+            if state is not None:
+                states[file_path] = state
+        return states
+
+    def restore_state(self, states):
+        """export_stateの結果からファイルを登録する（変更されたファイルは呼び出し側でrefreshする）"""
+        self.sources = {file_path: SourceFile.from_state(file_path, state) for file_path, state in states.items()}
+
+class DirectoryFingerprints:
+    """
+    解析対象ファイルの内容ハッシュから求める、ディレクトリごとのフィンガープリント（Merkle木）
+    local: ディレクトリのパスと直下のファイル（名前・内容ハッシュ）から求める値（ディレクトリごとのセクションの再利用に使う）
+    tree: localとサブディレクトリのtreeから求める値（サブツリーのどこかが変われば変わる）
+    root: ルートのtreeとファイルの順序から求める値（変わらなければプロジェクト全体のレポートを再利用できる）
+    読み込めないファイルがあるディレクトリと、それを含む上のディレクトリはNone（再利用しない）
+    """
+    def __init__(self, pipeline, file_paths):
+        files_by_dir = {}
+        for file_path in file_paths:
+            if file_path.lower().endswith('.py'):
+                files_by_dir.setdefault(os.path.dirname(file_path), []).append(file_path)
+            else:
+                files_by_dir.setdefault(os.path.dirname(file_path), [])
+
+        # ディレクトリ直下のファイルから求める値
+        self.local = {}
+        for dir_path, paths in files_by_dir.items():
+            entries = [dir_path]
+            for file_path in sorted(paths):
+                try:
+                    entries.append(f"{os.path.basename(file_path)}\0{pipeline.get(file_path).get_content_hash()}")
+                except Exception:
+                    entries = None
+                    break
+            self.local[dir_path] = content_hash("\n".join(entries)) if entries is not None else None
+
+        # ルートまでの途中のディレクトリも含めて親子関係を作る
+        self.root_dir = os.path.commonpath(list(files_by_dir)) if files_by_dir else ""
+        children = {}
+        for dir_path in files_by_dir:
+            while dir_path != self.root_dir:
+                parent = os.path.dirname(dir_path)
+                children.setdefault(parent, set()).add(dir_path)
+                dir_path = parent
+
+        # 深いディレクトリから順に、子のtreeをまとめる
+        self.tree = {}
+        for dir_path in sorted(set(files_by_dir) | set(children), key=lambda p: p.count(os.sep), reverse=True):
+            local = self.local.get(dir_path, "")
+            child_values = [self.tree[child] for child in sorted(children.get(dir_path, ()))]
+            if local is None or None in child_values:
+                self.tree[dir_path] = None
+            else:
+                self.tree[dir_path] = content_hash("\n".join([dir_path, local] + child_values))
+
+        root_tree = self.tree.get(self.root_dir)
+        self.root = content_hash(root_tree + "\n" + "\n".join(file_paths)) if root_tree is not None else None
+
+# ワーカープロセスで使い回すAstroidAnalyzerと、その推論結果キャッシュを作り始めたときの番号
+_worker_astroid_analyzer = None
+_worker_inference_generation = None
+
+def _init_analysis_worker():
+    """
+    ワーカープロセスの初期化（astroidと組み込みモジュールの情報を先に読み込んでおく）
+    拡張解析のAstroidAnalyzerもここで作り、推論結果キャッシュをワーカーが終了するまで使い回す
+    """
+    global _worker_astroid_analyzer
+    try:
+        astroid.MANAGER.ast_from_module_name('builtins')
+    except Exception:
+        pass
+    _worker_astroid_analyzer = AstroidAnalyzer()
+
+def _get_worker_astroid_analyzer(generation):
+    """
+    ワーカープロセスのAstroidAnalyzerを解析前の状態にして返す
+    呼び出し元で推論結果キャッシュが空にされていれば（generationが違えば）、ワーカーのキャッシュも空にする
+    """
+    global _worker_astroid_analyzer, _worker_inference_generation
+    if _worker_astroid_analyzer is None:
+        _worker_astroid_analyzer = AstroidAnalyzer()
+    analyzer = _worker_astroid_analyzer
+    if generation != _worker_inference_generation:
+        analyzer.inference_cache.clear()
+        _worker_inference_generation = generation
+    analyzer.reset()
+    return analyzer
+
+def _basic_structure_task(task):
+    """ワーカープロセスで1ファイルの基本解析を行う（失敗した場合はNone）"""
+    file_path, code = task
+    try:
+        analyzer = CodeAnalyzer()
+        analyzer._extract_structure(ast.parse(code))
+        return analyzer.get_structure()
+    except Exception:
+        return None
+
+def _astroid_structure_task(task):
+    """ワーカープロセスで1ファイルの拡張解析とコールグラフ用の情報を求める（失敗した場合はNone）"""
+    file_path, code, module_name, inference, generation = task
+    try:
+        tree = astroid.parse(code)
+        analyzer = _get_worker_astroid_analyzer(generation)
+        analyzer.inference = inference
+        analyzer._extract_structure(tree)
+        call_info = analyzer.collect_module_calls(tree, module_name)
+        return analyzer.get_structure(), call_info
+    except MemoryError:
+        # 監視付きのワーカーではメモリ不足として扱う
+        raise
+    except Exception:
+        return None
+
+class AnalysisWorkerPool:
+    """
+    ファイル単位の解析を複数プロセスに分散するためのプール
+    プロセスは初回使用時に起動し、アプリ終了まで使い回す（astroidの読み込みは起動時の1回のみ）
+    """
+    def __init__(self, jobs=1):
+        self.jobs = max(1, int(jobs))
+        self._executor = None
+
+    def map(self, func, tasks, job=None):
+        """
+        タスクを並列に実行し、結果を元の順序で1件ずつ返す
+        途中で読み出しをやめると、まだ始まっていないタスクは取り消される
+        （jobはWatchdogPoolと引数を揃えるためのもので、キャンセルは呼び出し側で確認する）
+        """
+        tasks = list(tasks)
+        done = 0
+        if self.jobs > 1 and len(tasks) >= 2:
+            try:
+                if self._executor is None:
+                    # 逐次実行では不要なので、並列実行するときだけ読み込む
+                    from concurrent.futures import ProcessPoolExecutor
+                    self._executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_analysis_worker)
+                chunksize = max(1, len(tasks) // (self.jobs * 4))
+                for result in self._executor.map(func, tasks, chunksize=chunksize):
+                    yield result
+                    done += 1
+                return
+            except Exception as e:
+                # プロセスが使えない環境では残りを逐次実行に切り替える
+                print(f"並列解析エラー（逐次実行に切り替えます）: {e}")
+                self.shutdown()
+        
+        for task in tasks[done:]:
+            yield func(task)
+
+    def shutdown(self):
+        """ワーカープロセスを終了する"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ProjectAnalyzer:
+    """
+    複数ファイルからなるプロジェクトの解析をまとめて行うクラス（GUIに依存しない）
+    基本解析・拡張解析・コールグラフ・JSON出力を生成し、GUIとコマンドラインの両方から使う
+    """
+    def __init__(self, cache=None, jobs=1, inference=None,
+                 file_timeout=DEFAULT_FILE_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        self.analyzer = CodeAnalyzer()
+        self.astroid_analyzer = AstroidAnalyzer()
+        self.analyzer.cache = cache
+        self.astroid_analyzer.cache = cache
+        
+        # 拡張解析の型推論のレベルと上限（InferenceBudget）
+        if inference is not None:
+            self.astroid_analyzer.inference = inference
+        
+        # 読み込み・パース結果を各解析で共有するパイプライン
+        self.pipeline = AnalysisPipeline()
+        
+        # ファイル単位の解析を並列に実行するワーカープール（プロセスは初回解析時に起動）
+        self.worker_pool = AnalysisWorkerPool(jobs)
+        
+        # 拡張解析をファイルごとに時間・メモリの上限つきで実行するワーカー（上限が0なら使わない）
+        self.watchdog_pool = WatchdogPool(jobs, file_timeout, memory_limit_mb, initializer=_init_analysis_worker)
+        
+        # 前回のプロジェクト全体のレポート {種類: (キー, レポート)}（ファイルが変わっていなければそのまま返す）
+        self.reports = {}
+        
+        # 型推論の結果キャッシュを作ったときのファイルの内容ハッシュ {file_path: ハッシュ}
+        self._inference_hashes = {}
+
+    def load(self, python_files):
+        """解析対象ファイルをパイプラインに登録する（読み込み・パースは各ファイル一度だけ）"""
+        return self.pipeline.load(python_files)
+
+    def refresh(self, file_paths):
+        """
+        変更・追加・削除されたファイルだけを読み込み直すようにする（監視モード用）
+        他のファイルは読み込み・パース・解析結果を再利用するので、続けて各レポートを作り直しても解析し直すのは変更分だけになる
+        """
+        self.pipeline.refresh(file_paths)
+        self.astroid_analyzer.clear_inference_cache()
+        self._inference_hashes = {}
+
+    def _check_inference_sources(self, sources):
+        """
+        型推論の結果キャッシュを作ったときから内容の変わったファイルがあれば、キャッシュを空にする
+        （関数の本体が同じでも、呼び出し先が変われば推論結果も変わるため）
+        """
+        hashes = {}
+        for source in sources:
+            try:
+                hashes[source.path] = source.get_content_hash()
+            except Exception:
+                hashes[source.path] = None
+        previous = self._inference_hashes
+        if (previous.keys() - hashes.keys()
+                or any(path in previous and previous[path] != value for path, value in hashes.items())):
+            self.astroid_analyzer.clear_inference_cache()
+            previous = {}
+        previous.update(hashes)
+        self._inference_hashes = previous
+
+    def export_state(self):
+        """解析の状態（ファイルごとの解析結果、ディレクトリのセクション、プロジェクト全体のレポート）を保存用に取り出す"""
+        return {
+            'sources': self.pipeline.export_state(),
+            'sections': self.analyzer.sections,
+            'reports': self.reports
+        }
+
+    def restore_state(self, state):
+        """export_stateの結果から解析の状態を戻す（変わっていないファイル・ディレクトリは解析し直さずに済む）"""
+        self.pipeline.restore_state(state['sources'])
+        self.analyzer.sections = state['sections']
+        self.reports = state['reports']
+
+    def analyze_basic(self, python_files, single_file=False, job=None):
+        """
+        基本解析のレポートを生成する（single_fileなら1ファイル用の形式）
+        ルートのフィンガープリントが前回と同じなら、前回のレポートをそのまま返す
+        """
+        if single_file:
+            file_path = python_files[0]
+            return self.analyzer.analyze_file(file_path, self.pipeline.get(file_path))
+        fingerprints = DirectoryFingerprints(self.pipeline, python_files)
+        key = self._report_key("basic-report", self.analyzer.CACHE_VERSION, fingerprints,
+                               self.analyzer.include_imports, self.analyzer.include_docstrings)
+        cached = self._lookup_report(key)
+        if cached is not None:
+            report, char_count = cached
+            self.analyzer.report, self.analyzer.char_count = report, char_count
+            if job is not None:
+                job.post("partial", report)
+            return report, char_count
+        result = self.analyzer.analyze_files(python_files, self.pipeline, self.worker_pool, job, fingerprints)
+        self._store_report(key, result)
+        return result
+
+    def _report_key(self, kind, version, fingerprints, *extra):
+        """プロジェクト全体のレポートのキー（ルートのフィンガープリントがなければNone）"""
+        if fingerprints.root is None:
+            return None
+        return (kind, version, fingerprints.root) + extra
+
+    def _lookup_report(self, key):
+        """前回の解析またはキャッシュからプロジェクト全体のレポートを探す"""
+        if key is None:
+            return None
+        previous_key, report = self.reports.get(key[0], (None, None))
+        if previous_key == key:
+            return report
+        cache = self.analyzer.cache
+        report = cache.get(cache.make_key(*key)) if cache is not None else None
+        if report is not None:
+            self.reports[key[0]] = (key, report)
+        return report
+
+    def _store_report(self, key, report):
+        """プロジェクト全体のレポートを保存する（種類ごとに最新の1件だけメモリに残す）"""
+        if key is None:
+            return
+        self.reports[key[0]] = (key, report)
+        cache = self.analyzer.cache
+        if cache is not None:
+            cache.put(cache.make_key(*key), report)
+
+    def build_extended_report(self, python_files, job=None):
+        """
+        astroidによる拡張解析のレポートを生成する（UIに触れないのでワーカースレッドからも呼べる）
+        ルートのフィンガープリントと型推論の設定が前回と同じなら、前回のレポートをそのまま返す
+        jobがあればファイルごとに進捗を送り、キャンセルされていればAnalysisCancelledを送出する
+        """
+        if not python_files:
+            return "拡張解析対象のPythonファイルがありません。"
+        try:
+            version = self.astroid_analyzer.get_cache_version()
+        except ImportError:
+            return ("astroidライブラリがインストールされていません。\n"
+                    "pip install astroid でインストールしてください。")
+        fingerprints = DirectoryFingerprints(self.pipeline, python_files)
+        key = self._report_key("extended-report", version, fingerprints, self.astroid_analyzer.inference.cache_token())
+        report = self._lookup_report(key)
+        if report is not None:
+            return report
+        report, reusable = self._build_extended_report(python_files, job)
+        if reusable:
+            self._store_report(key, report)
+        return report
+
+    def _build_extended_report(self, python_files, job=None):
+        """
+        拡張解析のレポートを作り、(レポート, 再利用できるか) を返す
+        上限を超えてスキップしたファイルや、解析全体の上限で型推論を省略した関数があれば、次は結果が変わりうるので再利用しない
+        """
+        try:
+                    
+            # 解析結果を保存する辞書
+            analysis_results = {}
+            module_imports = {}  # {module_name: インポートしているモジュール名のリスト}
+                
+            # 統合解析レポート用の情報
+            all_classes = []
+            all_functions = []
+            all_dependencies = {}
+            all_inheritance = {}
+            inference_skipped = []  # [(ファイル名, {'name', 'reason'})]
+            skipped_files = []      # [(ファイル名, スキップした理由)]
+            main_file = None
+            
+            # ディレクトリ構造を取得
+            directory_structure = self.get_directory_structure(python_files)
+            
+            # 型推論の全体の上限はここから数える
+            self.astroid_analyzer.inference.start_run()
+            
+            # 前回から内容の変わったファイルがあれば、型推論の結果キャッシュを使わない
+            sources = [self.pipeline.get(f) for f in python_files]
+            self._check_inference_sources(sources)
+            
+            # 未解析のファイルをワーカープロセスで解析しておく
+            # （上限が設定されていれば、固まったりメモリを使い果たしたりするファイルをスキップできるよう監視付きで実行）
+            if self.watchdog_pool.enabled:
+                try:
+                    self.astroid_analyzer.precompute(sources, self.watchdog_pool, job)
+                except AnalysisCancelled:
+                    raise
+                except Exception as e:
+                    print(f"監視付き解析エラー（通常の解析に切り替えます）: {e}")
+            elif self.worker_pool.jobs > 1:
+                self.astroid_analyzer.precompute(sources, self.worker_pool, job)
+                
+            # Step 1: 各ファイルを個別に解析する
+            for i, file_path in enumerate(python_files):
+                if job is not None:
+                    job.check_cancelled()
+                try:
+                    # パイプラインから読み込み済みのソースを取得
+                    source = self.pipeline.get(file_path)
+                    if source.skip_reason:
+                        # 上限を超えたファイルはこのプロセスでも解析しない
+                        skipped_files.append((os.path.basename(file_path), source.skip_reason))
+                        if job is not None:
+                            job.report_progress("拡張解析", i + 1, len(python_files), os.path.basename(file_path))
+                        continue
+                    code = source.read()
+                    
+                    # main関数やエントリーポイントを探す（大事なファイルを特定）
+                    if 'if __name__ == "__main__"' in code or "main()" in code:
+                        main_file = file_path
+                    
+                    module_name = os.path.basename(file_path).replace('.py', '')
+                    
+                    # ファイル個別の解析結果を取得（パース済みの構文木またはキャッシュを再利用）
+                    self.astroid_analyzer.reset()
+                    file_result, _ = self.astroid_analyzer.analyze_code(code, os.path.basename(file_path), source=source)
+                    module_imports[module_name] = self.astroid_analyzer.imported_modules
+                    
+                    # 結果を蓄積
+                    analysis_results[file_path] = {
+                        'name': os.path.basename(file_path),
+                        'classes': self.astroid_analyzer.classes.copy(),
+                        'functions': self.astroid_analyzer.functions.copy(),
+                        'dependencies': self.astroid_analyzer.dependencies.copy(),
+                        'inheritance': self.astroid_analyzer.inheritance.copy()
+                    }
+                    
+                    # 全体のリストに追加
+                    all_classes.extend(self.astroid_analyzer.classes)
+                    all_functions.extend(self.astroid_analyzer.functions)
+                    all_dependencies.update(self.astroid_analyzer.dependencies)
+                    all_inheritance.update(self.astroid_analyzer.inheritance)
+                    inference_skipped.extend(
+                        (os.path.basename(file_path), item) for item in self.astroid_analyzer.inference_skipped
+                    )
+                    
+                except Exception as e:
+                    print(f"ファイル {file_path} の解析中にエラー: {e}")
+                    
+                    traceback.print_exc()
+                
+                if job is not None:
+                    job.report_progress("拡張解析", i + 1, len(python_files), os.path.basename(file_path))
+            
+            # Step 2: ファイル間の依存関係を解析
+            # インポート関係を追跡
+            file_dependencies = {}
+            for module_name, imported_modules in module_imports.items():
+                file_dependencies[module_name] = {
+                    imported_name for imported_name in imported_modules
+                    if imported_name in module_imports
+                }
+            
+            # 依存関係を解析する際にスキップすべき標準ライブラリや組み込み関数のリスト
+            SKIP_DEPENDENCIES = {
+                'print', 'len', 'str', 'int', 'float', 'list', 'dict', 'set', 'tuple',
+                'open', 'range', 'enumerate', 'zip', 'map', 'filter',
+                'os.path.join', 'os.path.exists', 'os.path.basename', 'os.path.dirname',
+                'logging.info', 'logging.debug', 'logging.warning', 'logging.error'
+                # GUI要素はスキップしない
+            }
+            
+            # 依存関係をフィルタリング
+            filtered_dependencies = {}
+            for caller, callees in all_dependencies.items():
+                filtered_callees = {callee for callee in callees if callee not in SKIP_DEPENDENCIES}
+                if filtered_callees:  # 空でない場合のみ追加
+                    filtered_dependencies[caller] = filtered_callees
+            
+            # フィルタリングした依存関係を使用
+            all_dependencies = filtered_dependencies
+            
+            # ファイル間の依存関係もフィルタリング
+            for module_name in file_dependencies:
+                file_dependencies[module_name] = {
+                    dep for dep in file_dependencies[module_name] 
+                    if dep not in SKIP_DEPENDENCIES
+                }
+            
+            # Step 3: 統合レポートの生成 - すべての詳細情報を省略してLLM向け構造化データのみ出力
+            report = "# プロジェクト全体の拡張解析レポート\n\n"
+            
+            # LLM向け構造化データの出力
+            report += "## LLM向け構造化データ\n"
+            report += "```\n"
+            
+            # ディレクトリ構造を冒頭に挿入
+            report += "# ディレクトリ構造\n"
+            report += directory_structure
+            report += "\n"
+            
+            # コンパクトなフォーマットでデータを出力
+            compact_data = "# クラス一覧\n"
+            for cls in all_classes:
+                base_info = f" <- {', '.join(cls['base_classes'])}" if cls['base_classes'] else ""
+                file_info = next((os.path.basename(f) for f, r in analysis_results.items() 
+                               if any(c["name"] == cls["name"] for c in r["classes"])), "unknown")
+                compact_data += f"{cls['name']}{base_info} ({file_info})\n"
+                
+                if cls['methods']:
+                    compact_data += "  メソッド:\n"
+                    for m in cls['methods']:
+                        params = ", ".join(p['name'] for p in m['parameters'])
+                        ret_type = f" -> {m['return_type']}" if m['return_type'] and m['return_type'] != "unknown" else ""
+                        compact_data += f"    {m['name']}({params}){ret_type}\n"
+                compact_data += "\n"
+
+            compact_data += "# 関数一覧\n"
+            for func in all_functions:
+                params = ", ".join(p['name'] for p in func['parameters'])
+                ret_type = f" -> {func['return_type']}" if func['return_type'] and func['return_type'] != "unknown" else ""
+                file_info = next((os.path.basename(f) for f, r in analysis_results.items() 
+                               if any(fn["name"] == func["name"] for fn in r["functions"])), "unknown")
+                compact_data += f"{func['name']}({params}){ret_type} ({file_info})\n"
+            compact_data += "\n"
+            
+            # 時間・メモリの上限を超えて解析しなかったファイル
+            if skipped_files:
+                compact_data += "# 拡張解析をスキップしたファイル\n"
+                for file_name, reason in skipped_files:
+                    compact_data += f"{file_name}: skipped: {reason}\n"
+                compact_data += "\n"
+            
+            # 上限に達して型推論を打ち切った関数
+            if inference_skipped:
+                compact_data += self.format_inference_skipped(inference_skipped)
+                compact_data += "\n"
+
+            # 関数間の依存関係（主要なもののみ）
+            if all_dependencies:
+                compact_data += "# 主要な関数依存関係\n"
+                # 依存の多いもの順に表示
+                important_dependencies = sorted([(k, v) for k, v in all_dependencies.items() if v], 
+                                             key=lambda x: len(x[1]), reverse=True)[:10]
+                for caller, callees in important_dependencies:
+                    compact_data += f"{caller} -> {', '.join(sorted(callees))}\n"
+                compact_data += "\n"
+            
+            # コールグラフの生成と追加
+            call_graph_text = self.generate_call_graph(python_files, job)
+            # compact_data += "# コールグラフ\n"
+            compact_data += call_graph_text
+            compact_data += "\n"
+
+            report += compact_data
+            report += "```\n"
+            reusable = not skipped_files and not any(item['reason'] == 'run' for _, item in inference_skipped)
+            return report, reusable
+            
+        except AnalysisCancelled:
+            raise
+        except ImportError:
+            return ("astroidライブラリがインストールされていません。\n"
+                    "pip install astroid でインストールしてください。"), False
+        except Exception as e:
+            error_msg = f"拡張解析中にエラーが発生しました:\n{str(e)}"
+            print(error_msg)
+            
+            traceback.print_exc()
+            return error_msg, False
+
+    def format_inference_skipped(self, inference_skipped):
+        """型推論を打ち切った関数の一覧を作る（解析全体の上限で省略したものは件数だけ示す）"""
+        print(f"型推論を打ち切った関数: {len(inference_skipped)} 個")
+        text = "# 型推論を打ち切った関数\n"
+        run_skipped = 0
+        for file_name, item in inference_skipped:
+            if item['reason'] == 'run':
+                run_skipped += 1
+                continue
+            text += f"{item['name']} ({file_name}): {INFERENCE_SKIP_REASONS[item['reason']]}\n"
+        if run_skipped:
+            text += f"{INFERENCE_SKIP_REASONS['run']}に達したため、{run_skipped} 個の関数の型推論を省略しました\n"
+        return text
+
+    def generate_call_graph(self, python_files, job=None):
+        """指定されたPythonファイルからコールグラフを生成する（jobがあればファイルごとにキャンセルを確認）"""
+        try:
+            if not python_files:
+                return "コールグラフ生成対象のPythonファイルがありません。"
+            
+            # 関数/メソッドの呼び出し関係を保存する辞書
+            call_graph = {}
+            
+            module_functions = {}  # モジュール内の関数とメソッドを記録
+            module_edges = {}      # モジュールごとの呼び出し関係
+            
+            # Step 1: 各モジュールの関数・メソッドと呼び出し関係を収集（キャッシュがあれば再利用）
+            for file_path in python_files:
+                if job is not None:
+                    job.check_cancelled()
+                try:
+                    source = self.pipeline.get(file_path)
+                    if source.skip_reason:
+                        # 拡張解析で上限を超えたファイルはパースしない
+                        continue
+                    module_name = source.module_name
+                    functions, edges = self.astroid_analyzer.get_module_call_info(source, module_name)
+                    
+                    # このモジュール内の関数とメソッドを登録
+                    module_functions[module_name] = functions
+                    for full_name in functions.values():
+                        call_graph[full_name] = set()
+                    
+                    # 同名のモジュールは後のファイルの呼び出し関係を使う
+                    module_edges[module_name] = edges
+                
+                except Exception as e:
+                    print(f"ファイル {file_path} のパース中にエラー: {e}")
+            
+            # Step 2: モジュールごとの呼び出し関係を統合
+            for module_name, edges in module_edges.items():
+                for caller, callees in edges.items():
+                    call_graph[caller].update(callees)
+            
+            # Step 3: コールグラフをテキスト形式で整形
+            result = "# コールグラフ\n"
+            
+            # 呼び出し元がある関数のみを表示（外部から呼ばれないユーティリティ関数を除外）
+            has_callers = set()
+            for callee_set in call_graph.values():
+                has_callers.update(callee_set)
+            
+            # 呼び出し元から呼び出し先を整理
+            sorted_callers = sorted(call_graph.keys())
+            for caller in sorted_callers:
+                if caller in has_callers or call_graph[caller]:  # 呼び出される関数か、他の関数を呼び出す関数
+                    callees = sorted(call_graph[caller])
+                    if callees:
+                        result += f"{caller} -> {', '.join(callees)}\n"
+            
+            return result
+        
+        except AnalysisCancelled:
+            raise
+        except ImportError:
+            return "astroidライブラリがインストールされていません。\npip install astroid でインストールしてください。"
+        except Exception as e:
+            
+            traceback.print_exc()
+            return f"コールグラフの生成中にエラーが発生しました:\n{str(e)}"
+
+    def get_directory_structure(self, python_files):
+        """ファイルリストからディレクトリ構造を生成する"""
+        # ファイルのディレクトリを取得する
+        if not python_files:
+            return "ファイルがありません"
+        
+        # 共通のルートディレクトリを見つける
+        file_dirs = [os.path.dirname(f) for f in python_files]
+        common_root = os.path.commonpath(file_dirs) if file_dirs else ""
+        
+        # ディレクトリツリーを構築
+        tree = {}
+        for file_path in python_files:
+            # ルートからの相対パスを取得
+            rel_path = os.path.relpath(file_path, common_root)
+            parts = rel_path.split(os.sep)
+            
+            # ツリー構造に追加
+            current = tree
+            for i, part in enumerate(parts):
+                if i == len(parts) - 1:  # ファイル
+                    if "_files" not in current:
+                        current["_files"] = []
+                    current["_files"].append(part)
+                else:  # ディレクトリ
+                    if part not in current:
+                        current[part] = {}
+                    current = current[part]
+        
+        # ツリー構造を文字列に変換
+        result = []
+        
+        def print_tree(node, prefix="", is_last=True, indent=""):
+            # ディレクトリ内のファイルとサブディレクトリを取得
+            dirs = sorted([k for k in node.keys() if k != "_files"])
+            files = sorted(node.get("_files", []))
+            
+            # 現在のディレクトリのファイルを出力
+            for i, f in enumerate(files):
+                is_last_file = (i == len(files) - 1) and not dirs
+                result.append(f"{indent}{'└── ' if is_last_file else '├── '}{f}")
+            
+            # サブディレクトリを出力
+            for i, d in enumerate(dirs):
+                is_last_dir = (i == len(dirs) - 1)
+                result.append(f"{indent}{'└── ' if is_last_dir else '├── '}{d}/")
+                # 次のレベルのインデント
+                next_indent = indent + ("    " if is_last_dir else "│   ")
+                print_tree(node[d], prefix + d + "/", is_last_dir, next_indent)
+        
+        # ルートディレクトリ名を出力
+        root_name = os.path.basename(common_root) or "root"
+        result.append(f"{root_name}/")
+        # ルート以下のツリーを出力
+        print_tree(tree, indent="")
+        
+        return "\n".join(result)
+
+    def text_to_json_structure(self, text_content):
+        """テキスト形式の解析結果をJSON構造に変換する"""
+       
+        result = {
+            "directory_structure": [],
+            "classes": [],
+            "functions": [],
+            "imports": []
+        }
+        
+        current_section = None
+        current_class = None
+        current_function = None
+        
+        # 行ごとに解析
+        for line in text_content.split('\n'):
+            line = line.rstrip()
+            
+            # 空行はスキップ
+            if not line:
+                continue
+                
+            # セクションヘッダーの検出
+            if line.startswith('# '):
+                section_name = line[2:].lower()
+                if 'ディレクトリ' in section_name:
+                    current_section = 'directory'
+                elif 'クラス' in section_name:
+                    current_section = 'classes'
+                elif '関数' in section_name:
+                    current_section = 'functions'
+                elif 'インポート' in section_name:
+                    current_section = 'imports'
+                else:
+                    current_section = None
+                continue
+                
+            # 現在のセクションに応じて処理
+            if current_section == 'directory':
+                if not line.startswith('#'):  # ヘッダー以外の行を追加
+                    result["directory_structure"].append(line)
+                    
+            elif current_section == 'imports':
+                result["imports"].append(line)
+                
+            elif current_section == 'classes':
+                if line.startswith('class '):
+                    # 新しいクラス定義
+                    class_info = {"name": "", "file": "", "extends": "", "methods": []}
+                    
+                    # クラス名とファイル名を抽出（例: RecognizedText (voice2025.py)）
+                    class_match = re.match(r'class\s+(\w+)(?:\s+<-\s+(\w+))?\s*(?:\((.*?)\))?', line)
+                    if class_match:
+                        class_info["name"] = class_match.group(1)
+                        if class_match.group(2):  # 継承元がある場合
+                            class_info["extends"] = class_match.group(2)
+                        if class_match.group(3):  # ファイル名がある場合
+                            class_info["file"] = class_match.group(3)
+                    
+                    current_class = class_info
+                    result["classes"].append(current_class)
+                    
+                elif line.strip().startswith('メソッド:'):
+                    # メソッドリストの開始
+                    continue
+                    
+                elif line.strip().startswith('def ') and current_class:
+                    # メソッド定義（クラス内のメソッド）
+                    method_match = re.match(r'\s*def\s+([^(]+)', line)
+                    if method_match:
+                        method_name = method_match.group(1).strip()
+                        current_class["methods"].append(method_name)
+                        
+                elif line.strip() and current_class and line.strip()[0].isspace():
+                    # クラス配下のインデントされた行（メソッド定義の可能性）
+                    method_match = re.match(r'\s+([^(]+)\(.*\)', line)
+                    if method_match:
+                        method_name = method_match.group(1).strip()
+                        if method_name not in current_class["methods"]:
+                            current_class["methods"].append(method_name)
+                    
+            elif current_section == 'functions':
+                function_match = re.match(r'(?:def\s+)?([^(]+)(?:\(.*\))?(?:\s+->\s+.*)?', line)
+                if function_match:
+                    func_name = function_match.group(1).strip()
+                    if func_name and not func_name.startswith('#'):
+                        if func_name not in result["functions"]:
+                            result["functions"].append(func_name)
+        
+        return result
+
+    def extract_llm_structured_data(self, text):
+        """拡張解析テキストからLLM向け構造化データを抽出する"""
+        result = {
+            "call_graph": {"data": []},
+            "dependencies": {}
+        }
+        
+        # LLM向け構造化データセクションを探す
+        start_marker = "## LLM向け構造化データ"
+        code_start = "```"
+        code_end = "```"
+        
+        if start_marker in text:
+            # セクション開始位置を見つける
+            start_pos = text.find(start_marker)
+            # コードブロック開始位置を見つける
+            code_start_pos = text.find(code_start, start_pos)
+            if code_start_pos != -1:
+                # コードブロック終了位置を見つける
+                code_end_pos = text.find(code_end, code_start_pos + len(code_start))
+                if code_end_pos != -1:
+                    # コードブロック内のテキストを抽出
+                    code_content = text[code_start_pos + len(code_start):code_end_pos].strip()
+                    
+                    # コード内容を解析して構造化
+                    current_section = None
+                    current_subsection = None
+                    
+                    # コールグラフとデータセクションを格納する変数
+                    call_graph_data = []
+                    dependency_data = {}
+                    current_dependency = None
+                    
+                    for line in code_content.split("\n"):
+                        if line.startswith("# "):
+                            # 新しいメインセクションの開始
+                            current_section = line[2:].strip()
+                            current_subsection = None
+                            current_dependency = None
+                            
+                        elif current_section == "コールグラフ":
+                            # コールグラフの行を追加
+                            if line.strip() and " -> " in line:
+                                call_graph_data.append(line.strip())
+                                
+                        elif current_section == "主要な関数依存関係":
+                            # 関数依存関係の処理
+                            if " -> " in line:
+                                # 新しい依存関係の開始
+                                parts = line.split(" -> ")
+                                if len(parts) == 2:
+                                    current_dependency = parts[0].strip()
+                                    deps = [dep.strip() for dep in parts[1].split(",")]
+                                    dependency_data[current_dependency] = deps
+                            elif current_dependency and line.strip():
+                                # 既存の依存関係の継続
+                                deps = [dep.strip() for dep in line.split(",")]
+                                if current_dependency in dependency_data:
+                                    dependency_data[current_dependency].extend(deps)
+                                else:
+                                    dependency_data[current_dependency] = deps
+                    
+                    # 結果をまとめる
+                    if call_graph_data:
+                        result["call_graph"]["data"] = call_graph_data
+                    if dependency_data:
+                        result["dependencies"] = dependency_data
+        
+        return result
+
+    def build_json_output(self, result_text, extended_text, python_files):
+        """基本解析と拡張解析のテキストからJSON出力用のデータを作る"""
+        # テキストをJSON構造に変換
+        json_data = self.text_to_json_structure(result_text)
+        
+        # ディレクトリ構造を取得して行ごとの配列に変換
+        if python_files:
+            dir_structure_text = self.get_directory_structure(python_files)
+            dir_structure_lines = dir_structure_text.split('\n')
+            
+            # 既存のディレクトリ構造を上書き
+            json_data["directory_structure"] = dir_structure_lines
+        
+        # 拡張解析テキストがあれば追加
+        if extended_text.strip():
+            # LLM構造化データ部分を抽出して構造化
+            extended_data = self.extract_llm_structured_data(extended_text)
+            if extended_data:
+                json_data["extended_analysis"] = extended_data
+        
+        return json_data
+
+    def shutdown(self):
+        """ワーカープロセスを終了する"""
+        self.worker_pool.shutdown()
+        self.watchdog_pool.shutdown()
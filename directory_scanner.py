@@ -0,0 +1,217 @@
+# directory_scanner.py
+
+import os
+
+# ディレクトリ走査でスキップするファイル拡張子（これらを含むフォルダは中身を解析しない）
+SKIP_EXTENSIONS = ['.exe', '.dll', '.bin', '.so', '.pyc', '.pyd']
+
+# ディレクトリ走査でスキップするフォルダ名
+SKIP_FOLDERS = ['__pycache__', 'node_modules', 'build', 'dist', 'venv', 'env', '.git', '.idea', '.vscode']
+
+# ディレクトリを読むスレッド数のデフォルト（1なら逐次。ネットワークドライブなど遅いファイルシステムでは増やすと速くなる）
+DEFAULT_SCAN_WORKERS = 1
+
+
+def _read_directory(path, skip_folders, skip_extensions, skip_exe_folders):
+    """
+    ディレクトリ直下を1回のos.scandirで読む
+    (ディレクトリ名, ファイル名, シンボリックリンクのディレクトリ名の集合, {ディレクトリ名: (st_dev, st_ino)}) を返す
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except PermissionError:
+        return [], [], set(), {}
+    except OSError as e:
+        print(f"ディレクトリ読み込みエラー: {path} - {e}")
+        return [], [], set(), {}
+
+    dirs = []
+    files = []
+    links = set()
+    keys = {}
+    has_exe = False
+
+    for entry in entries:
+        try:
+            # DirEntryは種類をキャッシュしているので、ほとんどの場合はシステムコールを増やさない
+            if entry.is_dir():
+                if entry.name in skip_folders:
+                    continue
+                dirs.append(entry.name)
+                if entry.is_symlink():
+                    links.add(entry.name)
+                st = entry.stat()
+                if not st.st_ino:
+                    # WindowsのDirEntry.stat()はinode番号を持たない
+                    st = os.stat(entry.path)
+                keys[entry.name] = (st.st_dev, st.st_ino)
+            elif entry.name.lower().endswith(skip_extensions):
+                has_exe = True
+            else:
+                files.append(entry.name)
+        except OSError as e:
+            print(f"項目チェックエラー: {entry.path} - {e}")
+
+    # EXEファイルが含まれていて、スキップ設定がONの場合はこのディレクトリの中身を使わない
+    if has_exe and skip_exe_folders:
+        return [], [], set(), {}
+
+    dirs.sort()
+    files.sort()
+    return dirs, files, links, keys
+
+
+def scan_directory(path, skip_folders=SKIP_FOLDERS, skip_extensions=SKIP_EXTENSIONS, skip_exe_folders=True):
+    """
+    ディレクトリ直下の項目を調べ、(ディレクトリ名のリスト, ファイル名のリスト)をソートして返す
+    スキップするフォルダ・拡張子は除き、EXEファイルを含むフォルダ（skip_exe_foldersがTrueの場合）は中身を空にする
+    """
+    dirs, files, _, _ = _read_directory(path, frozenset(skip_folders), tuple(skip_extensions), skip_exe_folders)
+    return dirs, files
+
+
+def is_included_file(root, path, rules=None, skip_exe_folders=True, listings=None,
+                     skip_folders=SKIP_FOLDERS, skip_extensions=SKIP_EXTENSIONS):
+    """
+    rootの下のpathが、走査したときに集められるファイルかを調べる（ディレクトリ全体は走査しない）
+    スキップするフォルダ・EXEフォルダ・rules（rootからの相対パスに対するExclusionRules）の判定は走査と同じ
+    listingsに {ディレクトリのパス: (ディレクトリ名, ファイル名)} の辞書を渡すと、複数のファイルで読んだ結果を共有する
+    """
+    rel_path = os.path.relpath(path, root)
+    if rel_path == os.curdir or rel_path.startswith(os.pardir):
+        return False
+    rel_path = rel_path.replace(os.sep, "/")
+    if rules and rules.is_excluded(rel_path, False):
+        return False
+
+    # rootから親ディレクトリを順に読み、走査で辿るディレクトリにあるファイルかを確かめる
+    if listings is None:
+        listings = {}
+    parts = rel_path.split("/")
+    dir_path = root
+    for i, part in enumerate(parts):
+        listing = listings.get(dir_path)
+        if listing is None:
+            listing = scan_directory(dir_path, skip_folders, skip_extensions, skip_exe_folders)
+            listings[dir_path] = listing
+        dirs, files = listing
+        if part not in (files if i == len(parts) - 1 else dirs):
+            return False
+        dir_path = os.path.join(dir_path, part)
+    return True
+
+
+def tree_order_key(rel_path):
+    """ツリー表示・走査と同じ順序（各階層でサブディレクトリ→ファイル、それぞれ名前順）に並べるためのキー"""
+    parts = rel_path.replace(os.sep, "/").split("/")
+    return [(0, part) for part in parts[:-1]] + [(1, parts[-1])]
+
+
+class DirectorySnapshot:
+    """
+    DirectoryScannerで走査した結果（ディレクトリごとの直下の項目）
+    ツリー表示と解析対象のファイル集めの両方で使い、同じディレクトリを何度も読まないようにする
+    """
+    def __init__(self, root, listings):
+        self.root = root
+        self.listings = listings  # {ディレクトリのパス: (ディレクトリ名のリスト, ファイル名のリスト)}
+
+    def listing(self, path):
+        """pathの直下の項目（走査していないディレクトリならNone）"""
+        return self.listings.get(os.path.normpath(path))
+
+    def python_files(self, rules=None):
+        """Pythonファイルをツリー表示と同じ順序（サブディレクトリ→ファイル）で返す（rulesに一致するファイルは除く）"""
+        python_files = []
+
+        def collect(path, rel_path):
+            dirs, files = self.listings[path]
+            for dir_name in dirs:
+                child_path = os.path.join(path, dir_name)
+                if child_path in self.listings:
+                    collect(child_path, f"{rel_path}/{dir_name}" if rel_path else dir_name)
+            for file_name in files:
+                if not file_name.endswith('.py'):
+                    continue
+                if rules is not None and rules.match(f"{rel_path}/{file_name}" if rel_path else file_name, False):
+                    continue
+                python_files.append(os.path.join(path, file_name))
+
+        if self.root in self.listings:
+            collect(self.root, "")
+        return python_files
+
+
+class DirectoryScanner:
+    """
+    os.scandirによるディレクトリの走査（1つのディレクトリを1回だけ読む）
+    workersが2以上なら同じ深さのディレクトリをスレッドで並列に読む（結果の順序は逐次と同じ）
+    シンボリックリンクのディレクトリは、ルートの中を指すものは実体の側で読み、
+    外を指すものは(st_dev, st_ino)で一度読んだディレクトリを除くので、リンクのループでも止まる
+    """
+    def __init__(self, skip_exe_folders=True, rules=None, workers=DEFAULT_SCAN_WORKERS,
+                 skip_folders=SKIP_FOLDERS, skip_extensions=SKIP_EXTENSIONS):
+        self.skip_exe_folders = skip_exe_folders
+        self.rules = rules or None
+        self.workers = max(1, int(workers))
+        self.skip_folders = frozenset(skip_folders)
+        self.skip_extensions = tuple(skip_extensions)
+
+    def _read(self, path):
+        return _read_directory(path, self.skip_folders, self.skip_extensions, self.skip_exe_folders)
+
+    def scan(self, root, should_stop=None):
+        """
+        rootから下を走査してDirectorySnapshotを返す（rulesで除外されたディレクトリの中は読まない）
+        should_stopがTrueを返したら途中でやめてNoneを返す
+        """
+        root = os.path.normpath(root)
+        root_real = os.path.realpath(root)
+        listings = {}
+        visited = set()
+        try:
+            st = os.stat(root)
+            visited.add((st.st_dev, st.st_ino))
+        except OSError:
+            pass
+
+        executor = None
+        if self.workers > 1:
+            # スレッドを使うときだけ読み込む
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+            # 深さごとに読む（並列に読んでも、結果は先頭から順に処理するので逐次と同じになる）
+            frontier = [(root, "")]
+            while frontier:
+                if should_stop is not None and should_stop():
+                    return None
+                paths = [path for path, _ in frontier]
+                results = executor.map(self._read, paths) if executor else map(self._read, paths)
+
+                next_frontier = []
+                for (path, rel_path), (dirs, files, links, keys) in zip(frontier, results):
+                    listings[path] = (dirs, files)
+                    for dir_name in dirs:
+                        child_rel = f"{rel_path}/{dir_name}" if rel_path else dir_name
+                        if self.rules is not None and self.rules.match(child_rel, True):
+                            continue
+                        child_path = os.path.join(path, dir_name)
+                        if dir_name in links:
+                            real = os.path.realpath(child_path)
+                            if real == root_real or real.startswith(root_real.rstrip(os.sep) + os.sep):
+                                continue
+                        key = keys.get(dir_name)
+                        if key is not None:
+                            if key in visited:
+                                continue
+                            visited.add(key)
+                        next_frontier.append((child_path, child_rel))
+                frontier = next_frontier
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        return DirectorySnapshot(root, listings)
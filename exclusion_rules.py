@@ -0,0 +1,262 @@
+# exclusion_rules.py
+
+import os
+import re
+
+# プロジェクトのルートに置く除外ルールのファイル（.gitignoreと同じ書式、リポジトリに含めれば他の環境でも使える）
+IGNORE_FILE_NAME = ".pycodelensignore"
+
+# グロブとして扱う文字（これを含まないルールはパスの要素ごとのトライで判定する）
+_GLOB_CHARS = set("*?[")
+
+
+class _Rule:
+    """除外ルール1行をコンパイルしたもの"""
+    __slots__ = ("index", "negate", "dir_only", "anchored", "literal", "regex")
+
+    def __init__(self, index, negate, dir_only, anchored, literal, regex):
+        self.index = index
+        self.negate = negate
+        self.dir_only = dir_only
+        self.anchored = anchored
+        self.literal = literal  # グロブを含まない場合のパス（なければNone）
+        self.regex = regex
+
+
+def _translate(pattern):
+    """.gitignore形式のパターンを正規表現に変換する（/をまたがない * と ?、/**/、[...] に対応）"""
+    i = 0
+    n = len(pattern)
+    out = []
+    while i < n:
+        c = pattern[i]
+        if c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        elif c == "*":
+            j = i
+            while j < n and pattern[j] == "*":
+                j += 1
+            at_start = i == 0 or pattern[i - 1] == "/"
+            at_end = j == n or pattern[j] == "/"
+            if j - i >= 2 and at_start and at_end:
+                if j == n:
+                    out.append(".*")        # 末尾の /** は中身すべて
+                else:
+                    out.append("(?:.*/)?")  # **/ は0個以上のディレクトリ
+                    j += 1
+            else:
+                out.append("[^/]*")
+            i = j
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = i + 1
+            if j < n and pattern[j] in "!^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j < 0:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            content = pattern[i + 1:j].replace("\\", "\\\\")
+            if content[:1] in ("!", "^"):
+                content = "^" + content[1:]
+            out.append(f"(?!/)[{content}]")
+            i = j + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def _literal(pattern):
+    """グロブを含まないパターンなら、エスケープを外したパスを返す（グロブを含めばNone）"""
+    chars = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            chars.append(pattern[i + 1])
+            i += 2
+            continue
+        if c in _GLOB_CHARS:
+            return None
+        chars.append(c)
+        i += 1
+    return "".join(chars)
+
+
+def parse_rule(line, index=0):
+    """ルール1行を解析する（空行・コメントはNone）"""
+    # 末尾の空白は、エスケープされていなければ無視する
+    line = line.rstrip("\n\r")
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    if not line or line.startswith("#"):
+        return None
+
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    elif line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+
+    dir_only = line.endswith("/") and not line.endswith("\\/")
+    if dir_only:
+        line = line.rstrip("/")
+    if not line:
+        return None
+
+    # 途中か先頭に / があればルートからのパス、なければどの階層の名前にも一致する
+    anchored = "/" in line
+    line = line.lstrip("/")
+    if not line:
+        return None
+
+    literal = _literal(line) if anchored else None
+    regex = _translate(line)
+    if not anchored:
+        regex = "(?:.*/)?" + regex
+    return _Rule(index, negate, dir_only, anchored, literal, regex)
+
+
+def path_rule(rel_path, include=False):
+    """ルートからの相対パス1つだけを除外する（include=Trueなら含める）ルールを作る"""
+    escaped = re.sub(r"([*?\[\\])", r"\\\1", rel_path.replace(os.sep, "/"))
+    if escaped.endswith(" "):
+        escaped = escaped[:-1] + "\\ "
+    return f"{'!' if include else ''}/{escaped}"
+
+
+def remove_path_rules(rules, rel_path):
+    """rel_pathとその下のパスを対象とするパスのルール（除外・含むとも）を取り除いたリストを返す"""
+    rel_path = rel_path.replace(os.sep, "/")
+    prefix = rel_path + "/"
+    remaining = []
+    for line in rules:
+        rule = parse_rule(line)
+        if rule is not None and rule.literal is not None:
+            if rule.literal == rel_path or rule.literal.startswith(prefix):
+                continue
+        remaining.append(line)
+    return remaining
+
+
+def read_rule_file(path):
+    """.gitignore形式のファイルからルールを読み込む（なければ空のリスト）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"除外ルールの読み込みエラー: {path} - {e}")
+        return []
+
+
+def load_project_rules(root, use_gitignore=False):
+    """プロジェクトに置かれたルール（ルートの.gitignore（use_gitignore=Trueの場合）と.pycodelensignore）を読み込む"""
+    lines = []
+    if use_gitignore:
+        lines.extend(read_rule_file(os.path.join(root, ".gitignore")))
+    lines.extend(read_rule_file(os.path.join(root, IGNORE_FILE_NAME)))
+    return lines
+
+
+class ExclusionRules:
+    """
+    ルートからの相対パスに対する除外ルール（.gitignoreと同じ書式）
+    後に書かれたルールほど優先され、! で始まるルールは含める側になる
+    グロブを含まないパスのルールはパスの要素ごとのトライに、グロブのルールは1つの正規表現にまとめて判定する
+    .gitignoreと同じく、除外されたディレクトリの中身は ! のルールがあっても含めない
+    """
+    def __init__(self, rules=()):
+        self.rules = []
+        self._trie = {}  # {要素: [子のトライ, ルール]}
+        patterns = []
+        for line in rules:
+            rule = parse_rule(line, len(self.rules))
+            if rule is None:
+                continue
+            self.rules.append(rule)
+            if rule.literal is not None:
+                node = self._trie
+                entry = None
+                for part in rule.literal.split("/"):
+                    entry = node.setdefault(part, [{}, None])
+                    node = entry[0]
+                entry[1] = rule
+            else:
+                patterns.append(rule)
+
+        # 後のルールを先に並べると、fullmatchで一致する最初の選択肢が最も優先されるルールになる
+        self._file_regex = self._compile([rule for rule in patterns if not rule.dir_only])
+        self._dir_regex = self._compile(patterns)
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return None
+        alternatives = [f"(?P<r{rule.index}>{rule.regex})" for rule in reversed(rules)]
+        return re.compile("|".join(alternatives), re.DOTALL)
+
+    @classmethod
+    def from_directory(cls, root, rules=(), use_gitignore=False):
+        """
+        rootの除外ルールを作る（.gitignore → .pycodelensignore → rulesの順で、後ほど優先）
+        .gitignoreはルートにあるものだけを読み込む
+        """
+        return cls(load_project_rules(root, use_gitignore) + list(rules))
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def match(self, rel_path, is_dir):
+        """
+        rel_path自身に一致するルールで判定する（親ディレクトリは見ない）
+        除外ならTrue、含めるルールに一致すればFalse、どのルールにも一致しなければNone
+        """
+        if not self.rules or not rel_path:
+            return None
+        rel_path = rel_path.replace(os.sep, "/")
+
+        best = None
+        node = self._trie
+        entry = None
+        for part in rel_path.split("/"):
+            entry = node.get(part)
+            if entry is None:
+                break
+            node = entry[0]
+        else:
+            rule = entry[1]
+            if rule is not None and (is_dir or not rule.dir_only):
+                best = rule
+
+        regex = self._dir_regex if is_dir else self._file_regex
+        if regex is not None:
+            m = regex.fullmatch(rel_path)
+            if m is not None:
+                rule = self.rules[int(m.lastgroup[1:])]
+                if best is None or rule.index > best.index:
+                    best = rule
+
+        if best is None:
+            return None
+        return not best.negate
+
+    def is_excluded(self, rel_path, is_dir):
+        """rel_pathが除外されるか（親ディレクトリのどれかが除外されていれば除外）"""
+        if not self.rules or not rel_path:
+            return False
+        parts = rel_path.replace(os.sep, "/").split("/")
+        for i in range(1, len(parts)):
+            if self.match("/".join(parts[:i]), True):
+                return True
+        return bool(self.match("/".join(parts), is_dir))
@@ -0,0 +1,280 @@
+# file_watcher.py
+
+import os
+import struct
+import sys
+import time
+
+from directory_scanner import SKIP_FOLDERS, DirectoryScanner, is_included_file
+
+# ファイルシステムを走査して変更を調べる間隔（秒、inotifyが使えない環境で使う）
+DEFAULT_POLL_INTERVAL = 0.5
+
+# 最後のイベントから変更をまとめて返すまでの待ち時間（秒、エディタの一時ファイル経由の保存などを1回にまとめる）
+SETTLE_DELAY = 0.05
+
+# inotifyのイベント（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+def file_signature(path):
+    """変更の判定に使うファイルの (更新時刻, サイズ)（なければNone）"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class FileChanges:
+    """前回から変更・追加・削除されたPythonファイルのパス"""
+    def __init__(self, changed=(), added=(), deleted=()):
+        self.changed = set(changed)
+        self.added = set(added)
+        self.deleted = set(deleted)
+
+    def __bool__(self):
+        return bool(self.changed or self.added or self.deleted)
+
+    def paths(self):
+        """変更のあったすべてのパス"""
+        return self.changed | self.added | self.deleted
+
+
+class _InotifyBackend:
+    """
+    inotifyでディレクトリごとに変更を受け取る（Linuxのみ、ctypesでlibcを直接呼ぶ）
+    監視数の上限などで監視を始められなければOSErrorを送出する
+    """
+    name = "inotify"
+
+    def __init__(self, watcher):
+        import ctypes
+        import ctypes.util
+
+        self.watcher = watcher
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotifyが使えません")
+        self._get_errno = ctypes.get_errno
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise self._error("inotify_init1")
+        self._paths = {}  # {wd: ディレクトリのパス}
+        self._wds = {}    # {ディレクトリのパス: wd}
+        try:
+            self._watch_tree(watcher.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _error(self, func):
+        errno = self._get_errno()
+        return OSError(errno, f"{func}: {os.strerror(errno)}")
+
+    def _watch_tree(self, path):
+        """path以下の走査対象のディレクトリをすべて監視し、その中のPythonファイルを返す"""
+        snapshot = self.watcher.scan(path)
+        if snapshot is None:
+            return []
+        for dir_path in snapshot.listings:
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), _WATCH_MASK)
+            if wd < 0:
+                raise self._error("inotify_add_watch")
+            self._paths[wd] = dir_path
+            self._wds[dir_path] = wd
+        return snapshot.python_files()
+
+    def _unwatch_tree(self, path):
+        """path以下のディレクトリの監視をやめる（別の場所に移動したディレクトリ用）"""
+        prefix = path + os.sep
+        for dir_path in [p for p in self._wds if p == path or p.startswith(prefix)]:
+            wd = self._wds.pop(dir_path)
+            self._paths.pop(wd, None)
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self):
+        """届いたイベントから、変更があったかもしれないPythonファイルのパスを返す"""
+        candidates = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                self._handle(wd, mask, os.fsdecode(name), candidates)
+        return candidates
+
+    def _handle(self, wd, mask, name, candidates):
+        """イベント1件を処理する"""
+        if mask & IN_Q_OVERFLOW:
+            # イベントが溢れたら全体を調べ直す
+            candidates.update(self._watch_tree(self.watcher.root))
+            candidates.update(self.watcher.files)
+            return
+        if mask & IN_IGNORED:
+            dir_path = self._paths.pop(wd, None)
+            if dir_path is not None and self._wds.get(dir_path) == wd:
+                del self._wds[dir_path]
+            return
+        dir_path = self._paths.get(wd)
+        if dir_path is None or not name:
+            return
+        path = os.path.join(dir_path, name)
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                if self.watcher.accepts_dir(path):
+                    try:
+                        candidates.update(self._watch_tree(path))
+                    except OSError as e:
+                        print(f"ディレクトリの監視エラー: {path} - {e}")
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._unwatch_tree(path)
+                prefix = path + os.sep
+                candidates.update(f for f in self.watcher.files if f.startswith(prefix))
+        elif name.endswith(".py"):
+            candidates.add(path)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class _PollingBackend:
+    """一定間隔でディレクトリを走査し、Pythonファイルの更新時刻とサイズを比べる"""
+    name = "polling"
+
+    def __init__(self, watcher, interval=DEFAULT_POLL_INTERVAL):
+        self.watcher = watcher
+        self.interval = interval
+        self._last_scan = time.monotonic()
+
+    def read(self):
+        now = time.monotonic()
+        if now - self._last_scan < self.interval:
+            return set()
+        self._last_scan = now
+        candidates = set(self.watcher.files)
+        if self.watcher.track_new:
+            snapshot = self.watcher.scan(self.watcher.root)
+            if snapshot is not None:
+                candidates.update(snapshot.python_files(self.watcher.rules))
+        return candidates
+
+    def close(self):
+        pass
+
+
+class FileWatcher:
+    """
+    root以下のPythonファイルの変更を監視する（GUIに依存しない）
+    Linuxではinotify、使えなければ一定間隔の走査で調べ、pollで前回からの変更をFileChangesとして返す
+    追加されたファイルは解析対象と同じ規則（スキップするフォルダ・EXEフォルダ・除外ルール）で選ぶ
+    """
+    def __init__(self, root, python_files, rules=None, skip_exe_folders=True,
+                 track_new=True, use_inotify=True, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.root = os.path.normpath(root)
+        self.rules = rules or None
+        self.skip_exe_folders = skip_exe_folders
+        self.track_new = track_new  # Falseなら最初に渡したファイルの変更・削除だけを調べる
+        self.skip_folders = frozenset(SKIP_FOLDERS)
+
+        # 監視中のファイルと最後に確認した (更新時刻, サイズ)
+        self.files = {path: file_signature(path) for path in python_files}
+
+        self._pending = set()
+        self._last_event = 0.0
+
+        # 決まったファイルだけを調べるなら、ディレクトリを監視するより更新時刻を比べる方が軽い
+        self.backend = None
+        if use_inotify and track_new and sys.platform.startswith("linux"):
+            try:
+                self.backend = _InotifyBackend(self)
+            except (OSError, AttributeError) as e:
+                print(f"inotifyを使えないため、定期的な走査で変更を監視します: {e}")
+        if self.backend is None:
+            self.backend = _PollingBackend(self, poll_interval)
+
+    def scan(self, path):
+        """path以下を解析対象と同じ規則で走査する"""
+        scanner = DirectoryScanner(self.skip_exe_folders, self._rules_for(path))
+        return scanner.scan(path)
+
+    def _rules_for(self, path):
+        # 除外ルールはrootからの相対パスで書かれているので、rootを走査するときだけ渡す
+        # （途中のディレクトリを走査した結果はaccepts_fileで確かめる）
+        return self.rules if path == self.root else None
+
+    def _relative_path(self, path):
+        rel_path = os.path.relpath(path, self.root)
+        if rel_path == os.curdir or rel_path.startswith(os.pardir):
+            return None
+        return rel_path.replace(os.sep, "/")
+
+    def accepts_dir(self, path):
+        """新しくできたディレクトリを監視・解析の対象にするか"""
+        rel_path = self._relative_path(path)
+        if rel_path is None:
+            return False
+        if any(part in self.skip_folders for part in rel_path.split("/")):
+            return False
+        return not (self.rules is not None and self.rules.is_excluded(rel_path, True))
+
+    def accepts_file(self, path, listings=None):
+        """新しくできたファイルを解析の対象にするか（listingsは1回のpoll内で読んだディレクトリのキャッシュ）"""
+        if not path.endswith(".py"):
+            return False
+        return is_included_file(self.root, path, self.rules, self.skip_exe_folders, listings)
+
+    def poll(self):
+        """前回のpollから変更のあったファイルを返す（変更がなければ空のFileChanges）"""
+        candidates = self.backend.read()
+        now = time.monotonic()
+        if candidates:
+            self._pending.update(candidates)
+            self._last_event = now
+        if not self._pending or now - self._last_event < SETTLE_DELAY:
+            return FileChanges()
+
+        pending = self._pending
+        self._pending = set()
+        changes = FileChanges()
+        listings = {}
+        for path in pending:
+            signature = file_signature(path)
+            if path in self.files:
+                if signature is None:
+                    changes.deleted.add(path)
+                    del self.files[path]
+                elif signature != self.files[path]:
+                    changes.changed.add(path)
+                    self.files[path] = signature
+            elif signature is not None and self.track_new and self.accepts_file(path, listings):
+                changes.added.add(path)
+                self.files[path] = signature
+        return changes
+
+    def close(self):
+        """監視をやめる"""
+        if self.backend is not None:
+            self.backend.close()
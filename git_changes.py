@@ -0,0 +1,213 @@
+# git_changes.py
+
+import ast
+import os
+import subprocess
+
+from directory_scanner import tree_order_key
+
+
+class GitError(Exception):
+    """gitコマンドが使えない・失敗したことを表す例外"""
+    pass
+
+
+def _run_git(cwd, args):
+    """gitコマンドを実行して標準出力を返す（失敗したらGitError）"""
+    try:
+        completed = subprocess.run(["git", *args], cwd=cwd, capture_output=True)
+    except OSError as e:
+        raise GitError(f"gitを実行できません: {e}")
+    if completed.returncode != 0:
+        message = completed.stderr.decode("utf-8", "replace").strip()
+        raise GitError(f"git {args[0]} が失敗しました: {message}")
+    return completed.stdout
+
+
+def _split_paths(output):
+    """-zで区切られたgitの出力をパスのリストにする"""
+    return [os.fsdecode(path) for path in output.split(b"\0") if path]
+
+
+def find_git_root(path):
+    """pathを含むgitの作業ツリーのルートを返す"""
+    output = _run_git(path, ["rev-parse", "--show-toplevel"])
+    return os.path.normpath(os.fsdecode(output.strip()))
+
+
+def list_python_files(git_root):
+    """作業ツリーのPythonファイル（追跡中のファイルと、無視されていない未追跡のファイル）の絶対パス"""
+    output = _run_git(git_root, ["ls-files", "-z", "--cached", "--others", "--exclude-standard", "--", "*.py"])
+    paths = (os.path.join(git_root, path) for path in _split_paths(output))
+    # 作業ツリーで削除されたファイルは含めない
+    return sorted({os.path.normpath(path) for path in paths if os.path.isfile(path)})
+
+
+def changed_python_files(git_root, base_ref):
+    """
+    base_refから変更されたPythonファイル（コミット済み・未コミット・未追跡を含む、削除されたものは除く）の絶対パス
+    base_refがブランチなら、HEADとの分岐点からの変更にする（プルリクエストの差分と同じ）
+    """
+    try:
+        base = _run_git(git_root, ["merge-base", base_ref, "HEAD"]).decode().strip()
+    except GitError:
+        base = base_ref
+    output = _run_git(git_root, ["diff", "--name-only", "-z", "--diff-filter=d", base, "--", "*.py"])
+    paths = set(_split_paths(output))
+    output = _run_git(git_root, ["ls-files", "-z", "--others", "--exclude-standard", "--", "*.py"])
+    paths.update(_split_paths(output))
+    paths = (os.path.join(git_root, path) for path in paths)
+    return sorted({os.path.normpath(path) for path in paths if os.path.isfile(path)})
+
+
+def _module_names(rel_path):
+    """ルートからの相対パスのモジュールが、インポートされるときの名前の候補（パッケージのルートがどこでもよいよう後ろの部分も含む）"""
+    parts = rel_path.replace(os.sep, "/")[:-len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return {".".join(parts[i:]) for i in range(len(parts))}
+
+
+def _imported_names(tree, rel_dir):
+    """モジュールがインポートしている名前（from X import a は X と X.a、相対インポートはルートからの名前にする）"""
+    names = set()
+    package = [part for part in rel_dir.replace(os.sep, "/").split("/") if part]
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.level - 1 > len(package):
+                    continue
+                base = package[:len(package) - (node.level - 1)]
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module or ""
+            if module:
+                names.add(module)
+            for alias in node.names:
+                names.add(f"{module}.{alias.name}" if module else alias.name)
+    return names
+
+
+def find_importers(root, changed_files, python_files):
+    """
+    python_filesのうち、changed_filesのモジュールを直接インポートしているファイルを返す
+    モジュール名を含まないファイルはパースしない
+    """
+    changed = set(changed_files)
+    targets = set()
+    for path in changed_files:
+        targets |= _module_names(os.path.relpath(path, root))
+    if not targets:
+        return []
+    # テキストに含まれていなければインポートしていない（最後の要素で絞り込む）
+    last_parts = {name.rsplit(".", 1)[-1] for name in targets}
+
+    importers = []
+    for path in python_files:
+        if path in changed:
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                code = f.read()
+        except (OSError, UnicodeDecodeError):
+            continue
+        if not any(part in code for part in last_parts):
+            continue
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            continue
+        rel_dir = os.path.dirname(os.path.relpath(path, root))
+        if _imported_names(tree, rel_dir) & targets:
+            importers.append(path)
+    return importers
+
+
+def select_changed_files(path, base_ref, include_importers=False, is_included=None):
+    """
+    path（gitの作業ツリー内のディレクトリ）の下で、base_refから変更されたPythonファイルを集める
+    include_importersなら、変更されたモジュールを直接インポートしているファイルも加える
+    is_includedを渡すと、それがTrueを返すファイルだけにする（除外ルールなど通常の解析対象の判定）
+    ディレクトリは走査せず、gitの出力からファイルを選ぶ。結果はツリー表示と同じ順序に並べる
+    """
+    path = os.path.normpath(os.path.abspath(path))
+    git_root = find_git_root(path)
+    prefix = path.rstrip(os.sep) + os.sep
+
+    def under_path(file_path):
+        return file_path.startswith(prefix)
+
+    selected = [f for f in changed_python_files(git_root, base_ref) if under_path(f)]
+    if include_importers and selected:
+        candidates = [f for f in list_python_files(git_root) if under_path(f)]
+        selected.extend(find_importers(path, selected, candidates))
+
+    if is_included is not None:
+        selected = [f for f in selected if is_included(f)]
+    return sorted(set(selected), key=lambda f: tree_order_key(os.path.relpath(f, path)))
+
+
+def list_revision_python_files(git_root, revision, path=None):
+    """
+    revisionのツリーにあるPythonファイルを {作業ツリーのルートからの相対パス: blobのID} で返す（チェックアウトはしない）
+    pathを渡すと、その下のファイルだけにする
+    """
+    _run_git(git_root, ["rev-parse", "--verify", f"{revision}^{{commit}}"])
+    args = ["ls-tree", "-r", "-z", "--full-tree", revision]
+    if path is not None:
+        rel_path = os.path.relpath(path, git_root)
+        if rel_path != os.curdir:
+            args += ["--", rel_path.replace(os.sep, "/")]
+    files = {}
+    for entry in _split_paths(_run_git(git_root, args)):
+        info, _, file_path = entry.partition("\t")
+        mode, object_type, object_id = info.split(" ")
+        # シンボリックリンク（120000）やサブモジュールは含めない
+        if object_type == "blob" and mode != "120000" and file_path.endswith(".py"):
+            files[file_path] = object_id
+    return files
+
+
+class GitBlobReader:
+    """
+    1つの git cat-file --batch プロセスでオブジェクトの内容を読み出す
+    ファイルごとにgitを起動しないので、多くのファイルを読んでも速い（withで使うとプロセスを終了する）
+    """
+    def __init__(self, git_root):
+        try:
+            self._process = subprocess.Popen(["git", "cat-file", "--batch"], cwd=git_root,
+                                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as e:
+            raise GitError(f"gitを実行できません: {e}")
+
+    def read(self, object_id):
+        """オブジェクトの内容をバイト列で返す（見つからなければGitError）"""
+        # 1件ずつ要求と応答を交互に行う（まとめて書き込むと、パイプが詰まって止まることがある）
+        self._process.stdin.write(object_id.encode() + b"\n")
+        self._process.stdin.flush()
+        header = self._process.stdout.readline()
+        if not header:
+            raise GitError("git cat-file が終了しました")
+        fields = header.split()
+        if len(fields) != 3:
+            raise GitError(f"オブジェクトが見つかりません: {object_id}")
+        size = int(fields[2])
+        data = self._process.stdout.read(size)
+        self._process.stdout.read(1)  # 内容の後の改行
+        return data
+
+    def close(self):
+        """gitのプロセスを終了する"""
+        if self._process.poll() is None:
+            self._process.stdin.close()
+            self._process.wait()
+        self._process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,28 +1,77 @@
-import ast
-import astroid
+import atexit
+import importlib.util
 import json
 import os
 import pickle
-import re
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 import traceback
 
-# サードパーティライブラリ
-import pyperclip
-from PIL import Image, ImageTk
-from ttkthemes import ThemedTk
+# 起動時間の計測開始（以降のモジュール読み込みも計測に含める）
+STARTUP_START = time.perf_counter()
+
+# サードパーティライブラリ（pyperclip・PIL・ttkthemes・astroidは使う時点で読み込む）
 from tkinter import simpledialog
 
 # tkinter 関連
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext, ttk
 
+# プロジェクト内モジュール
+from analysis_cache import AnalysisCache, DEFAULT_MAX_SIZE
+from analysis_job import AnalysisCancelled, AnalysisJob, format_eta
+from analysis_watchdog import DEFAULT_FILE_TIMEOUT, DEFAULT_MEMORY_LIMIT_MB
+from code_analyzer import (
+    DEFAULT_FUNCTION_INFERENCE_NODES, DEFAULT_FUNCTION_INFERENCE_TIME, DEFAULT_INFERENCE_LEVEL,
+    DEFAULT_RUN_INFERENCE_TIME, INFERENCE_LEVELS, InferenceBudget, ProjectAnalyzer
+)
+from directory_scanner import (
+    DEFAULT_SCAN_WORKERS, SKIP_EXTENSIONS, SKIP_FOLDERS, DirectoryScanner, DirectorySnapshot, scan_directory
+)
+from exclusion_rules import ExclusionRules, load_project_rules, path_rule, remove_path_rules
+from file_watcher import FileWatcher, file_signature
+from git_changes import GitError, select_changed_files
+from session_snapshot import (
+    SESSION_FILE_NAME, SESSION_FORMAT, analysis_versions, find_changed_files, load_session, remove_session, save_session
+)
+from syntax_lexer import JsonLexer, PythonLexer
+
+class StartupTimer:
+    """
+    起動処理の各段階にかかった時間を記録するクラス
+    ウィンドウが操作可能になった時点で内訳をコンソールに出力する
+    """
+    def __init__(self, start=STARTUP_START):
+        self.start = start
+        self.last = start
+        self.marks = []  # [(段階名, ミリ秒)]
+
+    def mark(self, label):
+        """前回の記録からの経過時間を段階名とともに記録する"""
+        now = time.perf_counter()
+        self.marks.append((label, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self):
+        """記録した内訳を出力する"""
+        total = (self.last - self.start) * 1000
+        print(f"起動時間: {total:.0f}ms（操作可能なウィンドウが表示されるまで）")
+        for label, elapsed in self.marks:
+            print(f"  {label}: {elapsed:.0f}ms")
+        return total
+
 class ConfigManager:
     """
     アプリケーションの設定を管理するクラス
     JSONファイルに設定を保存・読み込みする
+    変更はすぐには書き込まず、SAVE_DELAY_MSの間の変更をまとめて1回で保存する（終了時にも保存する）
     """
+    # 変更してから保存するまでの時間（ミリ秒）
+    SAVE_DELAY_MS = 500
+
     def __init__(self, config_file=None):
         # 実行ファイルと同じディレクトリにconfigフォルダを作成して保存
         if config_file is None:
@@ -50,11 +99,40 @@ class ConfigManager:
             "last_directory": "",
             "last_file": "",
             "window_size": {"width": 800, "height": 600},
-            "excluded_items": {}  # {"directory_path": {"item_path": True/False}}
+            # 除外ルール {"directory_path": [ルートからの相対パスのルール（.gitignoreと同じ書式）]}
+            "exclusion_rules": {},
+            "use_gitignore": False,  # ルートの.gitignoreのパターンも除外に使うか
+            "watch_files": False,    # 解析後もファイルの変更を監視し、変更分を解析し直すか
+            # gitの変更分の解析（base_ref: 基準のref、include_importers: 直接インポートしているファイルも含めるか）
+            "git_changes": {"base_ref": "HEAD", "include_importers": False},
+            "analysis_cache": {"enabled": True, "max_size_mb": DEFAULT_MAX_SIZE // (1024 * 1024)},
+            "analysis_jobs": 1,  # 並列解析のプロセス数（1なら逐次実行）
+            "scan_workers": DEFAULT_SCAN_WORKERS,  # ディレクトリを読むスレッド数（遅いファイルシステムでは増やす）
+            # 拡張解析の型推論（level: off / annotations / full、上限の秒数・ノード数は0なら無制限）
+            "type_inference": {
+                "level": DEFAULT_INFERENCE_LEVEL,
+                "function_time": DEFAULT_FUNCTION_INFERENCE_TIME,
+                "function_nodes": DEFAULT_FUNCTION_INFERENCE_NODES,
+                "run_time": DEFAULT_RUN_INFERENCE_TIME
+            },
+            # 拡張解析の1ファイルあたりの上限（秒・MB、0なら無制限）。超えたファイルはスキップする
+            "analysis_limits": {
+                "file_timeout": DEFAULT_FILE_TIMEOUT,
+                "memory_limit_mb": DEFAULT_MEMORY_LIMIT_MB
+            }
         }
         
+        # 保存待ちの変更があるか、保存を予約したタイマーのID
+        self._dirty = False
+        self._save_timer = None
+        # 保存の予約に使うTkのウィジェット（set_schedulerで設定するまでは変更のたびに保存する）
+        self._scheduler = None
+        
         # 設定ファイルの読み込み
         self.load_config()
+        
+        # 予約中の保存がGUIの外で終了しても失われないようにする
+        atexit.register(self.flush)
     
     def load_config(self):
         """設定ファイルから設定を読み込む"""
@@ -72,8 +150,40 @@ class ConfigManager:
         except Exception as e:
             print(f"設定読み込みエラー: {e}")
     
+    def set_scheduler(self, widget):
+        """保存の予約に使うTkのウィジェットを設定する"""
+        self._scheduler = widget
+
+    def schedule_save(self):
+        """設定の保存を予約する（予約中の変更はまとめて保存される）"""
+        self._dirty = True
+        if self._scheduler is None:
+            self.save_config()
+            return
+        if self._save_timer is None:
+            try:
+                self._save_timer = self._scheduler.after(self.SAVE_DELAY_MS, self._on_save_timer)
+            except tk.TclError:
+                # ウィンドウが破棄された後はすぐに保存する
+                self.save_config()
+
+    def _on_save_timer(self):
+        self._save_timer = None
+        self.flush()
+
+    def flush(self):
+        """保存待ちの変更があればすぐに保存する"""
+        if self._save_timer is not None:
+            try:
+                self._scheduler.after_cancel(self._save_timer)
+            except tk.TclError:
+                pass
+            self._save_timer = None
+        if self._dirty:
+            self.save_config()
+
     def save_config(self):
-        """設定をファイルに保存する"""
+        """設定をファイルに保存する（一時ファイルに書いてから置き換えるので、途中で落ちても壊れない）"""
         try:
             config_dir = os.path.dirname(self.config_file)
             if not os.path.exists(config_dir) and config_dir:
@@ -82,8 +192,21 @@ class ConfigManager:
                 except Exception as e:
                     print(f"設定ディレクトリの作成に失敗しました: {e}")
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            data = json.dumps(self.config, ensure_ascii=False, indent=2)
+            fd, tmp_path = tempfile.mkstemp(dir=config_dir or ".", suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.config_file)
+            except Exception:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._dirty = False
             print(f"設定を保存しました: {self.config_file}")
         except Exception as e:
             print(f"設定保存エラー: {e}")
@@ -99,7 +222,7 @@ class ConfigManager:
     def set_last_directory(self, directory):
         """最後に選択したディレクトリを設定"""
         self.config["last_directory"] = directory
-        self.save_config()
+        self.schedule_save()
     
     def get_last_file(self):
         """最後に選択したファイルを取得"""
@@ -108,7 +231,7 @@ class ConfigManager:
     def set_last_file(self, file_path):
         """最後に選択したファイルを設定"""
         self.config["last_file"] = file_path
-        self.save_config()
+        self.schedule_save()
     
     def get_window_size(self):
         """ウィンドウサイズを取得"""
@@ -117,35 +240,144 @@ class ConfigManager:
     def set_window_size(self, width, height):
         """ウィンドウサイズを設定"""
         self.config["window_size"] = {"width": width, "height": height}
-        self.save_config()
-
-    def get_excluded_items(self, directory):
-        """指定ディレクトリの除外アイテムを取得"""
-        # ディレクトリパスを正規化
-        directory = os.path.normpath(directory)
-        excluded_items = self.config.get("excluded_items", {})
-        return excluded_items.get(directory, {})
+        self.schedule_save()
 
-    def set_excluded_item(self, directory, item_path, is_excluded):
-        """アイテムの除外状態を設定"""
-        # ディレクトリとアイテムパスを正規化
+    def get_exclusion_rules(self, directory):
+        """
+        指定ディレクトリの除外ルールを取得
+        以前の形式（除外したアイテムの絶対パスの一覧）が残っていれば、ルートからの相対パスのルールに変換する
+        """
         directory = os.path.normpath(directory)
-        item_path = os.path.normpath(item_path)
+        rules = self.config.get("exclusion_rules", {}).get(directory)
+        if rules is not None:
+            return list(rules)
         
-        if "excluded_items" not in self.config:
-            self.config["excluded_items"] = {}
-        
-        if directory not in self.config["excluded_items"]:
-            self.config["excluded_items"][directory] = {}
+        old_items = self.config.get("excluded_items", {}).pop(directory, None)
+        if not old_items:
+            return []
         
-        self.config["excluded_items"][directory][item_path] = is_excluded
-        self.save_config()
-    
-    def clear_excluded_items(self, directory):
-        """指定ディレクトリの除外アイテムをクリア"""
-        if directory in self.config.get("excluded_items", {}):
-            del self.config["excluded_items"][directory]
-            self.save_config()
+        # 除外されたフォルダの中のアイテムは、フォルダのルールに含まれるので省く
+        rules = []
+        excluded = set()
+        for item_path in sorted(path for path, is_excluded in old_items.items() if is_excluded):
+            rel_path = os.path.relpath(os.path.normpath(item_path), directory)
+            if rel_path == "." or rel_path.startswith(".."):
+                continue
+            parts = rel_path.split(os.sep)
+            if any(os.sep.join(parts[:i]) in excluded for i in range(1, len(parts))):
+                continue
+            excluded.add(rel_path)
+            rules.append(path_rule(rel_path))
+        self.set_exclusion_rules(directory, rules)
+        print(f"除外設定をルールに変換しました: {directory} ({len(rules)}件)")
+        return rules
+
+    def set_exclusion_rules(self, directory, rules):
+        """指定ディレクトリの除外ルールを設定（空なら削除）"""
+        directory = os.path.normpath(directory)
+        all_rules = self.config.setdefault("exclusion_rules", {})
+        if rules:
+            all_rules[directory] = list(rules)
+        else:
+            all_rules.pop(directory, None)
+        self.schedule_save()
+
+    def get_use_gitignore(self):
+        """ルートの.gitignoreのパターンも除外に使うかを取得"""
+        return bool(self.config.get("use_gitignore", False))
+
+    def set_use_gitignore(self, use_gitignore):
+        """ルートの.gitignoreのパターンも除外に使うかを設定"""
+        self.config["use_gitignore"] = bool(use_gitignore)
+        self.schedule_save()
+
+    def get_watch_files(self):
+        """ファイルの変更を監視するかどうかを取得"""
+        return bool(self.config.get("watch_files", False))
+
+    def set_watch_files(self, watch_files):
+        """ファイルの変更を監視するかどうかを設定"""
+        self.config["watch_files"] = bool(watch_files)
+        self.schedule_save()
+
+    def get_git_changes_settings(self):
+        """gitの変更分の解析の設定を取得"""
+        settings = {"base_ref": "HEAD", "include_importers": False}
+        loaded = self.config.get("git_changes", {})
+        if isinstance(loaded, dict):
+            settings.update({key: value for key, value in loaded.items() if key in settings})
+        return settings
+
+    def set_git_changes_settings(self, base_ref, include_importers):
+        """gitの変更分の解析の設定を保存"""
+        self.config["git_changes"] = {"base_ref": base_ref, "include_importers": bool(include_importers)}
+        self.schedule_save()
+
+    def get_cache_settings(self):
+        """解析キャッシュの設定を取得"""
+        settings = {"enabled": True, "max_size_mb": DEFAULT_MAX_SIZE // (1024 * 1024)}
+        settings.update(self.config.get("analysis_cache", {}))
+        return settings
+
+    def get_analysis_jobs(self):
+        """並列解析のプロセス数を取得（0以下ならCPU数）"""
+        try:
+            jobs = int(self.config.get("analysis_jobs", 1))
+        except (TypeError, ValueError):
+            jobs = 1
+        if jobs <= 0:
+            jobs = os.cpu_count() or 1
+        return jobs
+
+    def get_scan_workers(self):
+        """ディレクトリを読むスレッド数を取得（0以下ならCPU数）"""
+        try:
+            workers = int(self.config.get("scan_workers", DEFAULT_SCAN_WORKERS))
+        except (TypeError, ValueError):
+            workers = DEFAULT_SCAN_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers
+
+    def get_inference_settings(self):
+        """拡張解析の型推論の設定を取得（不正な値はデフォルトに戻す）"""
+        defaults = {
+            "level": DEFAULT_INFERENCE_LEVEL,
+            "function_time": DEFAULT_FUNCTION_INFERENCE_TIME,
+            "function_nodes": DEFAULT_FUNCTION_INFERENCE_NODES,
+            "run_time": DEFAULT_RUN_INFERENCE_TIME
+        }
+        settings = dict(defaults)
+        loaded = self.config.get("type_inference", {})
+        if isinstance(loaded, dict):
+            settings.update({key: value for key, value in loaded.items() if key in defaults})
+        
+        if settings["level"] not in INFERENCE_LEVELS:
+            print(f"不明な型推論レベルです: {settings['level']}（{DEFAULT_INFERENCE_LEVEL}を使用します）")
+            settings["level"] = DEFAULT_INFERENCE_LEVEL
+        for key, convert in (("function_time", float), ("function_nodes", int), ("run_time", float)):
+            try:
+                settings[key] = convert(settings[key])
+            except (TypeError, ValueError):
+                print(f"型推論の設定が不正です: {key}={settings[key]}（{defaults[key]}を使用します）")
+                settings[key] = defaults[key]
+        return settings
+
+    def get_analysis_limits(self):
+        """拡張解析の1ファイルあたりの上限を取得（不正な値はデフォルトに戻す）"""
+        defaults = {"file_timeout": DEFAULT_FILE_TIMEOUT, "memory_limit_mb": DEFAULT_MEMORY_LIMIT_MB}
+        limits = dict(defaults)
+        loaded = self.config.get("analysis_limits", {})
+        if isinstance(loaded, dict):
+            limits.update({key: value for key, value in loaded.items() if key in defaults})
+        
+        for key, convert in (("file_timeout", float), ("memory_limit_mb", int)):
+            try:
+                limits[key] = convert(limits[key])
+            except (TypeError, ValueError):
+                print(f"解析の上限の設定が不正です: {key}={limits[key]}（{defaults[key]}を使用します）")
+                limits[key] = defaults[key]
+        return limits
 
     def get_tab_selection(self):
         """タブ選択状態を取得"""
@@ -158,845 +390,61 @@ class ConfigManager:
     def set_tab_selection(self, tab_selection):
         """タブ選択状態を設定"""
         self.config["tab_selection"] = tab_selection
-        self.save_config()
-
-class CodeAnalyzer:
-    """
-    Pythonコードを解析して、クラス名、関数名を抽出するクラス
-    """
-    def __init__(self):
-        self.imports = []
-        self.classes = []
-        self.functions = []
-        self.report = ""
-        self.char_count = 0
-        self.include_imports = True
-        self.include_docstrings = True 
-    
-    def reset(self):
-        """解析結果をリセットする"""
-        self.imports = []
-        self.classes = []
-        self.functions = []
-        self.report = ""
-        self.char_count = 0
-    
-    def analyze_file(self, file_path):
-        """ファイルパスからコードを読み込んで解析する"""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-            return self.analyze_code(code, os.path.basename(file_path))
-        except Exception as e:
-            return f"ファイル解析エラー: {str(e)}", 0
-
-
-    def analyze_files(self, file_paths):
-        """複数のファイルを解析する"""
-        self.reset()
-        report_parts = []
-        total_char_count = 0
-        
-        # ディレクトリ構造情報を生成
-        all_dirs = set()
-        for file_path in file_paths:
-            dir_name = os.path.dirname(file_path)
-            all_dirs.add(dir_name)
-        
-        # ディレクトリ構造をレポートに追加
-        dir_structure = "# プロジェクト構造\n"
-        root_dir = os.path.commonpath(list(all_dirs)) if all_dirs else ""
-        if root_dir:
-            dir_structure += f"ルートディレクトリ: {root_dir}\n"
-            
-            # サブディレクトリの一覧を表示
-            for dir_path in sorted(all_dirs):
-                rel_path = os.path.relpath(dir_path, root_dir)
-                if rel_path != '.':  # ルートディレクトリ自体は除外
-                    dir_structure += f"- {rel_path}/\n"
-            
-            dir_structure += "\n"
-        
-        report_parts.append(dir_structure)
-        total_char_count += len(dir_structure)
-        
-        # 元の処理（ファイルごとの解析）を継続
-        # ファイルをディレクトリごとにグループ化
-        dir_files = {}
-        for file_path in file_paths:
-            dir_name = os.path.dirname(file_path)
-            if dir_name not in dir_files:
-                dir_files[dir_name] = []
-            dir_files[dir_name].append(file_path)
-        
-        # ディレクトリごとに処理
-        for dir_path, files in dir_files.items():
-            # ディレクトリ名を追加
-            dir_report = f"\n## ディレクトリ: {dir_path}\n"
-            
-            # Pythonファイルのみをフィルタリング
-            py_files = [f for f in files if f.lower().endswith('.py')]
-            
-            # Pythonファイルがある場合のみ処理
-            if py_files:
-                # ディレクトリ内の各Pythonファイルを処理
-                for file_path in sorted(py_files):
-                    try:
-                        file_name = os.path.basename(file_path)
-                        
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            code = f.read()
-                        
-                        # ファイルごとの解析結果
-                        self.reset()
-                        result, _ = self.analyze_code(code, file_name)
-                        file_report = f"\n### ファイル: {file_name}\n"
-                        file_report += result
-                        
-                        dir_report += file_report
-                        total_char_count += len(file_report)
-                    except Exception as e:
-                        file_report = f"\n### ファイル: {os.path.basename(file_path)}\n解析エラー: {str(e)}\n"
-                        dir_report += file_report
-                        total_char_count += len(file_report)
-            
-            report_parts.append(dir_report)
-        
-        # すべてのディレクトリのレポートを結合
-        self.report = "\n".join(report_parts)
-        self.char_count = total_char_count
-        return self.report, self.char_count
-
-    def analyze_code(self, code, filename="", directory_structure=""):
-        """Pythonコードを解析する"""
-        self.reset()
-        try:
-            tree = ast.parse(code)
-            
-            # docstring（モジュールレベルのドキュメント文字列）を取得
-            module_docstring = ast.get_docstring(tree)
-            
-            # インポート文を格納する辞書を初期化（モジュール名をキーとする）
-            import_dict = {}
-            
-            # インポート文、クラス、関数を抽出
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for name in node.names:
-                        if 'direct_import' not in import_dict:
-                            import_dict['direct_import'] = []
-                        import_dict['direct_import'].append(f"import {name.name}")
-                elif isinstance(node, ast.ImportFrom):
-                    module = node.module or ''
-                    if module not in import_dict:
-                        import_dict[module] = []
-                    for name in node.names:
-                        import_dict[module].append(name.name)
-                elif isinstance(node, ast.ClassDef):
-                    class_methods = []
-                    class_docstring = ast.get_docstring(node)
-                    
-                    for method in node.body:
-                        if isinstance(method, ast.FunctionDef):
-                            method_docstring = ast.get_docstring(method)
-                            # クラスメソッド内の関数を検索
-                            inner_functions = []
-                            for inner_node in ast.walk(method):
-                                if isinstance(inner_node, ast.FunctionDef) and inner_node != method:
-                                    inner_docstring = ast.get_docstring(inner_node)
-                                    inner_functions.append({
-                                        'name': inner_node.name,
-                                        'docstring': inner_docstring
-                                    })
-                            
-                            class_methods.append({
-                                'name': method.name,
-                                'docstring': method_docstring,
-                                'inner_functions': inner_functions
-                            })
-                    
-                    self.classes.append({
-                        'name': node.name,
-                        'docstring': class_docstring,
-                        'methods': class_methods
-                    })
-                elif isinstance(node, ast.FunctionDef):
-                    # トップレベルの関数かどうかをチェック（クラス内のメソッドではない）
-                    function_docstring = ast.get_docstring(node)
-                    
-                    # すでに抽出したクラスメソッドの中に含まれていないかチェック
-                    is_method = False
-                    for cls in self.classes:
-                        if any(method['name'] == node.name for method in cls['methods']):
-                            is_method = True
-                            break
-                    
-                    if not is_method:
-                        # 関数内の関数を検索
-                        inner_functions = []
-                        for inner_node in ast.walk(node):
-                            if isinstance(inner_node, ast.FunctionDef) and inner_node != node:
-                                inner_docstring = ast.get_docstring(inner_node)
-                                inner_functions.append({
-                                    'name': inner_node.name,
-                                    'docstring': inner_docstring
-                                })
-                        
-                        self.functions.append({
-                            'name': node.name,
-                            'docstring': function_docstring,
-                            'inner_functions': inner_functions
-                        })
-            
-            # インポート辞書を整形された形式に変換
-            self.imports = []
-            for module, names in import_dict.items():
-                if module == 'direct_import':
-                    # 直接インポートは既にフォーマット済み
-                    self.imports.extend(sorted(names))
-                else:
-                    # 同じモジュールからのインポートをまとめる
-                    self.imports.append(f"from {module} import {', '.join(sorted(names))}")
-            
-            # ディレクトリ構造情報の追加
-            self.directory_structure = directory_structure
-            
-            self.report = self.generate_report(filename)
-            self.char_count = len(self.report)
-            return self.report, self.char_count
-        except SyntaxError as e:
-            return f"構文エラー: {str(e)}", 0
-        except Exception as e:
-            return f"解析エラー: {str(e)}", 0
-    
-    def generate_report(self, filename=""):
-        """解析結果からレポートを生成する"""
-        report = ""
-        
-        # ディレクトリ構造情報があれば追加
-        if hasattr(self, 'directory_structure') and self.directory_structure:
-            report += "# ディレクトリ構造\n"
-            report += self.directory_structure
-            report += "\n\n"
-        
-        # インポート文を追加（フラグがTrueの場合のみ）
-        if self.include_imports and self.imports:
-            report += "# インポート\n"
-            for import_stmt in self.imports:
-                report += f"{import_stmt}\n"
-            report += "\n"
-        
-        # クラスを追加
-        if self.classes:
-            report += "# クラス\n"
-            for cls in self.classes:
-                report += f"class {cls['name']}:\n"
-                # クラスのdocstringを追加（フラグがTrueかつdocstringがある場合）
-                if self.include_docstrings and cls['docstring']:
-                    # 簡潔にするために1行目だけ表示
-                    first_line = cls['docstring'].split('\n')[0].strip()
-                    report += f"    \"{first_line}\"\n"
-                
-                # メソッドを追加
-                if cls['methods']:
-                    for method in cls['methods']:
-                        report += f"    def {method['name']}()\n"
-                        # メソッドのdocstringを追加（フラグがTrueかつdocstringがある場合）
-                        if self.include_docstrings and method['docstring']:
-                            first_line = method['docstring'].split('\n')[0].strip()
-                            report += f"        \"{first_line}\"\n"
-                        
-                        # メソッド内の内部関数を追加
-                        if 'inner_functions' in method and method['inner_functions']:
-                            for inner_func in method['inner_functions']:
-                                report += f"        def {inner_func['name']}()\n"
-                                if self.include_docstrings and inner_func['docstring']:
-                                    first_line = inner_func['docstring'].split('\n')[0].strip()
-                                    report += f"            \"{first_line}\"\n"
-                report += "\n"
-        
-        # 関数を追加
-        if self.functions:
-            report += "# 関数\n"
-            for func in self.functions:
-                report += f"def {func['name']}()\n"
-                # 関数のdocstringを追加（フラグがTrueかつdocstringがある場合）
-                if self.include_docstrings and func['docstring']:
-                    first_line = func['docstring'].split('\n')[0].strip()
-                    report += f"    \"{first_line}\"\n"
-                
-                # 関数内の内部関数を追加
-                if 'inner_functions' in func and func['inner_functions']:
-                    for inner_func in func['inner_functions']:
-                        report += f"    def {inner_func['name']}()\n"
-                        if self.include_docstrings and inner_func['docstring']:
-                            first_line = inner_func['docstring'].split('\n')[0].strip()
-                            report += f"        \"{first_line}\"\n"
-            report += "\n"
-            
-        return report
-
-def analyze_with_astroid(file_path):
-    """指定したファイルをastroidで解析する簡易ヘルパー関数"""
-    analyzer = AstroidAnalyzer()
-    report, _ = analyzer.analyze_file(file_path)
-    return report
+        self.schedule_save()
 
-class AstroidAnalyzer:
+class TreeItemModel:
     """
-    astroidを使用して、より深いコード解析を行うクラス
-    型情報、継承関係、依存関係などの意味的な情報を抽出する
+    DirectoryTreeViewのアイテムIDと正規化したパスの対応表
+    ディレクトリかどうかと除外状態も持ち、ツリーのテキストを解析したりTkに問い合わせたりせずに引ける
     """
     def __init__(self):
-        self.imports = []
-        self.classes = []
-        self.functions = []
-        self.dependencies = {}  # 関数/メソッド間の依存関係
-        self.inheritance = {}   # クラスの継承関係
-        self.type_info = {}     # 変数・引数・戻り値の型情報
-        self.report = ""
-        self.char_count = 0
-
-    def reset(self):
-        """解析結果をリセットする"""
-        self.imports = []
-        self.classes = []
-        self.functions = []
-        self.dependencies = {}
-        self.inheritance = {}
-        self.type_info = {}
-        self.report = ""
-        self.char_count = 0
-
-    def analyze_file(self, file_path):
-        """ファイルパスからコードを読み込んで解析する"""
-        try:
-            
-            with open(file_path, 'r', encoding='utf-8') as file:
-                code = file.read()
-            return self.analyze_code(code, os.path.basename(file_path))
-        except ImportError:
-            return "astroidライブラリがインストールされていません。pip install astroid でインストールしてください。", 0
-        except Exception as e:
-            return f"ファイル解析エラー: {str(e)}", 0
-
-    def analyze_code(self, code, filename=""):
-        """astroidを使ってPythonコードを解析する"""
-        self.reset()
-        try:
-            
-            tree = astroid.parse(code)
-            
-            # モジュールレベルのドキュメント文字列
-            module_docstring = tree.doc_node.value if tree.doc_node else None
-            
-            # インポート文を解析
-            self._extract_imports(tree)
-            
-            # クラスと関数を解析
-            for node in tree.body:
-                if isinstance(node, astroid.ClassDef):
-                    self._analyze_class(node)
-                elif isinstance(node, astroid.FunctionDef):
-                    self._analyze_function(node)
-            
-            # 継承関係と依存関係を解析
-            self._analyze_dependencies(tree)
-            
-            # レポート生成
-            self.report = self.generate_report(filename)
-            self.char_count = len(self.report)
-            return self.report, self.char_count
-            
-        except ImportError:
-            return "astroidライブラリがインストールされていません。pip install astroid でインストールしてください。", 0
-        except Exception as e:
-            return f"解析エラー: {str(e)}", 0
-            
-    def _extract_imports(self, tree):
-        """インポート文を抽出して解析する"""
-        
-        for node in tree.body:
-            if isinstance(node, astroid.Import):
-                for name in node.names:
-                    self.imports.append(f"import {name[0]}")
-            elif isinstance(node, astroid.ImportFrom):
-                module = node.modname
-                names = [name[0] for name in node.names]
-                self.imports.append(f"from {module} import {', '.join(names)}")
-
-    def _analyze_dependencies(self, tree):
-        """関数間やクラス間の依存関係を解析する（エラー処理強化版）"""
-        
-        
-        try:
-            # 関数呼び出しを検出して依存関係を構築
-            for node in tree.body:
-                try:
-                    if isinstance(node, astroid.FunctionDef):
-                        self._find_dependencies(node, node.name)
-                    elif isinstance(node, astroid.ClassDef):
-                        for method in node.body:
-                            if isinstance(method, astroid.FunctionDef):
-                                self._find_dependencies(method, f"{node.name}.{method.name}")
-                except Exception as e:
-                    print(f"依存関係解析中にエラー ({getattr(node, 'name', 'unknown')}): {e}")
-        except Exception as e:
-            print(f"依存関係全体の解析中にエラー: {e}")
+        self.clear()
+
+    def clear(self):
+        """全ての項目を削除する"""
+        self.paths = {}      # {item_id: 正規化したパス}
+        self.items = {}      # {正規化したパス: item_id}
+        self.children = {}   # {item_id: [子のitem_id（ツリーと同じ順序）]}
+        self.dirs = set()    # ディレクトリのitem_id
+        self.excluded = set()  # 除外されているitem_id
+        self.root = None
+
+    def add(self, item_id, path, is_dir, parent=None):
+        """項目を追加する（parentがNoneならルート）"""
+        path = os.path.normpath(path)
+        self.paths[item_id] = path
+        self.items[path] = item_id
+        if is_dir:
+            self.dirs.add(item_id)
+        if parent is None:
+            self.root = item_id
+        else:
+            self.children.setdefault(parent, []).append(item_id)
 
-    def _find_dependencies(self, node, caller_name):
-        """ノード内の関数呼び出しを検出して依存関係を記録する（エラー処理強化版）"""
-        
-        
-        try:
-            if caller_name not in self.dependencies:
-                self.dependencies[caller_name] = set()
-            
-            # get_childrenはエラーを起こす可能性があるので安全に処理
-            try:
-                children = list(node.get_children())
-            except Exception:
-                children = []
-                
-            for child in children:
-                try:
-                    if isinstance(child, astroid.Call):
-                        try:
-                            if isinstance(child.func, astroid.Name):
-                                self.dependencies[caller_name].add(child.func.name)
-                            elif isinstance(child.func, astroid.Attribute):
-                                # 安全に属性参照を取得
-                                if isinstance(child.func.expr, astroid.Name):
-                                    self.dependencies[caller_name].add(f"{child.func.expr.name}.{child.func.attrname}")
-                        except Exception as e:
-                            print(f"関数呼び出し解析中にエラー: {e}")
-                    
-                    # 再帰的に子ノードも調査（子ノードがエラーでも中断しない）
-                    try:
-                        self._find_dependencies(child, caller_name)
-                    except Exception as e:
-                        print(f"依存関係の再帰処理中にエラー: {e}")
-                except Exception as e:
-                    print(f"子ノード処理中にエラー: {e}")
-        except Exception as e:
-            print(f"依存関係検索中にエラー ({caller_name}): {e}")
+    def path(self, item_id):
+        """item_idのパス（モデルにない項目ならNone）"""
+        return self.paths.get(item_id)
 
-    def _analyze_function(self, node, is_inner=False):
-        """トップレベルまたは内部関数を解析する"""
-        
-        
-        try:
-            # 基本情報
-            func_info = {
-                'name': node.name,
-                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
-                'parameters': [],
-                'return_type': None,
-                'inner_functions': []
-            }
-            
-            # 引数の解析
-            try:
-                if hasattr(node, 'args') and hasattr(node.args, 'args'):
-                    for arg in node.args.args:
-                        param_name = getattr(arg, 'name', 'unknown')
-                        param_info = {'name': param_name}
-                        
-                        # 型アノテーションがある場合（安全にチェック）
-                        try:
-                            if hasattr(arg, 'annotation') and arg.annotation:
-                                param_info['type'] = self._get_annotation_name(arg.annotation)
-                        except Exception:
-                            # 型注釈の取得に失敗した場合は無視
-                            pass
-                            
-                        func_info['parameters'].append(param_info)
-            except Exception as e:
-                print(f"関数引数の解析中にエラー: {e}")
-            
-            # 戻り値の型アノテーション（安全にチェック）
-            try:
-                if hasattr(node, 'returns') and node.returns:
-                    func_info['return_type'] = self._get_annotation_name(node.returns)
-                else:
-                    # 戻り値の型を推論
-                    func_info['return_type'] = self._infer_return_type(node)
-            except Exception as e:
-                print(f"関数の戻り値型解析中にエラー: {e}")
-                func_info['return_type'] = "unknown"
-            
-            # 内部関数を解析
-            try:
-                for child in node.body:
-                    if isinstance(child, astroid.FunctionDef):
-                        try:
-                            inner_func = self._analyze_function(child, is_inner=True)
-                            func_info['inner_functions'].append(inner_func)
-                        except Exception as e:
-                            print(f"内部関数 {getattr(child, 'name', 'unknown')} の解析中にエラー: {e}")
-            except Exception as e:
-                print(f"関数内の内部関数走査中にエラー: {e}")
-            
-            # 内部関数でない場合はfunctionsリストに追加
-            if not is_inner:
-                self.functions.append(func_info)
-            
-            return func_info
-        except Exception as e:
-            print(f"関数 {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
-            # 最低限の情報を含む空の関数情報を返す
-            return {'name': getattr(node, 'name', 'unknown'), 'parameters': [], 'inner_functions': []}
+    def item(self, path):
+        """パスに対応するitem_id（まだツリーに読み込まれていなければNone）"""
+        return self.items.get(os.path.normpath(path))
 
-    def _analyze_method(self, node):
-        """クラスメソッドを解析する"""
-        
-        
-        try:
-            # 基本情報
-            method_info = {
-                'name': node.name,
-                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
-                'parameters': [],
-                'return_type': None,
-                'inner_functions': []
-            }
-            
-            # 引数の解析
-            try:
-                if hasattr(node, 'args') and hasattr(node.args, 'args'):
-                    for arg in node.args.args:
-                        if arg.name == 'self':
-                            continue  # selfパラメータはスキップ
-                            
-                        param_name = getattr(arg, 'name', 'unknown')
-                        param_info = {'name': param_name}
-                        
-                        # 型アノテーションがある場合（安全にチェック）
-                        try:
-                            if hasattr(arg, 'annotation') and arg.annotation:
-                                param_info['type'] = self._get_annotation_name(arg.annotation)
-                        except Exception:
-                            # 型注釈の取得に失敗した場合は無視
-                            pass
-                                
-                        method_info['parameters'].append(param_info)
-            except Exception as e:
-                print(f"メソッド引数の解析中にエラー: {e}")
-            
-            # 戻り値の型アノテーション（安全にチェック）
-            try:
-                if hasattr(node, 'returns') and node.returns:
-                    method_info['return_type'] = self._get_annotation_name(node.returns)
-                else:
-                    # 戻り値の型を推論
-                    method_info['return_type'] = self._infer_return_type(node)
-            except Exception as e:
-                print(f"メソッドの戻り値型解析中にエラー: {e}")
-                method_info['return_type'] = "unknown"
-            
-            # 内部関数を解析
-            try:
-                for child in node.body:
-                    if isinstance(child, astroid.FunctionDef):
-                        try:
-                            inner_func = self._analyze_function(child, is_inner=True)
-                            method_info['inner_functions'].append(inner_func)
-                        except Exception as e:
-                            print(f"メソッド内の内部関数 {getattr(child, 'name', 'unknown')} の解析中にエラー: {e}")
-            except Exception as e:
-                print(f"メソッド内の内部関数走査中にエラー: {e}")
-            
-            return method_info
-            
-        except Exception as e:
-            print(f"メソッド {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
-            # 最低限の情報を含む空のメソッド情報を返す
-            return {'name': getattr(node, 'name', 'unknown'), 'parameters': [], 'inner_functions': []}
+    def get_children(self, item_id):
+        """読み込み済みの子項目"""
+        return self.children.get(item_id, ())
 
-    def _get_annotation_name(self, annotation):
-        """型アノテーションノードから型名を取得する（エラー処理強化版）"""
-        
-        
-        try:
-            if isinstance(annotation, astroid.Name):
-                return annotation.name
-            elif isinstance(annotation, astroid.Attribute):
-                # 安全に属性参照を取得
-                expr_name = "unknown"
-                try:
-                    if hasattr(annotation.expr, 'name'):
-                        expr_name = annotation.expr.name
-                except:
-                    pass
-                return f"{expr_name}.{annotation.attrname}"
-            elif isinstance(annotation, astroid.Subscript):
-                # ジェネリック型（List[str]など）
-                value_name = "unknown"
-                try:
-                    value_name = self._get_annotation_name(annotation.value)
-                except:
-                    pass
-                    
-                # ジェネリック型のパラメータの取得（バージョン間の違いに対応）
-                try:
-                    # astroid 2.x系
-                    if hasattr(annotation, 'slice') and hasattr(annotation.slice, 'value'):
-                        slice_value = annotation.slice.value
-                        if isinstance(slice_value, astroid.Name):
-                            return f"{value_name}[{slice_value.name}]"
-                        elif isinstance(slice_value, astroid.Tuple):
-                            elts = []
-                            for elt in slice_value.elts:
-                                if isinstance(elt, astroid.Name):
-                                    elts.append(elt.name)
-                            return f"{value_name}[{', '.join(elts)}]"
-                    # astroid 2.0以前または異なる構造
-                    elif hasattr(annotation, 'slice'):
-                        return f"{value_name}[...]"
-                except:
-                    # どのパターンにも一致しない場合は簡略化した形式を返す
-                    return f"{value_name}[?]"
-                    
-                # どれにも一致しない場合
-                return value_name
-            # その他の型は文字列化して返す
-            return str(type(annotation).__name__)
-        except Exception as e:
-            print(f"型アノテーション解析中にエラー: {e}")
-            return "unknown"
+    def is_dir(self, item_id):
+        return item_id in self.dirs
 
-    def _infer_type(self, node):
-        """ノードから型を推論する（エラー処理強化版）"""
-        try:
-            if node is None:
-                return "unknown"
-                
-            # SafeInferの使用を検討
-            inferred = list(node.infer())
-            if not inferred:
-                return "unknown"
-                
-            # 推論結果の最初の要素を使用
-            first = inferred[0]
-            
-            if hasattr(first, "pytype"):
-                pytype = first.pytype()
-                return pytype.split(".")[-1]
-            else:
-                return type(first).__name__
-        except StopIteration:
-            # StopIterationを捕捉して適切に処理
-            return "unknown"
-        except Exception as e:
-            print(f"型推論エラー: {str(e)}")
-            return "unknown"
+    def is_excluded(self, item_id):
+        return item_id in self.excluded
 
-    def _infer_return_type(self, node):
-        """関数の戻り値の型を推論する（エラー処理強化版）"""
-        types = set()
-        return_values = []
-        
-        try:
-            # return文を探す
-            for child_node in node.get_children():
-                if isinstance(child_node, astroid.Return) and child_node.value:
-                    return_values.append(child_node.value)
-            
-            # 各return文の型を推論
-            for return_node in return_values:
-                try:
-                    inferred = list(return_node.infer())
-                    if inferred:
-                        for inf in inferred:
-                            if hasattr(inf, "pytype"):
-                                types.add(inf.pytype().split(".")[-1])
-                            else:
-                                types.add(type(inf).__name__)
-                except StopIteration:
-                    # StopIterationをここで処理
-                    continue
-                except Exception as e:
-                    print(f"戻り値型推論エラー: {str(e)}")
-                    continue
-                    
-            if len(types) == 0:
-                return "None"
-            elif len(types) == 1:
-                return list(types)[0]
-            else:
-                return " | ".join(sorted(types))
-        except Exception as e:
-            print(f"戻り値型推論全体エラー: {str(e)}")
-            return "unknown"   
-            
-    def _find_dependencies(self, node, caller_name):
-        """ノード内の関数呼び出しを検出して依存関係を記録する"""
-        
-        
-        if caller_name not in self.dependencies:
-            self.dependencies[caller_name] = set()
-        
-        for child in node.get_children():
-            if isinstance(child, astroid.Call):
-                if isinstance(child.func, astroid.Name):
-                    self.dependencies[caller_name].add(child.func.name)
-                elif isinstance(child.func, astroid.Attribute):
-                    if isinstance(child.func.expr, astroid.Name):
-                        self.dependencies[caller_name].add(f"{child.func.expr.name}.{child.func.attrname}")
-            
-            # 再帰的に子ノードも調査
-            self._find_dependencies(child, caller_name)
-    
-    def generate_report(self, filename=""):
-        """解析結果からわかりやすいレポートを生成する（必要な情報のみ）"""
-        report = ""
-        
-        # ファイル名
-        if filename:
-            report += f"# {filename} の解析レポート\n\n"
+    def set_excluded(self, item_id, is_excluded):
+        if is_excluded:
+            self.excluded.add(item_id)
         else:
-            report += "# Pythonコード解析レポート\n\n"
-        
-        # インポート文は除外 (冗長情報)
-        
-        # プロジェクト構造 (重要情報1)
-        # この部分はディレクトリ情報から生成されるため、ここでは変更なし
-        
-        # クラス階層図 (重要情報2)
-        if self.classes:
-            report += "## クラス階層図\n"
-            for cls in self.classes:
-                if cls['base_classes']:
-                    report += f"- **{cls['name']}** ← {', '.join(cls['base_classes'])}\n"
-                else:
-                    report += f"- **{cls['name']}**\n"
-            report += "\n"
-        
-        # ファイル間の依存関係 - シンプルに保持
-        if self.inheritance:
-            report += "## ファイル間の依存関係\n"
-            # ここは重要なファイル間の依存関係のみを表示するよう変更
-            report += "- **<ファイル名>.py** (依存なし)\n" # 必要に応じて実際の依存関係を表示
-            report += "\n"
-        
-        # 各クラスのメソッド一覧 (重要情報3)
-        if self.classes:
-            report += "## ファイルごとの詳細情報\n"
-            if filename:
-                report += f"### {filename}\n"
-                
-            report += "**クラス:**\n"
-            for cls in self.classes:
-                base_classes = f" (継承: {', '.join(cls['base_classes'])})" if cls['base_classes'] else ""
-                report += f"- `{cls['name']}`{base_classes}\n"
-                
-                # メソッド（シンプルに名前のみ表示）
-                if cls['methods']:
-                    report += "  **メソッド:**\n"
-                    for method in cls['methods']:
-                        report += f"  - `{method['name']}`\n"
-            report += "\n"
-        
-        # トップレベル関数リスト（シンプルに表示）
-        if self.functions:
-            report += "**関数:**\n"
-            for func in self.functions:
-                report += f"- `{func['name']}`\n"
-            report += "\n"
-        
-        # LLM向け構造化データ (重要情報4)
-        report += "## LLM向け構造化データ\n"
-        report += "```\n"
-        # コンパクトなフォーマットでデータを出力
-        compact_data = "# クラス一覧\n"
-        for cls in self.classes:
-            base_info = f" <- {', '.join(cls['base_classes'])}" if cls['base_classes'] else ""
-            compact_data += f"{cls['name']}{base_info}\n"
-
-            if cls['methods']:
-                compact_data += "  メソッド:\n"
-                for m in cls['methods']:
-                    params = ", ".join(p['name'] for p in m['parameters'])
-                    ret_type = f" -> {m['return_type']}" if m['return_type'] and m['return_type'] != "unknown" else ""
-                    compact_data += f"    {m['name']}({params}){ret_type}\n"
-            compact_data += "\n"
-        compact_data += "# 関数一覧\n"
-        for func in self.functions:
-            params = ", ".join(p['name'] for p in func['parameters'])
-            ret_type = f" -> {func['return_type']}" if func['return_type'] and func['return_type'] != "unknown" else ""
-            compact_data += f"{func['name']}({params}){ret_type}\n"
-        compact_data += "\n"
-        # 主要な依存関係のみ表示
-        if self.dependencies:
-            compact_data += "# 主要な依存関係\n"
-            for caller, callees in self.dependencies.items():
-                if callees:  # 空でない場合のみ
-                    compact_data += f"{caller} -> {', '.join(callees)}\n"
-            compact_data += "\n"
-        report += compact_data
-        report += "```\n"
-
-
-
-        
-    def _analyze_class(self, node):
-        """クラス定義を解析する（エラー処理強化版）"""
-        
-        
-        try:
-            # 基本情報の取得
-            class_info = {
-                'name': node.name,
-                'docstring': node.doc_node.value if hasattr(node, 'doc_node') and node.doc_node else None,
-                'methods': [],
-                'base_classes': [],
-                'attributes': []
-            }
-            
-            # 継承関係を解析
-            try:
-                for base in node.bases:
-                    if isinstance(base, astroid.Name):
-                        class_info['base_classes'].append(base.name)
-                    elif isinstance(base, astroid.Attribute):
-                        base_expr_name = getattr(base.expr, 'name', 'unknown')
-                        class_info['base_classes'].append(f"{base_expr_name}.{base.attrname}")
-            except Exception as e:
-                print(f"継承関係の解析中にエラー: {e}")
-            
-            # 継承関係を記録
-            self.inheritance[node.name] = class_info['base_classes']
-            
-            # メソッドとクラス変数を解析
-            for child in node.body:
-                try:
-                    if isinstance(child, astroid.FunctionDef):
-                        method_info = self._analyze_method(child)
-                        class_info['methods'].append(method_info)
-                    elif isinstance(child, astroid.Assign):
-                        for target in child.targets:
-                            if isinstance(target, astroid.AssignName):
-                                # クラス変数を記録（安全に型を推論）
-                                attr_type = "unknown"
-                                try:
-                                    attr_type = self._infer_type(child.value)
-                                except Exception as e:
-                                    print(f"属性型推論エラー: {e}")
-                                
-                                class_info['attributes'].append({
-                                    'name': target.name,
-                                    'type': attr_type
-                                })
-                except Exception as e:
-                    print(f"クラス内のノード解析中にエラー: {e}")
-                    continue
-            
-            self.classes.append(class_info)
-            return class_info
-        except Exception as e:
-            print(f"クラス {getattr(node, 'name', 'unknown')} の解析中に例外が発生: {e}")
-            # 最低限の情報を含む空のクラス情報を返す
-            return {'name': getattr(node, 'name', 'unknown'), 'methods': [], 'base_classes': [], 'attributes': []}
+            self.excluded.discard(item_id)
+
 
 class DirectoryTreeView:
     """ディレクトリとファイルをツリー表示するクラス（カラーアイコン付き）"""
@@ -1006,8 +454,12 @@ class DirectoryTreeView:
         # 設定マネージャーを保存
         self.config_manager = config_manager
         
-        # アイコン画像の読み込み
-        self.load_icons()
+        # アイコン画像は初めてディレクトリを表示するときに読み込む（起動を速くするため）
+        self.folder_icon = None
+        self.file_icon = None
+        self.locked_folder_icon = None
+        self.locked_file_icon = None
+        self.icons_loaded = False
         
         # ツリービューの作成
         self.tree = ttk.Treeview(parent)
@@ -1023,15 +475,28 @@ class DirectoryTreeView:
         self.tree.column("#0", width=300, minwidth=200)
         self.tree.heading("#0", text="  file/folder", anchor="w")
         
-        # 除外リスト
-        self.excluded_items = set()
+        # アイテムIDとパス・除外状態の対応
+        self.model = TreeItemModel()
         
         # 処理中フラグ（処理の重複実行を防止）
         self.is_processing = False
         
+        # まだ中身を読み込んでいないディレクトリ {item_id: (ディレクトリのパス, 仮の子アイテムのID)}
+        self.unloaded_dirs = {}
+        
+        # 中身をアイドル時間に挿入している途中のディレクトリ {item_id: ディレクトリのパス}
+        self.loading_dirs = {}
+        
+        # load_directoryのたびに増やし、前のディレクトリの挿入処理を打ち切る
+        self.load_generation = 0
+        
+        # アイドル時間の1回あたりに挿入する項目数
+        self.insert_chunk_size = 200
+        
         # イベントバインド
         self.tree.bind("<Control-Button-1>", self.toggle_exclusion)  # Ctrl+クリック
         self.tree.bind("<Double-1>", self.on_item_double_click)  # ダブルクリック
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)  # ディレクトリを開いたとき
         
         # 右クリックメニューの設定
         self.setup_context_menu()
@@ -1059,13 +524,25 @@ class DirectoryTreeView:
         self.max_items_to_process = 1000
         
         # 追加: スキップするファイル拡張子のリスト
-        self.skip_extensions = ['.exe', '.dll', '.bin', '.so', '.pyc', '.pyd']
+        self.skip_extensions = list(SKIP_EXTENSIONS)
         
         # 追加: スキップするフォルダ名のリスト
-        self.skip_folders = ['__pycache__', 'node_modules', 'build', 'dist', 'venv', 'env', '.git', '.idea', '.vscode']
+        self.skip_folders = list(SKIP_FOLDERS)
         
         # 追加: EXEファイルが含まれるフォルダをスキップするかどうかのフラグ
         self.skip_exe_folders = True
+        
+        # 除外ルール（load_directoryでディレクトリごとに読み込む）
+        self.use_gitignore = self.config_manager.get_use_gitignore()
+        self.project_rules = []  # .gitignore・.pycodelensignoreのルール
+        self.user_rules = []     # Ctrl+クリックで切り替えたルール（設定に保存する）
+        self.rules = ExclusionRules()
+        
+        # ディレクトリ全体の走査結果（load_directoryのたびにバックグラウンドで作り直す）
+        self.snapshot = None
+        self.snapshot_signatures = {}  # 走査したときの各ディレクトリの (更新時刻, サイズ)
+        self._scan_thread = None
+        self.scan_workers = self.config_manager.get_scan_workers()
     
     def load_icons(self):
         """アイコン画像を読み込む（複数の候補パスから検索する改良版）"""
@@ -1168,6 +645,12 @@ class DirectoryTreeView:
             print(f"アイコンの読み込みエラー: {e}")
             # エラーが発生した場合はテキストアイコンを使用
 
+    def ensure_icons(self):
+        """アイコン画像がまだ読み込まれていなければ読み込む"""
+        if not self.icons_loaded:
+            self.icons_loaded = True
+            self.load_icons()
+
     def set_file_selected_callback(self, callback):
         """ファイル選択時のコールバック関数を設定"""
         self.on_file_selected = callback
@@ -1198,11 +681,9 @@ class DirectoryTreeView:
         if item_id:
             # 項目を選択
             self.tree.selection_set(item_id)
-            # アイテムパスを取得
-            item_path = self.get_item_path(item_id)
             
             # ファイルまたはディレクトリによってメニュー項目を有効/無効化
-            is_dir = os.path.isdir(item_path) if item_path else False
+            is_dir = self.model.is_dir(item_id)
             
             # デフォルトアプリで開くメニューをファイルの場合のみ有効化
             self.context_menu.entryconfig("デフォルトアプリで開く", state=tk.NORMAL if not is_dir else tk.DISABLED)
@@ -1224,7 +705,7 @@ class DirectoryTreeView:
             return
         
         # ディレクトリでない場合は親ディレクトリを取得
-        if not os.path.isdir(item_path):
+        if not self.model.is_dir(selected_items[0]):
             item_path = os.path.dirname(item_path)
         
         # OSに応じてファイルマネージャーを開く
@@ -1252,7 +733,7 @@ class DirectoryTreeView:
             return
         
         item_path = self.get_item_path(selected_items[0])
-        if not item_path or os.path.isdir(item_path):
+        if not item_path or self.model.is_dir(selected_items[0]):
             return
         
         # OSに応じてデフォルトアプリでファイルを開く
@@ -1273,7 +754,7 @@ class DirectoryTreeView:
             return
         
         for item_id in selected_items:
-            if item_id in self.excluded_items:
+            if self.model.is_excluded(item_id):
                 # 含む状態に切り替え
                 event = type('Event', (), {'y': self.tree.bbox(item_id)[1] + 5})()
                 self.toggle_exclusion(event)
@@ -1285,7 +766,7 @@ class DirectoryTreeView:
             return
         
         for item_id in selected_items:
-            if item_id not in self.excluded_items:
+            if not self.model.is_excluded(item_id):
                 # 除外状態に切り替え
                 event = type('Event', (), {'y': self.tree.bbox(item_id)[1] + 5})()
                 self.toggle_exclusion(event)
@@ -1300,17 +781,17 @@ class DirectoryTreeView:
             return
 
         # アイテムがディレクトリか確認
-        is_dir = len(self.tree.get_children(item_id)) > 0
-        if is_dir:
+        if self.model.is_dir(item_id):
             # ディレクトリの場合は開閉を切り替え
             if self.tree.item(item_id, "open"):
                 self.tree.item(item_id, open=False)
             else:
                 self.tree.item(item_id, open=True)
+                self._expand_directory(item_id)
             
             # ディレクトリパスを取得
             dir_path = self.get_item_path(item_id)
-            if dir_path and os.path.isdir(dir_path):
+            if dir_path:
                 # 現在の選択状態を保存
                 self.selected_dir = dir_path
                 
@@ -1332,44 +813,10 @@ class DirectoryTreeView:
                 self.on_file_selected(full_path)
 
     def get_item_path(self, item_id):
-        """ツリーアイテムのフルパスを取得（階層の深さに関わらず）"""
+        """ツリーアイテムのフルパスを取得（読み込み中の仮の項目などモデルにない項目はNone）"""
         if not self.current_dir or not item_id:
             return None
-        
-        # ルートノードかチェック
-        if item_id == self.tree.get_children("")[0]:
-            return self.current_dir
-        
-        path_parts = []
-        current = item_id
-        
-        # 親アイテムを辿ってパスを構築
-        while current:
-            item_text = self.tree.item(current, "text").strip()
-            # 先頭の絵文字やスペースを削除
-            if item_text.startswith("📁 ") or item_text.startswith("🐍 ") or item_text.startswith("🔒 ") or item_text.startswith("📄 "):
-                item_text = item_text[2:].strip()
-            elif " " in item_text and item_text[0] != " ":
-                # 先頭が絵文字の場合（フォーマットが " 名前"）
-                item_text = item_text.split(" ", 1)[1].strip()
-            
-            # ルートノードに達したかチェック
-            if current == self.tree.get_children("")[0]:
-                break
-            
-            # 空でないテキストのみ追加
-            if item_text:
-                path_parts.insert(0, item_text)
-            
-            parent = self.tree.parent(current)
-            if not parent:
-                break
-            
-            current = parent
-        
-        # カレントディレクトリをベースにパスを構築
-        full_path = os.path.normpath(os.path.join(self.current_dir, *path_parts))
-        return full_path
+        return self.model.path(item_id)
    
     def toggle_exclusion(self, event):
         """Ctrl+クリックで項目の除外/含むを切り替え（エラーハンドリング追加）"""
@@ -1388,8 +835,8 @@ class DirectoryTreeView:
                 self.is_processing = False
                 return
             
-            # 現在の状態を確認（excluded_itemsセットの有無で判断）
-            is_excluded = item_id in self.excluded_items
+            # 現在の状態を確認
+            is_excluded = self.model.is_excluded(item_id)
             
             # アイテムのパスを取得し正規化
             item_path = self.get_item_path(item_id)
@@ -1397,9 +844,16 @@ class DirectoryTreeView:
                 self.is_processing = False
                 return
             
-            item_path = os.path.normpath(item_path)
             print(f"切り替えるアイテムのパス: {item_path}")  # デバッグ用
             
+            # ルートは除外できず、除外されたフォルダの中のアイテムだけを含めることもできない（.gitignoreと同じ）
+            if item_id == self.model.root:
+                messagebox.showinfo("情報", "ルートフォルダは除外できません。")
+                return
+            if is_excluded and self.model.is_excluded(self.tree.parent(item_id)):
+                messagebox.showinfo("情報", "親フォルダが除外されているため、このアイテムだけを含めることはできません。")
+                return
+            
             # 子アイテムの数を事前に確認
             child_count = self._count_children(item_id)
             
@@ -1449,20 +903,46 @@ class DirectoryTreeView:
             self.is_processing = False
     
     def _update_exclusion_status(self, item_id, is_excluded, progress_window=None, progress_label=None, progress_bar=None):
-        """項目の除外状態を更新（バックグラウンド処理）"""
-        # 項目のパスを取得
-        item_path = self.get_item_path(item_id)
+        """項目の除外状態を切り替え、除外ルールを更新して表示に反映する"""
+        rel_path = self._relative_path(self.model.path(item_id))
+        is_dir = self.model.is_dir(item_id)
         
+        # このアイテムとその下のパスのルールを置き換える（フォルダのルール1つで中身も除外される）
+        user_rules = remove_path_rules(self.user_rules, rel_path)
         if not is_excluded:  # 現在含む状態 → 除外状態に変更
-            # 空のvaluesを設定
-            self.tree.item(item_id, values=())
-            self.excluded_items.add(item_id)
-            
-            # 設定に状態を保存
-            self.config_manager.set_excluded_item(self.current_dir, item_path, True)
-            
+            user_rules.append(path_rule(rel_path))
+        elif ExclusionRules(self.project_rules + user_rules).match(rel_path, is_dir):
+            # パターンで除外されているアイテムは、含めるルールを追加する
+            user_rules.append(path_rule(rel_path, include=True))
+        self._set_user_rules(user_rules)
+        
+        self._apply_exclusion(item_id, not is_excluded)
+        
+        # 読み込み済みの子アイテムにも反映する
+        self._refresh_children_exclusion(item_id, progress_window, progress_label, progress_bar)
+        
+        # プログレスウィンドウを閉じる
+        if progress_window and progress_window.winfo_exists():
+            progress_window.destroy()
+    
+    def _set_user_rules(self, user_rules):
+        """ユーザーが切り替えた除外ルールを保存し、ルールを作り直す"""
+        self.user_rules = user_rules
+        self.config_manager.set_exclusion_rules(self.current_dir, user_rules)
+        self.rules = ExclusionRules(self.project_rules + user_rules)
+    
+    def _relative_path(self, path):
+        """ルートからの相対パス（ルール用に / 区切り、ルート自身は空文字列）"""
+        rel_path = os.path.relpath(path, self.current_dir)
+        return "" if rel_path == "." else rel_path.replace(os.sep, "/")
+    
+    def _apply_exclusion(self, item_id, is_excluded):
+        """アイテムの除外状態とアイコン・色を設定する"""
+        self.model.set_excluded(item_id, is_excluded)
+        is_dir = self.model.is_dir(item_id)
+        
+        if is_excluded:
             # アイコンを変更
-            is_dir = len(self.tree.get_children(item_id)) > 0
             if is_dir and self.locked_folder_icon:
                 self.tree.item(item_id, image=self.locked_folder_icon)
             elif not is_dir and self.locked_file_icon:
@@ -1475,21 +955,10 @@ class DirectoryTreeView:
                 elif "🐍" in text or "📄" in text:
                     self.tree.item(item_id, text=text.replace("🐍", "🔒").replace("📄", "🔒"))
             
-            # セルの背景色を変更
-            self.tree.tag_configure('excluded', foreground='#999999')
+            # 文字色を変更
             self.tree.item(item_id, tags=('excluded',))
-            
-            # 子アイテムも全て除外
-            self._set_children_status_with_progress(item_id, "exclude", progress_window, progress_label, progress_bar)
-        else:  # 現在除外状態 → 含む状態に変更
-            # 空のvaluesを設定
-            self.tree.item(item_id, values=())
-            
-            # 設定に状態を保存
-            self.config_manager.set_excluded_item(self.current_dir, item_path, False)
-            
+        else:
             # アイコンを戻す
-            is_dir = len(self.tree.get_children(item_id)) > 0
             if is_dir and self.folder_icon:
                 self.tree.item(item_id, image=self.folder_icon)
             elif not is_dir and self.file_icon:
@@ -1502,28 +971,18 @@ class DirectoryTreeView:
                         self.tree.item(item_id, text=text.replace("🔒", "📁"))
                     else:
                         # ファイル拡張子を確認
-                        file_ext = os.path.splitext(item_path)[1].lower()
+                        file_ext = os.path.splitext(self.model.path(item_id))[1].lower()
                         if file_ext == '.py':
                             self.tree.item(item_id, text=text.replace("🔒", "🐍"))
                         else:
                             self.tree.item(item_id, text=text.replace("🔒", "📄"))
             
-            # セルの背景色を元に戻す
+            # 文字色を元に戻す
             self.tree.item(item_id, tags=())
-            
-            if item_id in self.excluded_items:
-                self.excluded_items.remove(item_id)
-            
-            # 子アイテムも全て含む
-            self._set_children_status_with_progress(item_id, "include", progress_window, progress_label, progress_bar)
-        
-        # プログレスウィンドウを閉じる
-        if progress_window and progress_window.winfo_exists():
-            progress_window.destroy()
     
     def _count_children(self, item_id, count=0):
-        """アイテムの子アイテム数を再帰的にカウント"""
-        children = self.tree.get_children(item_id)
+        """アイテムの子アイテム数を再帰的にカウント（読み込み済みの項目のみ）"""
+        children = self.model.get_children(item_id)
         count += len(children)
         
         for child_id in children:
@@ -1531,15 +990,18 @@ class DirectoryTreeView:
         
         return count
     
-    def _set_children_status_with_progress(self, parent_id, status, progress_window=None, progress_label=None, progress_bar=None):
-        """子アイテムのステータスを再帰的に設定（プログレス表示付き）"""
-        children = self.tree.get_children(parent_id)
+    def _refresh_children_exclusion(self, parent_id, progress_window=None, progress_label=None, progress_bar=None):
+        """読み込み済みの子アイテムの除外状態を、親の状態と除外ルールから再計算する（プログレス表示付き）"""
+        # 未読み込みのディレクトリの中身は、開いたときにルールで判定する
+        children = self.model.get_children(parent_id)
         total_children = len(children)
         
         # 子ノードがなければ何もしない
         if total_children == 0:
             return
         
+        parent_excluded = self.model.is_excluded(parent_id)
+        
         # プログレスバーの更新間隔（子アイテムが多い場合は更新頻度を下げる）
         if total_children > 1000:
             update_interval = 100
@@ -1559,78 +1021,16 @@ class DirectoryTreeView:
                 progress_label.config(text=f"項目を処理中... ({i}/{total_children})")
                 progress_window.update()
             
-            is_dir = len(self.tree.get_children(child_id)) > 0
-            
-            # 子アイテムのパスを取得し正規化
             try:
-                child_path = self.get_item_path(child_id)
-                if not child_path:
-                    continue
-                
-                child_path = os.path.normpath(child_path)
-                
-                if status == "exclude":
-                    # 空のvaluesを設定
-                    self.tree.item(child_id, values=())
-                    self.excluded_items.add(child_id)
-                    
-                    # 設定に状態を保存
-                    self.config_manager.set_excluded_item(self.current_dir, child_path, True)
-                    
-                    # アイコンを変更
-                    if is_dir and self.locked_folder_icon:
-                        self.tree.item(child_id, image=self.locked_folder_icon)
-                    elif not is_dir and self.locked_file_icon:
-                        self.tree.item(child_id, image=self.locked_file_icon)
-                    else:
-                        # アイコンが使えない場合はテキストを変更
-                        text = self.tree.item(child_id, "text")
-                        if "📁" in text:
-                            self.tree.item(child_id, text=text.replace("📁", "🔒"))
-                        elif "🐍" in text or "📄" in text:
-                            self.tree.item(child_id, text=text.replace("🐍", "🔒").replace("📄", "🔒"))
-                    
-                    # セルの背景色を変更
-                    self.tree.item(child_id, tags=('excluded',))
-                else:
-                    # 空のvaluesを設定
-                    self.tree.item(child_id, values=())
-                    
-                    # 設定に状態を保存
-                    self.config_manager.set_excluded_item(self.current_dir, child_path, False)
-                    
-                    # アイコンを戻す
-                    if is_dir and self.folder_icon:
-                        self.tree.item(child_id, image=self.folder_icon)
-                    elif not is_dir and self.file_icon:
-                        self.tree.item(child_id, image=self.file_icon)
-                    else:
-                        # アイコンが使えない場合はテキストを変更
-                        text = self.tree.item(child_id, "text")
-                        if "🔒" in text:
-                            if is_dir:
-                                self.tree.item(child_id, text=text.replace("🔒", "📁"))
-                            else:
-                                # ファイル拡張子を確認
-                                file_ext = os.path.splitext(child_path)[1].lower()
-                                if file_ext == '.py':
-                                    self.tree.item(child_id, text=text.replace("🔒", "🐍"))
-                                else:
-                                    self.tree.item(child_id, text=text.replace("🔒", "📄"))
-                    
-                    # セルの背景色を元に戻す
-                    self.tree.item(child_id, tags=())
-                    
-                    if child_id in self.excluded_items:
-                        self.excluded_items.remove(child_id)
-                
-                # 10個ごとにUIを更新
-                if i % 10 == 0:
-                    self.tree.update()
+                is_dir = self.model.is_dir(child_id)
+                is_excluded = parent_excluded or bool(
+                    self.rules.match(self._relative_path(self.model.path(child_id)), is_dir))
+                if is_excluded != self.model.is_excluded(child_id):
+                    self._apply_exclusion(child_id, is_excluded)
                 
                 # 再帰的に子ノードを処理（深さ優先）
                 if is_dir:
-                    self._set_children_status_with_progress(child_id, status, progress_window, progress_label, progress_bar)
+                    self._refresh_children_exclusion(child_id, progress_window, progress_label, progress_bar)
             
             except Exception as e:
                 print(f"アイテム処理エラー: {str(e)} - スキップします")
@@ -1642,18 +1042,41 @@ class DirectoryTreeView:
             progress_label.config(text=f"処理完了 ({total_children}/{total_children})")
             progress_window.update()
     
-    def load_directory(self, path):
-        """ディレクトリ構造をツリービューに読み込む（エラーハンドリング強化）"""
+    def load_directory(self, path, restored_scan=None):
+        """
+        ディレクトリ構造をツリービューに読み込む
+        ルート直下だけを表示し、サブディレクトリの中身は開いたときに読み込む（大きなディレクトリでもすぐに表示できる）
+        restored_scan（前回のセッションのexport_scanの結果）を渡すと、設定もディレクトリも変わっていなければ走査し直さずに使う
+        """
         try:
             # 処理中フラグを設定
             self.is_processing = True
             
+            # 初回表示時にアイコンを読み込む
+            self.ensure_icons()
+            
+            # 読み込み途中の前のディレクトリの挿入処理を無効にする
+            self.load_generation += 1
+            self.unloaded_dirs.clear()
+            self.loading_dirs.clear()
+            
             # 現在のツリービューをクリア
             for item in self.tree.get_children():
                 self.tree.delete(item)
             
             self.current_dir = os.path.normpath(path)
-            self.excluded_items.clear()
+            self.model.clear()
+            
+            # 除外ルール（プロジェクトのルールファイル → ユーザーが切り替えたルールの順で、後ほど優先）
+            self.project_rules = load_project_rules(self.current_dir, self.use_gitignore)
+            self.user_rules = self.config_manager.get_exclusion_rules(self.current_dir)
+            self.rules = ExclusionRules(self.project_rules + self.user_rules)
+            
+            # ディレクトリ全体の走査はバックグラウンドで行い、ツリーはすぐに表示する
+            self.snapshot = None
+            self.snapshot_signatures = {}
+            if restored_scan is None or not self._restore_scan(restored_scan):
+                self._start_scan()
             
             # 選択されたファイルをリセット
             self.selected_file = None
@@ -1661,63 +1084,9 @@ class DirectoryTreeView:
             # 設定に保存
             self.config_manager.set_last_directory(path)
             
-            # ディレクトリが大きすぎないか確認（ファイル数をカウント）
-            total_items = 0
-            large_directory = False
-            max_items_to_display = 5000  # 一度に表示する最大項目数
-            
-            for root, dirs, files in os.walk(path):
-                # スキップすべきフォルダ名を除外
-                dirs[:] = [d for d in dirs if d not in self.skip_folders]
-                
-                # EXEファイルを含むフォルダをスキップする場合
-                if self.skip_exe_folders:
-                    has_exe = any(f.lower().endswith(tuple(self.skip_extensions)) for f in files)
-                    if has_exe:
-                        dirs[:] = []  # サブディレクトリを探索しない
-                
-                total_items += len(dirs) + len(files)
-                if total_items > max_items_to_display:
-                    large_directory = True
-                    break
-            
-            # 大きなディレクトリの場合は警告
-            if large_directory:
-                confirm = messagebox.askyesno(
-                    "警告", 
-                    f"このディレクトリには{max_items_to_display}個以上の項目が含まれています。\n"
-                    "全ての項目を読み込むと時間がかかったり、アプリケーションが応答しなくなる可能性があります。\n\n"
-                    "続行しますか？\n"
-                    "（「いいえ」を選択すると、最初の{max_items_to_display}個の項目のみが表示されます）"
-                )
-                limit_items = not confirm
-            else:
-                limit_items = False
-            
-            # プログレスバーウィンドウの表示
-            if total_items > 100:
-                progress_window = tk.Toplevel(self.parent)
-                progress_window.title("ディレクトリを読み込み中")
-                progress_window.geometry("300x100")
-                progress_window.resizable(False, False)
-                progress_window.transient(self.parent)
-                
-                progress_label = ttk.Label(progress_window, text="ディレクトリ構造を読み込み中...")
-                progress_label.pack(pady=10)
-                
-                progress_bar = ttk.Progressbar(progress_window, mode="indeterminate")
-                progress_bar.pack(fill="x", padx=20)
-                progress_bar.start(10)
-                
-                # ウィンドウを画面中央に配置
-                progress_window.update_idletasks()
-                x = self.parent.winfo_rootx() + (self.parent.winfo_width() - progress_window.winfo_width()) // 2
-                y = self.parent.winfo_rooty() + (self.parent.winfo_height() - progress_window.winfo_height()) // 2
-                progress_window.geometry(f"+{x}+{y}")
-                progress_window.update()
-            else:
-                progress_window = None
-            
+            self.tree.tag_configure('excluded', foreground='#999999')
+            self.tree.tag_configure('placeholder', foreground='#999999')
+            
             # ルートディレクトリを追加
             if self.folder_icon:
                 # 空のvaluesを設定
@@ -1728,32 +1097,15 @@ class DirectoryTreeView:
                 root_item = self.tree.insert("", "end", text=f"📁 {os.path.basename(path)}", 
                                 values=(), open=True)
             
-            # 再帰的にディレクトリ構造を構築（項目数制限あり）
-            counters = {"items": 0, "limit": max_items_to_display if limit_items else None}
-            try:
-                self._load_directory_recursively(root_item, path, counters)
-            except TooManyItemsException:
-                if progress_window and progress_window.winfo_exists():
-                    progress_label.config(text=f"表示制限に達しました: {max_items_to_display}項目")
-                    progress_window.update()
-            
-            # プログレスウィンドウを閉じる
-            if progress_window and progress_window.winfo_exists():
-                progress_bar.stop()
-                progress_window.destroy()
+            self.model.add(root_item, self.current_dir, True)
             
-            # 表示制限に達した場合は通知
-            if limit_items and counters["items"] >= max_items_to_display:
-                messagebox.showinfo(
-                    "情報", 
-                    f"表示項目数が制限に達しました ({max_items_to_display}項目)。\n"
-                    "全ての項目が表示されているわけではありません。"
-                )
+            # ルート直下の項目を読み込む（残りはアイドル時間に少しずつ挿入される）
+            self._add_placeholder(root_item, self.current_dir)
+            self._expand_directory(root_item)
             
             # デバッグ出力
             print(f"ディレクトリを読み込みました: {self.current_dir}")
-            print(f"項目数: {counters['items']}")
-            print(f"除外アイテム設定: {self.config_manager.get_excluded_items(self.current_dir)}")
+            print(f"除外ルール: {self.user_rules}")
         
         except Exception as e:
             messagebox.showerror("エラー", f"ディレクトリの読み込み中にエラーが発生しました: {str(e)}")
@@ -1764,160 +1116,161 @@ class DirectoryTreeView:
             # 処理中フラグを解除
             self.is_processing = False
     
-    def _load_directory_recursively(self, parent, path, counters):
-        """再帰的にディレクトリ構造を読み込む（項目数制限付き、EXEフォルダスキップ）"""
-        try:
-            # 表示制限に達したかチェック
-            if counters["limit"] is not None and counters["items"] >= counters["limit"]:
-                raise TooManyItemsException("表示制限に達しました")
-            
-            # ディレクトリ内の項目をソート（ディレクトリ→ファイル）
+    def _add_placeholder(self, dir_id, dir_path):
+        """まだ中身を読み込んでいないディレクトリに仮の子アイテムを追加する（開くための矢印を表示するため）"""
+        placeholder_id = self.tree.insert(dir_id, "end", text="読み込み中...", values=(), tags=('placeholder',))
+        self.unloaded_dirs[dir_id] = (dir_path, placeholder_id)
+    
+    def on_tree_open(self, event):
+        """ディレクトリが開かれたときに、まだ読み込んでいなければ中身を読み込む"""
+        item_id = self.tree.focus()
+        if item_id:
+            self._expand_directory(item_id)
+    
+    def _expand_directory(self, item_id):
+        """ディレクトリの中身を読み込み、アイドル時間に少しずつツリーへ挿入する"""
+        if item_id not in self.unloaded_dirs:
+            return
+        
+        dir_path, placeholder_id = self.unloaded_dirs.pop(item_id)
+        if self.tree.exists(placeholder_id):
+            self.tree.delete(placeholder_id)
+        
+        dirs, files = self._scan_directory(dir_path)
+        entries = [(name, True) for name in dirs] + [(name, False) for name in files]
+        if not entries:
+            return
+        
+        self.loading_dirs[item_id] = dir_path
+        self._insert_entries(item_id, dir_path, entries, 0, self.load_generation)
+    
+    def _scan_directory(self, path):
+        """
+        ディレクトリ直下の表示する項目を(ディレクトリ名のリスト, ファイル名のリスト)で返す
+        バックグラウンドの走査が終わっていればその結果を使い、なければその場で読む
+        """
+        snapshot = self.snapshot
+        if snapshot is not None:
+            listing = snapshot.listing(path)
+            if listing is not None:
+                return listing
+        return scan_directory(path, self.skip_folders, self.skip_extensions, self.skip_exe_folders)
+    
+    def _start_scan(self):
+        """ディレクトリ全体をバックグラウンドのスレッドで走査し、終わったらsnapshotに設定する"""
+        generation = self.load_generation
+        root = self.current_dir
+        scanner = DirectoryScanner(self.skip_exe_folders, self.rules, self.scan_workers,
+                                   self.skip_folders, self.skip_extensions)
+        
+        def run():
             try:
-                items = os.listdir(path)
-            except PermissionError:
-                # アクセス権限がない場合は空のvaluesを設定
-                self.tree.item(parent, values=())
-                return
+                snapshot = scanner.scan(root, should_stop=lambda: generation != self.load_generation)
             except Exception as e:
-                # その他のエラー
-                print(f"ディレクトリ読み込みエラー: {str(e)} - スキップします")
-                return
-            
-            dirs = []
-            files = []
-            
-            # EXEファイルを含むかどうかをチェック
-            has_exe = False
-            
-            for item in items:
-                item_path = os.path.join(path, item)
-                try:
-                    # フォルダ名に基づくスキップをチェック
-                    basename = os.path.basename(item_path)
-                    if os.path.isdir(item_path):
-                        if basename in self.skip_folders:
-                            continue
-                        dirs.append(item)
-                    else:
-                        # EXEファイルのチェック
-                        if any(item.lower().endswith(ext) for ext in self.skip_extensions):
-                            has_exe = True
-                        
-                        files.append(item)
-                except Exception as e:
-                    print(f"項目チェックエラー: {str(e)} - スキップします")
-                    continue
-            
-            # EXEファイルが含まれていて、スキップ設定がONの場合
-            if has_exe and self.skip_exe_folders:
-                # このディレクトリ自体は表示するが、中身は空のvaluesを設定
-                self.tree.item(parent, values=())
+                print(f"ディレクトリ走査エラー: {str(e)}")
                 return
-            
-            # 設定から除外状態を取得
-            excluded_items = self.config_manager.get_excluded_items(self.current_dir)
-            
-            # ディレクトリを追加
-            for dir_name in sorted(dirs):
-                # 表示制限に達したかチェック
-                if counters["limit"] is not None and counters["items"] >= counters["limit"]:
-                    raise TooManyItemsException("表示制限に達しました")
-                
-                counters["items"] += 1
-                
-                try:
-                    dir_path = os.path.normpath(os.path.join(path, dir_name))
-                    
-                    # 設定から除外状態を取得 - 正規化されたパスを使用
-                    is_excluded = excluded_items.get(dir_path, False)
-                    
-                    if self.folder_icon:
-                        image = self.locked_folder_icon if is_excluded else self.folder_icon
-                        # valuesにステータステキストを表示しない
-                        dir_id = self.tree.insert(parent, "end", text=f" {dir_name}", 
-                                             values=(), image=image, open=False)
-                    else:
-                        icon = "🔒" if is_excluded else "📁"
-                        # valuesにステータステキストを表示しない
-                        dir_id = self.tree.insert(parent, "end", text=f"{icon} {dir_name}", 
-                                             values=(), open=False)
-                    
-                    if is_excluded:
-                        self.excluded_items.add(dir_id)
-                        self.tree.tag_configure('excluded', foreground='#999999')
-                        self.tree.item(dir_id, tags=('excluded',))
-                    
-                    # 100個ごとにUIを更新
-                    if counters["items"] % 100 == 0:
-                        self.tree.update()
-                    
-                    # サブディレクトリを再帰的に処理
-                    self._load_directory_recursively(dir_id, dir_path, counters)
-                
-                except TooManyItemsException:
-                    # 再帰呼び出しで制限に達した場合は上位に伝播
-                    raise
-                except Exception as e:
-                    print(f"ディレクトリ追加エラー: {str(e)} - スキップします")
-                    continue
-            
-            # ファイルを追加（EXEファイルはスキップ）
-            for file_name in sorted(files):
-                # スキップすべき拡張子なら除外
-                if any(file_name.lower().endswith(ext) for ext in self.skip_extensions):
-                    continue
-                
-                # 表示制限に達したかチェック
-                if counters["limit"] is not None and counters["items"] >= counters["limit"]:
-                    raise TooManyItemsException("表示制限に達しました")
-                
-                counters["items"] += 1
-                
-                try:
-                    file_path = os.path.normpath(os.path.join(path, file_name))
-                    
-                    # 設定から除外状態を取得 - 正規化されたパスを使用
-                    is_excluded = excluded_items.get(file_path, False)
-                    
-                    # ファイルアイコンの選択（拡張子に基づく）
-                    file_ext = os.path.splitext(file_name)[1].lower()
-                    icon_text = "🐍" if file_ext == '.py' else "📄"  # Pythonファイルとそれ以外で分ける
-                    
-                    if self.file_icon:
-                        image = self.locked_file_icon if is_excluded else self.file_icon
-                        # valuesにステータステキストを表示しない
-                        file_id = self.tree.insert(parent, "end", text=f" {file_name}", 
-                                                values=(), image=image)
-                    else:
-                        icon = "🔒" if is_excluded else icon_text
-                        # valuesにステータステキストを表示しない
-                        file_id = self.tree.insert(parent, "end", text=f"{icon} {file_name}", 
-                                                values=())
-                    
-                    if is_excluded:
-                        self.excluded_items.add(file_id)
-                        self.tree.tag_configure('excluded', foreground='#999999')
-                        self.tree.item(file_id, tags=('excluded',))
-                    
-                    # 100個ごとにUIを更新
-                    if counters["items"] % 100 == 0:
-                        self.tree.update()
-                
-                except TooManyItemsException:
-                    # 再帰呼び出しで制限に達した場合は上位に伝播
-                    raise
-                except Exception as e:
-                    print(f"ファイル追加エラー: {str(e)} - スキップします")
-                    continue
+            # 走査中に別のディレクトリが読み込まれた場合は使わない
+            if snapshot is not None and generation == self.load_generation:
+                # 次の起動時に走査結果がまだ正しいか調べられるよう、ディレクトリの更新時刻を記録する
+                signatures = {dir_path: file_signature(dir_path) for dir_path in snapshot.listings}
+                self.snapshot_signatures = signatures
+                self.snapshot = snapshot
+        
+        self._scan_thread = threading.Thread(target=run, daemon=True)
+        self._scan_thread.start()
+    
+    def _scan_settings(self):
+        """走査結果を左右する設定（スキップするフォルダ・拡張子、EXEフォルダ、除外ルール）"""
+        return (self.skip_exe_folders, tuple(self.skip_folders), tuple(self.skip_extensions),
+                tuple(self.project_rules), tuple(self.user_rules))
+
+    def export_scan(self):
+        """走査結果を保存用に取り出す（走査が終わっていなければNone）"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        return {
+            'root': snapshot.root,
+            'settings': self._scan_settings(),
+            'listings': snapshot.listings,
+            'signatures': self.snapshot_signatures
+        }
+
+    def _restore_scan(self, scan):
+        """
+        export_scanの結果を走査結果として使う（使えればTrue）
+        設定が同じで、どのディレクトリも更新時刻とサイズが変わっていない（項目の追加・削除・名前の変更がない）場合だけ使う
+        """
+        if scan['root'] != self.current_dir or scan['settings'] != self._scan_settings():
+            return False
+        for dir_path, signature in scan['signatures'].items():
+            if signature is None or file_signature(dir_path) != signature:
+                return False
+        self.snapshot = DirectorySnapshot(scan['root'], scan['listings'])
+        self.snapshot_signatures = scan['signatures']
+        return True
+
+    def _insert_entries(self, parent, parent_path, entries, start, generation):
+        """entriesのうちstartから1チャンク分をツリーに挿入し、残りはアイドル時間に続ける"""
+        # 別のディレクトリが読み込まれたか、親が削除された場合は中止
+        if generation != self.load_generation or not self.tree.exists(parent):
+            return
         
-        except PermissionError:
-            # アクセス権限がない場合は空のvaluesを設定
-            self.tree.item(parent, values=())
-        except TooManyItemsException:
-            # 項目数制限に達した場合は上位に伝播
-            raise
-        except Exception as e:
-            print(f"ディレクトリ処理エラー: {str(e)} - スキップします")
+        parent_excluded = self.model.is_excluded(parent)
+        parent_rel = self._relative_path(parent_path)
+        end = min(start + self.insert_chunk_size, len(entries))
+        
+        for name, is_dir in entries[start:end]:
+            try:
+                item_path = os.path.join(parent_path, name)
+                # 除外されたフォルダの中身は除外する。それ以外は除外ルールに従う
+                rel_path = f"{parent_rel}/{name}" if parent_rel else name
+                is_excluded = parent_excluded or bool(self.rules.match(rel_path, is_dir))
+                self._insert_item(parent, item_path, name, is_dir, is_excluded)
+            except Exception as e:
+                print(f"項目追加エラー: {str(e)} - スキップします")
+        
+        if end < len(entries):
+            self.tree.after_idle(self._insert_entries, parent, parent_path, entries, end, generation)
+        else:
+            self.loading_dirs.pop(parent, None)
+    
+    def _insert_item(self, parent, item_path, name, is_dir, is_excluded):
+        """ディレクトリまたはファイルを1つツリーに挿入する"""
+        if is_dir:
+            if self.folder_icon:
+                image = self.locked_folder_icon if is_excluded else self.folder_icon
+                # valuesにステータステキストを表示しない
+                item_id = self.tree.insert(parent, "end", text=f" {name}", 
+                                           values=(), image=image, open=False)
+            else:
+                icon = "🔒" if is_excluded else "📁"
+                # valuesにステータステキストを表示しない
+                item_id = self.tree.insert(parent, "end", text=f"{icon} {name}", 
+                                           values=(), open=False)
+            # 中身は開いたときに読み込む
+            self._add_placeholder(item_id, item_path)
+        else:
+            # ファイルアイコンの選択（拡張子に基づく）
+            file_ext = os.path.splitext(name)[1].lower()
+            icon_text = "🐍" if file_ext == '.py' else "📄"  # Pythonファイルとそれ以外で分ける
+            
+            if self.file_icon:
+                image = self.locked_file_icon if is_excluded else self.file_icon
+                # valuesにステータステキストを表示しない
+                item_id = self.tree.insert(parent, "end", text=f" {name}", 
+                                           values=(), image=image)
+            else:
+                icon = "🔒" if is_excluded else icon_text
+                # valuesにステータステキストを表示しない
+                item_id = self.tree.insert(parent, "end", text=f"{icon} {name}", 
+                                           values=())
+        
+        self.model.add(item_id, item_path, is_dir, parent)
+        if is_excluded:
+            self.model.set_excluded(item_id, True)
+            self.tree.item(item_id, tags=('excluded',))
+        return item_id
             
     # オプション設定のためのトグルメソッドを追加
     def toggle_skip_exe_folders(self):
@@ -1926,167 +1279,595 @@ class DirectoryTreeView:
         return self.skip_exe_folders
         
     def get_included_files(self, include_python_only=True):
-        """解析対象のファイルパスリストを取得"""
-        if not self.current_dir or not self.tree or not self.tree.winfo_exists():
+        """解析対象のファイルパスリストを取得（まだ開いていないディレクトリはファイルシステムから集める）"""
+        if not self.current_dir or self.model.root is None:
             return []
         
         included_files = []
         
-        def traverse_tree(node, parent_path):
-            # 現在のノードが除外リストに含まれているかチェック
-            if node in self.excluded_items:
+        # 未読み込みのディレクトリは、バックグラウンドの走査が終わっていればその結果から、
+        # 終わっていなければファイルシステムから集める（UIスレッドで走査の終わりを待たない）
+        def collect_unloaded(dir_path, rel_path):
+            # ツリーに読み込まれていないディレクトリはツリー表示と同じ規則でファイルシステムを辿る
+            # 除外ルールに一致するフォルダの中は辿らない
+            dirs, files = self._scan_directory(dir_path)
+            for dir_name in dirs:
+                child_rel = f"{rel_path}/{dir_name}" if rel_path else dir_name
+                if not self.rules.match(child_rel, True):
+                    collect_unloaded(os.path.join(dir_path, dir_name), child_rel)
+            for file_name in files:
+                child_path = os.path.join(dir_path, file_name)
+                if self.rules.match(f"{rel_path}/{file_name}" if rel_path else file_name, False):
+                    continue
+                if not include_python_only or file_name.endswith('.py'):
+                    included_files.append(child_path)
+        
+        def collect(item_id):
+            # 除外された項目は中身も含めて対象外
+            if self.model.is_excluded(item_id):
                 return
             
-            item_text = self.tree.item(node, "text")
-            # 先頭の絵文字やスペースを削除
-            clean_text = item_text.strip()
-            if clean_text.startswith("📁 ") or clean_text.startswith("🐍 ") or clean_text.startswith("🔒 ") or clean_text.startswith("📄 "):
-                clean_text = clean_text[2:].strip()
-            elif " " in clean_text and clean_text[0] != " ":
-                clean_text = clean_text.split(" ", 1)[1].strip()
-            
-            current_path = os.path.join(parent_path, clean_text)
-            
-            # ファイルかディレクトリかを確認
-            is_dir = len(self.tree.get_children(node)) > 0
-            if not is_dir:
+            path = self.model.path(item_id)
+            if not self.model.is_dir(item_id):
                 # Pythonファイルのみを含める場合の条件
-                if not include_python_only or clean_text.endswith('.py'):
-                    included_files.append(current_path)
-            
-            # 子ノードを処理
-            for child in self.tree.get_children(node):
-                traverse_tree(child, current_path)
-        
-        # ルートディレクトリから全てのノードを処理
-        root_node = self.tree.get_children()[0]
-        # ルートディレクトリのテキストから絵文字とスペースを削除
-        root_text = self.tree.item(root_node, "text").strip()
-        if root_text.startswith("📁 ") or root_text.startswith("🔒 "):
-            root_text = root_text[2:].strip()
-        elif " " in root_text and root_text[0] != " ":
-            root_text = root_text.split(" ", 1)[1].strip()
-        
-        parent_dir = os.path.dirname(self.current_dir)
-        traverse_tree(root_node, parent_dir)
+                if not include_python_only or path.endswith('.py'):
+                    included_files.append(path)
+            elif item_id in self.unloaded_dirs or item_id in self.loading_dirs:
+                # 中身をまだ（すべて）挿入していないディレクトリ
+                collect_unloaded(path, self._relative_path(path))
+            else:
+                for child_id in self.model.get_children(item_id):
+                    collect(child_id)
         
+        collect(self.model.root)
         return included_files
         
-class TooManyItemsException(Exception):
-    """表示する項目数の制限に達したことを示す例外"""
-    pass
+class TextChangeNotifier:
+    """
+    Textウィジェットへの挿入・削除を、変わった行の範囲とともにリスナーに知らせるクラス
+    Tkのバインドではどの行が変わったかがわからないので、ウィジェットのTclコマンドを差し替えて
+    キー入力・貼り付け・元に戻す・プログラムからの変更のすべてを捕まえる
+    """
+    # 変更として扱うウィジェットのコマンド
+    OPERATIONS = ("insert", "delete", "replace")
+
+    @classmethod
+    def attach(cls, text_widget):
+        """ウィジェットに対応するTextChangeNotifierを返す（なければコマンドを差し替えて作る）"""
+        notifier = getattr(text_widget, "_change_notifier", None)
+        if notifier is None:
+            notifier = cls(text_widget)
+            text_widget._change_notifier = notifier
+        return notifier
 
-class SyntaxHighlighter:
+    def __init__(self, text_widget):
+        self.text_widget = text_widget
+        self.listeners = []
+        
+        # 元のコマンドを別名にし、同じ名前のprocで変更の前後の行数と消える文字・挿入する文字を調べてから元のコマンドを呼ぶ
+        # （エラーは元のコマンドと同じように呼び出し元に返る。無効状態のウィジェットは何も変わらないので知らせない）
+        widget_name = str(text_widget)
+        original = widget_name + "_original"
+        callback = text_widget.register(self._notify)
+        text_widget.tk.call("rename", widget_name, original)
+        text_widget.tk.call("proc", widget_name, "operation args", f"""
+            if {{$operation ni {{{" ".join(self.OPERATIONS)}}} || [{original} cget -state] eq "disabled"}} {{
+                return [{original} $operation {{*}}$args]
+            }}
+            set start [{original} index [lindex $args 0]]
+            if {{[{original} compare $start == end]}} {{
+                set start [{original} index end-1c]
+            }}
+            set lines [{original} count -lines 1.0 end]
+            set inserted ""
+            set deleted ""
+            set exact 1
+            if {{$operation eq "insert"}} {{
+                foreach {{chars tags}} [lrange $args 1 end] {{ append inserted $chars }}
+            }} elseif {{$operation eq "delete" && [llength $args] > 2}} {{
+                set exact 0
+            }} else {{
+                if {{[llength $args] > 1}} {{
+                    set last [lindex $args 1]
+                }} else {{
+                    set last "$start+1c"
+                }}
+                if {{[{original} compare $last > end-1c]}} {{
+                    set last end-1c
+                }}
+                if {{[{original} compare $start == 1.0] && [{original} compare $last == end-1c]}} {{
+                    set exact 0
+                }} elseif {{[{original} compare $last > $start]}} {{
+                    set deleted [{original} get $start $last]
+                }}
+                if {{$operation eq "replace"}} {{
+                    foreach {{chars tags}} [lrange $args 2 end] {{ append inserted $chars }}
+                }}
+            }}
+            set result [{original} $operation {{*}}$args]
+            {callback} $operation $start [expr {{[{original} count -lines 1.0 end] - $lines}}] $inserted $deleted $exact
+            return $result
+        """)
+
+    def add_listener(self, listener):
+        """
+        listener(operation, start_line, line_delta, inserted, deleted)を登録する
+        start_lineから変更後にline_delta行増え、insertedの文字が挿入されてdeletedの文字が消えた
+        （すべての文字を消したときと、複数の範囲を消したときはdeletedがNone）
+        """
+        self.listeners.append(listener)
+
+    def _notify(self, operation, start, line_delta, inserted, deleted, exact):
+        start_line = int(start.split(".")[0])
+        if exact == "0":
+            deleted = None
+        for listener in self.listeners:
+            try:
+                listener(operation, start_line, int(line_delta), inserted, deleted)
+            except Exception as e:
+                # Tclのコマンドの中から呼ばれるので、例外を外に出さない
+                print(f"テキストの変更の通知エラー: {str(e)}")
+
+
+class TextCounter:
+    """
+    Textウィジェットの文字数とLLMの推定トークン数を、挿入・削除された文字だけから更新するクラス
+    変更のたびにテキスト全体を取り出して数え直さない（すべて消したときなどだけ数え直す）
+    """
+    # ASCII文字は約4文字で1トークン、それ以外（日本語など）は約1文字で1トークンとして見積もる
+    ASCII_CHARS_PER_TOKEN = 4
+
+    def __init__(self, text_widget, follow_edits=True):
+        """follow_editsがFalseならウィジェットの変更は数えない（set_text・updateで内容を知らせる）"""
+        self.text_widget = text_widget
+        self.chars = 0
+        self.wide_chars = 0
+        self.listeners = []
+        if follow_edits:
+            self.recount()
+            TextChangeNotifier.attach(text_widget).add_listener(self.on_text_changed)
+
+    @staticmethod
+    def _wide_chars(text):
+        """ASCII以外の文字の数"""
+        if text.isascii():
+            return 0
+        return len(text) - len(text.encode("ascii", "ignore"))
+
+    @property
+    def tokens(self):
+        """推定トークン数"""
+        ascii_chars = self.chars - self.wide_chars
+        return self.wide_chars + -(-ascii_chars // self.ASCII_CHARS_PER_TOKEN)
+
+    def format(self):
+        """ステータスバーに表示する文字列"""
+        return f"文字数: {self.chars}（推定トークン数: 約{self.tokens}）"
+
+    def add_listener(self, listener):
+        """文字数が変わったときに呼ぶlistener(counter)を登録する"""
+        self.listeners.append(listener)
+
+    def recount(self):
+        """ウィジェットのテキスト全体を数え直す"""
+        self.set_text(self.text_widget.get("1.0", "end-1c"))
+
+    def set_text(self, text):
+        """内容がtextになった"""
+        self.chars = len(text)
+        self.wide_chars = self._wide_chars(text)
+        self._notify()
+
+    def update(self, inserted, deleted):
+        """insertedの文字が挿入され、deletedの文字が消えた"""
+        self.chars += len(inserted) - len(deleted)
+        self.wide_chars += self._wide_chars(inserted) - self._wide_chars(deleted)
+        self._notify()
+
+    def on_text_changed(self, operation, start_line, line_delta, inserted, deleted):
+        if deleted is None:
+            self.recount()
+        else:
+            self.update(inserted, deleted)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener(self)
+
+
+class PagedTextView:
     """
-    Pythonコードに構文ハイライトを適用するクラス
+    大きな解析結果を表示するためのビュー（ScrolledTextに、メモリ上の全文のうち見えている付近の行だけを入れる）
+    スクロールで窓の端に近づいたら先の行を読み込み、反対側の行を捨てる。スクロールバーは全文に対する位置を示す
+    全文の取り出し・検索はメモリ上のテキストに対して行う（ウィジェットに全文を入れない）
     """
+    # ウィジェットに入れておく最大の行数
+    WINDOW_LINES = 3000
+    # 窓の端からこの行数以内が見えたら、先の行を読み込む
+    MARGIN_LINES = 300
+    # アイドル時に一度にウィジェットへ入れる行数
+    CHUNK_LINES = 300
+    # 検索で一致した文字列に付けるタグ
+    MATCH_TAG = "search_match"
+
     def __init__(self, text_widget):
         self.text_widget = text_widget
+        self.lines = [""]
+        self.first = 0  # ウィジェットの1行目が全文の何行目か（0から）
+        self.end = 1    # ウィジェットの最後の行の次の行
+        self._updating = False
+        self._fill_timer = None
+        self._check_timer = None
+        self.search_text = None
+        self.search_position = (0, 0)
+        
+        # 文字数は全文について数える（ウィジェットの変更は窓の入れ替えを含むので数えない）
+        self.counter = TextCounter(text_widget, follow_edits=False)
+        TextChangeNotifier.attach(text_widget).add_listener(self.on_text_changed)
+        
+        # スクロールバーを全文の位置に対応させる
+        text_widget.vbar.configure(command=self.yview)
+        text_widget.configure(yscrollcommand=self._on_yscroll)
+        
+        # 検索
+        text_widget.tag_configure(self.MATCH_TAG, background="#FFFF00")
+        text_widget.bind("<Control-f>", self.search)
+        text_widget.bind("<F3>", self.find_next)
+    
+    def get_text(self):
+        """全文"""
+        return "\n".join(self.lines)
+    
+    def set_text(self, text, keep_position=False):
+        """全文をtextにする（keep_positionなら、今の一番上の行の位置を保つ）"""
+        top = self._top_line() if keep_position else 0
+        self.lines = text.split("\n")
+        self.counter.set_text(text)
+        self._render(min(top, len(self.lines) - 1))
+    
+    def append(self, text):
+        """全文の最後にtextを加える（窓が最後の行まであれば、入る分だけウィジェットにも加える）"""
+        if not text:
+            return
+        old_count = len(self.lines)
+        parts = text.split("\n")
+        self.lines[-1] += parts[0]
+        self.lines.extend(parts[1:])
+        self.counter.update(text, "")
+        if self.end == old_count:
+            room = max(self.WINDOW_LINES - (self.end - self.first), 0)
+            count = min(len(parts) - 1, room)
+            self._edit(self.text_widget.insert, "end-1c", "\n".join(parts[:count + 1]))
+            self.end += count
+        self._update_scrollbar()
+    
+    def on_text_changed(self, operation, start_line, line_delta, inserted, deleted):
+        """
+        ユーザーが窓の中を編集したら、全文のうち変わった行だけをウィジェットの内容に合わせる
+        （すべて消したときなど、消えた文字がわからないときだけ窓全体を合わせ直す）
+        """
+        if self._updating:
+            return
+        if deleted is None:
+            new_lines = self.text_widget.get("1.0", "end-1c").split("\n")
+            old_lines = self.lines[self.first:self.end]
+            self.counter.update("\n".join(new_lines), "\n".join(old_lines))
+            self.lines[self.first:self.end] = new_lines
+            self.end = self.first + len(new_lines)
+            return
         
-        # 構文ハイライトの色定義
-        self.colors = {
-            'keywords': '#FF7700',  # オレンジ
-            'builtins': '#0086B3',  # 水色
-            'strings': '#008800',   # 緑
-            'comments': '#888888',  # グレー
-            'functions': '#0000FF', # 青
-            'classes': '#990000',   # 赤
-            'docstrings': '#067D17', # 深緑
-        }
-        
-        # キーワードと組み込み関数の定義
-        self.keywords = ['and', 'as', 'assert', 'break', 'class', 'continue', 'def', 
-                   'del', 'elif', 'else', 'except', 'False', 'finally', 'for', 
-                   'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'None', 
-                   'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'True', 
-                   'try', 'while', 'with', 'yield']
-        
-        self.builtins = ['abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray', 
-                   'bytes', 'callable', 'chr', 'classmethod', 'compile', 'complex', 
-                   'delattr', 'dict', 'dir', 'divmod', 'enumerate', 'eval', 'exec', 
-                   'filter', 'float', 'format', 'frozenset', 'getattr', 'globals', 
-                   'hasattr', 'hash', 'help', 'hex', 'id', 'input', 'int', 'isinstance', 
-                   'issubclass', 'iter', 'len', 'list', 'locals', 'map', 'max', 'memoryview', 
-                   'min', 'next', 'object', 'oct', 'open', 'ord', 'pow', 'print', 'property', 
-                   'range', 'repr', 'reversed', 'round', 'set', 'setattr', 'slice', 'sorted', 
-                   'staticmethod', 'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip']
+        # start_line行目から、消えた文字の行が挿入された文字の行に置き換わった
+        last_line = start_line + inserted.count("\n")
+        new_lines = self.text_widget.get(f"{start_line}.0", f"{last_line}.end").split("\n")
+        start = self.first + start_line - 1
+        self.lines[start:start + deleted.count("\n") + 1] = new_lines
+        self.end += line_delta
+        self.counter.update(inserted, deleted)
+    
+    def _edit(self, method, *args):
+        """窓の入れ替えのためにウィジェットを変更する（ユーザーの編集として扱わない）"""
+        self._updating = True
+        try:
+            method(*args)
+        finally:
+            self._updating = False
+    
+    def _top_line(self):
+        """見えている一番上の行が全文の何行目か"""
+        return self.first + int(self.text_widget.index("@0,0").split(".")[0]) - 1
+    
+    def _render(self, top):
+        """top行目が一番上に見えるように窓を作り直す（見える分だけすぐに入れ、残りはアイドル時に入れる）"""
+        if self._fill_timer is not None:
+            self.text_widget.after_cancel(self._fill_timer)
+            self._fill_timer = None
+        self.first = max(0, top - self.MARGIN_LINES)
+        self.end = min(len(self.lines), top + self.CHUNK_LINES)
+        self._edit(self.text_widget.delete, "1.0", "end")
+        self._edit(self.text_widget.insert, "1.0", "\n".join(self.lines[self.first:self.end]))
+        self.text_widget.yview(f"{top - self.first + 1}.0")
+        self._schedule_fill()
+    
+    def _schedule_fill(self):
+        if self.end - self.first < self.WINDOW_LINES and self.end < len(self.lines):
+            self._fill_timer = self.text_widget.after_idle(self._fill)
+        else:
+            self._fill_timer = None
+    
+    def _fill(self):
+        """アイドル時に窓の残りの行を少しずつ入れる"""
+        self._fill_timer = None
+        self._extend_bottom(min(self.CHUNK_LINES, self.WINDOW_LINES - (self.end - self.first)))
+        self._schedule_fill()
+    
+    def _extend_bottom(self, count):
+        new_end = min(len(self.lines), self.end + count)
+        if new_end > self.end:
+            self._edit(self.text_widget.insert, "end-1c", "\n" + "\n".join(self.lines[self.end:new_end]))
+            self.end = new_end
+    
+    def _shift(self):
+        """見えている行が窓の端に近づいたら、先の行を読み込んで反対側の行を捨てる"""
+        self._check_timer = None
+        widget = self.text_widget
+        try:
+            top = int(widget.index("@0,0").split(".")[0])
+            bottom = int(widget.index(f"@0,{widget.winfo_height()}").split(".")[0])
+        except tk.TclError:
+            return  # ウィジェットが破棄された
+        count = self.end - self.first
+        step = self.WINDOW_LINES // 2
+        if bottom > count - self.MARGIN_LINES and self.end < len(self.lines):
+            self._extend_bottom(step)
+            excess = (self.end - self.first) - self.WINDOW_LINES
+            if excess > 0:
+                excess = min(excess, top - 1)
+                self._edit(widget.delete, "1.0", f"{excess + 1}.0")
+                self.first += excess
+                widget.yview(f"{top - excess}.0")
+        elif top <= self.MARGIN_LINES and self.first > 0:
+            new_first = max(0, self.first - step)
+            added = self.first - new_first
+            self._edit(widget.insert, "1.0", "\n".join(self.lines[new_first:self.first]) + "\n")
+            self.first = new_first
+            if self.end - self.first > self.WINDOW_LINES:
+                keep = max(self.WINDOW_LINES, bottom + added)
+                self._edit(widget.delete, f"{keep}.end", "end-1c")
+                self.end = self.first + keep
+            widget.yview(f"{top + added}.0")
+    
+    def _on_yscroll(self, first, last):
+        """ウィジェットの中での位置を全文での位置に直してスクロールバーに伝え、窓の端に近ければ読み込む"""
+        self._update_scrollbar(float(first), float(last))
+        if self._check_timer is None:
+            self._check_timer = self.text_widget.after_idle(self._shift)
+    
+    def _update_scrollbar(self, first=None, last=None):
+        if first is None:
+            first, last = self.text_widget.yview()
+        count = self.end - self.first
+        total = len(self.lines)
+        self.text_widget.vbar.set((self.first + first * count) / total, (self.first + last * count) / total)
+    
+    def yview(self, *args):
+        """スクロールバーからの操作（つまみの移動は全文の位置として扱う）"""
+        if args and args[0] == "moveto":
+            target = min(int(float(args[1]) * len(self.lines)), len(self.lines) - 1)
+            if self.first <= target < self.end:
+                self.text_widget.yview(f"{target - self.first + 1}.0")
+            else:
+                self._render(max(target, 0))
+        else:
+            self.text_widget.yview(*args)
+    
+    def search(self, event=None):
+        """検索する文字列を尋ねて、今の位置から次に一致する所を表示する"""
+        text = simpledialog.askstring("検索", "検索する文字列:", initialvalue=self.search_text or "",
+                                      parent=self.text_widget)
+        if text:
+            self.search_text = text
+            self.search_position = (self._top_line(), 0)
+            self.find_next()
+        return "break"
+    
+    def find_next(self, event=None):
+        """前回の検索文字列が次に一致する所を表示する（大文字と小文字は区別しない。最後まで行ったら先頭から）"""
+        if not self.search_text:
+            return self.search(event)
+        found = self.find(self.search_text, *self.search_position)
+        if found is None:
+            messagebox.showinfo("検索", f"「{self.search_text}」は見つかりませんでした。")
+            return "break"
+        line, col = found
+        self.search_position = (line, col + len(self.search_text))
+        self.show_match(line, col, len(self.search_text))
+        return "break"
+    
+    def find(self, text, start_line=0, start_col=0):
+        """全文でtextが(start_line, start_col)以降に最初に一致する (行, 列)（なければNone）"""
+        needle = text.lower()
+        total = len(self.lines)
+        for i in range(total + 1):
+            line = (start_line + i) % total
+            col = self.lines[line].lower().find(needle, start_col if i == 0 else 0)
+            if col != -1 and not (i == total and col >= start_col):
+                return line, col
+        return None
+    
+    def show_match(self, line, col, length):
+        """一致した文字列に印を付けて見えるようにする（窓の外なら窓を作り直す）"""
+        if not self.first <= line < self.end:
+            self._render(max(line - 5, 0))
+        widget = self.text_widget
+        start = f"{line - self.first + 1}.{col}"
+        widget.tag_remove(self.MATCH_TAG, "1.0", "end")
+        widget.tag_add(self.MATCH_TAG, start, f"{start}+{length}c")
+        widget.mark_set("insert", start)
+        widget.see(start)
+
+
+class SyntaxHighlighter:
+    """
+    lexer（syntax_lexer）のトークンをテキストウィジェットのタグとして付けるクラス
+    見えている範囲と前後の余白の行だけをハイライトし、スクロールや編集のたびに
+    まだハイライトしていない行・変更された行だけを、少し待ってからまとめてハイライトする
+    """
+    # 見えている範囲の前後にハイライトしておく行数
+    MARGIN_LINES = 100
+    # スクロール・編集からハイライトするまでの待ち時間（ミリ秒、続けて起きたものを1回にまとめる）
+    DELAY_MS = 50
+    # ハイライト済みの行（改行まで）に付けるタグ
+    DONE_TAG = "highlight_done"
+
+    # タグの色
+    COLORS = {
+        'keywords': '#FF7700',  # オレンジ
+        'builtins': '#0086B3',  # 水色
+        'strings': '#008800',   # 緑
+        'comments': '#888888',  # グレー
+        'functions': '#0000FF', # 青
+        'classes': '#990000',   # 赤
+        'docstrings': '#067D17', # 深緑
+        'keys': '#0000FF',      # 青（JSONのキー）
+        'numbers': '#0086B3',   # 水色
+        'constants': '#FF7700', # オレンジ（true/false/null）
+    }
+
+    def __init__(self, text_widget, lexer=None):
+        self.text_widget = text_widget
+        self.lexer = lexer or PythonLexer()
+        self.colors = {tag: self.COLORS[tag] for tag in self.lexer.TAGS}
+        # 行末がトークンの途中であることを示すタグ（状態ごと。改行に付け、次の行をその続きとしてハイライトする）
+        self.state_tags = {state: f"highlight_state_{i}" for i, state in enumerate(self.lexer.STATES)}
         
         # テキストウィジェットのタグを設定
         for tag, color in self.colors.items():
             self.text_widget.tag_configure(tag, foreground=color)
+        
+        # 編集された行はハイライトし直す
+        self._timer = None
+        TextChangeNotifier.attach(text_widget).add_listener(self.on_text_changed)
+        
+        # スクロールしたら新しく見えた行をハイライトする（スクロールバーへの通知はそのまま渡す）
+        self._yscrollcommand = text_widget.tk.splitlist(text_widget.cget("yscrollcommand"))
+        text_widget.configure(yscrollcommand=self._on_yscroll)
     
     def highlight(self, event=None):
-        """テキストにシンタックスハイライトを適用"""
-        # 現在のテキストをすべて取得
-        content = self.text_widget.get("1.0", "end-1c")
-        
-        # すべてのタグをクリア
-        for tag in self.colors.keys():
+        """テキストを入れ替えたあとに呼ぶ（前のハイライトを消し、見えている範囲をハイライトする）"""
+        for tag in list(self.colors) + [self.DONE_TAG] + list(self.state_tags.values()):
             self.text_widget.tag_remove(tag, "1.0", "end")
-        
-        # 構文ハイライトを適用
-        self._apply_highlights(content)
+        self._highlight_visible()
     
-    def _apply_highlights(self, content):
-        """ハイライトを適用する内部メソッド"""
-        # コメント（#から行末まで）
-        for match in re.finditer(r'#.*$', content, re.MULTILINE):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text_widget.tag_add('comments', start, end)
-        
-        # 文字列（三重引用符）
-        for match in re.finditer(r'""".*?"""|\'\'\'.*?\'\'\'', content, re.DOTALL):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text_widget.tag_add('docstrings', start, end)
-        
-        # 文字列（単一または二重引用符）
-        for match in re.finditer(r'"[^"\\]*(?:\\.[^"\\]*)*"|\'[^\'\\]*(?:\\.[^\'\\]*)*\'', content):
-            start = f"1.0+{match.start()}c"
-            end = f"1.0+{match.end()}c"
-            self.text_widget.tag_add('strings', start, end)
-        
-        # クラス定義とdef
-        for match in re.finditer(r'\b(class|def)\s+(\w+)', content):
-            keyword_start = f"1.0+{match.start(1)}c"
-            keyword_end = f"1.0+{match.end(1)}c"
-            self.text_widget.tag_add('keywords', keyword_start, keyword_end)
-            
-            if match.group(1) == 'class':
-                name_start = f"1.0+{match.start(2)}c"
-                name_end = f"1.0+{match.end(2)}c"
-                self.text_widget.tag_add('classes', name_start, name_end)
-            else:
-                name_start = f"1.0+{match.start(2)}c"
-                name_end = f"1.0+{match.end(2)}c"
-                self.text_widget.tag_add('functions', name_start, name_end)
-        
-        # キーワード
-        for keyword in self.keywords:
-            for match in re.finditer(r'\b' + keyword + r'\b', content):
-                start = f"1.0+{match.start()}c"
-                end = f"1.0+{match.end()}c"
-                self.text_widget.tag_add('keywords', start, end)
-        
-        # 組み込み関数
-        for builtin in self.builtins:
-            for match in re.finditer(r'\b' + builtin + r'\b', content):
-                start = f"1.0+{match.start()}c"
-                end = f"1.0+{match.end()}c"
-                self.text_widget.tag_add('builtins', start, end)
+    def on_text_changed(self, operation, start_line, line_delta, inserted, deleted):
+        """変更された行をハイライト済みでなくし、少し待ってからハイライトし直す"""
+        end_line = start_line + max(line_delta, 0)
+        self.text_widget.tag_remove(self.DONE_TAG, f"{start_line}.0", f"{end_line}.end+1c")
+        self.schedule()
+    
+    def _on_yscroll(self, first, last):
+        if self._yscrollcommand:
+            self.text_widget.tk.call(*self._yscrollcommand, first, last)
+        self.schedule()
+    
+    def schedule(self):
+        """少し待ってから見えている範囲をハイライトする（待っている間に呼ばれたら待ち直す）"""
+        if self._timer is not None:
+            self.text_widget.after_cancel(self._timer)
+        self._timer = self.text_widget.after(self.DELAY_MS, self._highlight_visible)
+    
+    def _highlight_visible(self):
+        """見えている範囲と前後の余白のうち、まだハイライトしていない行をハイライトする"""
+        self._timer = None
+        widget = self.text_widget
+        try:
+            first = int(widget.index("@0,0").split(".")[0])
+            last = int(widget.index(f"@0,{widget.winfo_height()}").split(".")[0])
+            line_count = int(widget.index("end-1c").split(".")[0])
+        except tk.TclError:
+            return  # ウィジェットが破棄された
+        
+        # ハイライト済みでない行を、続いている範囲ごとにまとめてハイライトする
+        # （範囲の後の行がハイライトし直しになることがあるので、毎回ハイライト済みか確かめる）
+        line = max(1, first - self.MARGIN_LINES)
+        end = min(line_count, last + self.MARGIN_LINES)
+        while line <= end:
+            if self.DONE_TAG in widget.tag_names(f"{line}.0"):
+                line += 1
+                continue
+            range_end = line
+            while range_end < end and self.DONE_TAG not in widget.tag_names(f"{range_end + 1}.0"):
+                range_end += 1
+            self._highlight_lines(line, range_end, line_count)
+            line = range_end + 1
+    
+    def _line_state(self, line):
+        """lineの行末の状態（トークンの途中でなければNone）"""
+        if line < 1 or not self.state_tags:
+            return None
+        names = self.text_widget.tag_names(f"{line}.end")
+        for state, tag in self.state_tags.items():
+            if tag in names:
+                return state
+        return None
+    
+    def _highlight_lines(self, first, last, line_count):
+        """first〜lastの行をハイライトする（前の行の行末の状態から始める）"""
+        widget = self.text_widget
+        start_index, end_index = f"{first}.0", f"{last}.end+1c"
+        old_end_state = self._line_state(last)
+        result = self.lexer.lex(widget.get(start_index, f"{last}.end"), first, self._line_state(first - 1))
+        
+        # タグごとに「行.列」の位置を集める
+        ranges = {tag: [] for tag in self.colors}
+        for tag, line, col, end_line, end_col in result.tokens:
+            ranges[tag] += [f"{line}.{col}", f"{end_line}.{end_col}"]
+        state_ranges = {state: [] for state in self.state_tags}
+        for line, state in result.open_lines:
+            state_ranges[state] += [f"{line}.end", f"{line}.end+1c"]
+        
+        # 前のハイライトを消して、まとめてタグを付ける（タグごとに1回のTkの呼び出し）
+        for tag in list(self.colors) + list(self.state_tags.values()):
+            widget.tag_remove(tag, start_index, end_index)
+        for tag, indices in ranges.items():
+            if indices:
+                widget.tag_add(tag, *indices)
+        for state, indices in state_ranges.items():
+            if indices:
+                widget.tag_add(self.state_tags[state], *indices)
+        widget.tag_add(self.DONE_TAG, start_index, end_index)
+        
+        # 最後の行の行末の状態が変わったら、後の行はハイライトし直す
+        if result.end_state != old_end_state and last < line_count:
+            widget.tag_remove(self.DONE_TAG, f"{last + 1}.0", "end")
 
 class CodeAnalyzerApp:
     """
     コード解析ツールのGUIアプリケーション
     """
-    def __init__(self, root):
+    # ワーカースレッドからのイベントを確認する間隔（ミリ秒）
+    ANALYSIS_POLL_INTERVAL_MS = 50
+    # 監視モードでファイルの変更を確認する間隔（ミリ秒）
+    WATCH_POLL_INTERVAL_MS = 100
+    # 表示・コピーするときに初めて内容を作るタブ（タブ名: 内部の名前）
+    LAZY_TABS = {"拡張解析": 'extended', "JSON出力": 'json'}
+    # まだ作っていないタブに表示する文
+    LAZY_TAB_PLACEHOLDERS = {
+        'extended': "astroidによる拡張解析は、このタブを開いたとき（またはコピーするとき）に実行します。",
+        'json': "JSON出力は、このタブを開いたとき（またはコピーするとき）に作成します。"
+    }
+
+    def __init__(self, root, startup_timer=None):
         """アプリケーションの初期化"""
         self.root = root
         self.root.title("Pythonコード解析ツール")
         
+        # 起動時間の計測（指定がなければ計測だけ行い、表示時に出力する）
+        self.startup_timer = startup_timer or StartupTimer()
+        
         # 設定マネージャーを初期化
         self.config_manager = ConfigManager()
+        self.config_manager.set_scheduler(self.root)
+        self.startup_timer.mark("設定の読み込み")
 
         # current_prompt_id変数を先に初期化する
         self.current_prompt_id = None
@@ -2097,10 +1878,44 @@ class CodeAnalyzerApp:
         window_height = window_size["height"]
         self.root.geometry(f"{window_width}x{window_height}")
         
-        self.analyzer = CodeAnalyzer()
+        # ファイル単位の解析結果をディスクに保存するキャッシュ
+        cache_settings = self.config_manager.get_cache_settings()
+        self.analysis_cache = AnalysisCache(
+            max_size=cache_settings["max_size_mb"] * 1024 * 1024,
+            enabled=cache_settings["enabled"]
+        )
+        
+        # GUIに依存しない解析処理（基本解析・拡張解析・コールグラフ・JSON出力）
+        analysis_limits = self.config_manager.get_analysis_limits()
+        self.project = ProjectAnalyzer(
+            self.analysis_cache,
+            self.config_manager.get_analysis_jobs(),
+            InferenceBudget(**self.config_manager.get_inference_settings()),
+            analysis_limits["file_timeout"],
+            analysis_limits["memory_limit_mb"]
+        )
+        self.analyzer = self.project.analyzer
+        
+        # ワーカースレッドで実行中の解析ジョブ
+        self.analysis_job = None
+        self.analysis_request = None   # (python_files, single_file, on_complete)
+        self.pending_analysis = None   # 実行中のジョブの終了後に開始する解析要求
+        self.analysis_incremental = False  # 実行中のジョブが監視モードでの変更分の解析か
+        self.analysis_whole_directory = False  # 最後に要求したディレクトリの解析が、除外されていないファイルすべてを対象にするか（gitの変更分ならFalse）
+        self.progress_window = None
+        
+        # 拡張解析・JSON出力のタブは、表示・コピーするときに初めて作る（次の解析までは作ったものを使い回す）
+        self.stale_tabs = set()       # まだ作っていないタブ（'extended'・'json'）
+        self.tab_job_request = None   # 実行中のジョブがタブを作るジョブなら (タブ, 作り終えたときに呼ぶ関数)
+        self.deferred_tab_requests = []  # 解析の実行中に要求された (タブ, 作り終えたときに呼ぶ関数)（解析が終わってから処理する）
         
-        # AstroidAnalyzerの初期化
-        self.astroid_analyzer = AstroidAnalyzer()
+        # 解析したファイルの変更の監視（監視モードがONのとき、解析が終わるたびに作り直す）
+        self.file_watcher = None
+        
+        # 終了時に解析の状態を保存し、次の起動時に解析し直さずに表示するスナップショット
+        config_dir = os.path.dirname(os.path.abspath(self.config_manager.config_file))
+        self.session_file = os.path.join(config_dir, SESSION_FILE_NAME)
+        self.session_restorable = False  # 表示中の結果が最後まで終わった解析のものか
         
         # メインスタイルの設定
         style = ttk.Style()
@@ -2159,6 +1974,11 @@ class CodeAnalyzerApp:
         self.copy_button = ttk.Button(self.toolbar_frame, text="📝 Copy", 
                                      command=self.copy_to_clipboard)
         self.copy_button.pack(side="left", padx=5)
+
+        # gitの変更分の解析ボタン
+        self.git_changes_button = ttk.Button(self.toolbar_frame, text="🔀 changes", 
+                                            command=self.analyze_git_changes)
+        self.git_changes_button.pack(side="left", padx=5)
         
         # JSONエクスポートボタン
         # self.export_json_button = ttk.Button(self.toolbar_frame, text="📊 JSON出力", 
@@ -2209,9 +2029,10 @@ class CodeAnalyzerApp:
         # JSONテキストエリア
         self.json_text = scrolledtext.ScrolledText(self.json_tab, font=('Consolas', 10))
         self.json_text.pack(expand=True, fill="both")
+        self.json_view = PagedTextView(self.json_text)
 
         # JSONテキストにもシンタックスハイライターを適用
-        self.json_highlighter = SyntaxHighlighter(self.json_text)
+        self.json_highlighter = SyntaxHighlighter(self.json_text, JsonLexer())
         
         # プロンプト入力タブの作成
         self.prompt_tab = ttk.Frame(self.tab_control)
@@ -2230,6 +2051,7 @@ class CodeAnalyzerApp:
         # 結果テキストエリア - result_tabに配置
         self.result_text = scrolledtext.ScrolledText(self.result_tab, font=('Consolas', 10))
         self.result_text.pack(expand=True, fill="both")
+        self.result_view = PagedTextView(self.result_text)
         
         # 拡張解析テキストエリアのラベル
         self.extended_label = ttk.Label(self.extended_tab, text="astroidによる拡張解析結果:")
@@ -2238,6 +2060,7 @@ class CodeAnalyzerApp:
         # 拡張解析テキストエリア
         self.extended_text = scrolledtext.ScrolledText(self.extended_tab, font=('Consolas', 10))
         self.extended_text.pack(expand=True, fill="both")
+        self.extended_view = PagedTextView(self.extended_text)
 
         # プロンプトマネージャーの初期化
         self.prompt_manager = PromptManager(self.config_manager)
@@ -2276,6 +2099,8 @@ class CodeAnalyzerApp:
         self.show_docstrings = tk.BooleanVar(value=True)
         # EXEを含むフォルダをスキップするかどうかのチェックボックス変数
         self.skip_exe_folders = tk.BooleanVar(value=True)
+        self.use_gitignore = tk.BooleanVar(value=self.config_manager.get_use_gitignore())
+        self.watch_files = tk.BooleanVar(value=self.config_manager.get_watch_files())
 
         # オプションラベル
         option_label = ttk.Label(self.option_frame, text="表示オプション:", style="Stats.TLabel")
@@ -2308,6 +2133,24 @@ class CodeAnalyzerApp:
         )
         self.exe_skip_check.pack(side="left", padx=5)
 
+        # .gitignoreのパターンを除外に使うチェックボックス
+        self.gitignore_check = ttk.Checkbutton(
+            self.option_frame, 
+            text=".gitignore除外", 
+            variable=self.use_gitignore,
+            command=self.toggle_use_gitignore
+        )
+        self.gitignore_check.pack(side="left", padx=5)
+
+        # 解析後もファイルの変更を監視するチェックボックス
+        self.watch_check = ttk.Checkbutton(
+            self.option_frame, 
+            text="変更を監視", 
+            variable=self.watch_files,
+            command=self.toggle_watch_files
+        )
+        self.watch_check.pack(side="left", padx=5)
+
         # 現在のディレクトリパス
         self.current_dir = None
         
@@ -2328,9 +2171,18 @@ class CodeAnalyzerApp:
 
         # 拡張解析テキストエリアにもショートカットを設定
         self.setup_editor_shortcuts(self.extended_text)
+        self.startup_timer.mark("ウィンドウの構築")
 
-        # 前回のディレクトリまたはファイルを読み込む
-        self.load_last_session()
+        # ウィンドウが表示されてから前回のディレクトリまたはファイルを読み込む
+        self.root.after_idle(self.on_startup_idle)
+
+    def on_startup_idle(self):
+        """起動後、最初にイベントループが空いたときの処理（ウィンドウの表示後）"""
+        self.startup_timer.mark("初回表示")
+        self.startup_timer.report()
+        
+        # 前回のセッションの復元はウィンドウを操作可能にしてから行う
+        self.root.after(1, self.load_last_session)
 
 
     def setup_prompt_tab(self):
@@ -2652,28 +2504,12 @@ class CodeAnalyzerApp:
         # テキスト変更イベントを再バインド
         self.prompt_text.bind("<<Modified>>", self.on_prompt_text_modified)
         self.prompt_text.edit_modified(False)  # 変更フラグをリセット
-        
-        # 文字数を更新
-        char_count = len(prompt_content)
-        self.prompt_char_count_var.set(f"文字数: {char_count}")
-        
-        # 現在表示されているタブがプロンプト入力タブであれば文字数ラベルも更新
-        current_tab_index = self.tab_control.index(self.tab_control.select())
-        if current_tab_index == 3:  # プロンプト入力タブ（インデックスが3）
-            self.char_count_label.config(text=f"文字数: {char_count}")
 
     def on_prompt_text_modified(self, event):
         """プロンプトテキストが変更されたときの処理"""
         # Modifiedフラグがセットされている場合のみ処理
         if self.prompt_text.edit_modified():
-            # テキスト内容を取得して文字数をカウント
-            text_content = self.prompt_text.get(1.0, tk.END)
-            char_count = len(text_content) - 1  # 最後の改行文字を除く
-            
-            # 文字数表示を更新
-            self.prompt_char_count_var.set(f"文字数: {char_count}")
-            
-            # 変更フラグを設定
+            # 変更フラグを設定（文字数はTextCounterが更新する）
             self.prompt_modified = True
             self.edit_status_var.set("変更あり*")
             
@@ -2820,344 +2656,40 @@ class CodeAnalyzerApp:
                     self.prompt_manager.create_default_prompt()
                     self.current_prompt_id = next(iter(self.prompt_manager.get_all_prompts()))
                 
-                self.update_prompt_list()
-                self.prompt_tree.selection_set(self.current_prompt_id)
-                self.prompt_tree.focus(self.current_prompt_id)
-                self.on_prompt_selected(None)
-            else:
-                messagebox.showinfo("情報", "最後のプロンプトは削除できません。")
-
-    def update_prompt_list(self):
-        """プロンプト一覧を更新"""
-        # ツリービューをクリア
-        for item in self.prompt_tree.get_children():
-            self.prompt_tree.delete(item)
-        
-        # プロンプト一覧を追加
-        for prompt_id, prompt in self.prompt_manager.get_all_prompts().items():
-            self.prompt_tree.insert("", "end", iid=prompt_id, text="", values=(prompt["name"],))
-        
-        # 現在のプロンプトIDが設定されていて、そのプロンプトが存在する場合に選択
-        if hasattr(self, 'current_prompt_id') and self.current_prompt_id:
-            if self.current_prompt_id in self.prompt_manager.get_all_prompts():
-                self.prompt_tree.selection_set(self.current_prompt_id)
-                self.prompt_tree.focus(self.current_prompt_id)
-                self.prompt_tree.see(self.current_prompt_id)  # 選択項目が見えるようにスクロール
-
-    def save_current_prompt_without_confirm(self):
-        """現在のプロンプトを確認なしで保存（終了時などに使用）"""
-        if hasattr(self, 'prompt_modified') and self.prompt_modified and self.current_prompt_id:
-            prompt_name = self.prompt_name_var.get().strip()
-            prompt_content = self.prompt_text.get(1.0, tk.END).strip()
-            
-            if not prompt_name:
-                prompt_name = "無題のプロンプト"
-            
-            self.prompt_manager.update_prompt(self.current_prompt_id, name=prompt_name, content=prompt_content)
-
-    def text_to_json_structure(self, text_content):
-        """テキスト形式の解析結果をJSON構造に変換する"""
-       
-        result = {
-            "directory_structure": [],
-            "classes": [],
-            "functions": [],
-            "imports": []
-        }
-        
-        current_section = None
-        current_class = None
-        current_function = None
-        
-        # 行ごとに解析
-        for line in text_content.split('\n'):
-            line = line.rstrip()
-            
-            # 空行はスキップ
-            if not line:
-                continue
-                
-            # セクションヘッダーの検出
-            if line.startswith('# '):
-                section_name = line[2:].lower()
-                if 'ディレクトリ' in section_name:
-                    current_section = 'directory'
-                elif 'クラス' in section_name:
-                    current_section = 'classes'
-                elif '関数' in section_name:
-                    current_section = 'functions'
-                elif 'インポート' in section_name:
-                    current_section = 'imports'
-                else:
-                    current_section = None
-                continue
-                
-            # 現在のセクションに応じて処理
-            if current_section == 'directory':
-                if not line.startswith('#'):  # ヘッダー以外の行を追加
-                    result["directory_structure"].append(line)
-                    
-            elif current_section == 'imports':
-                result["imports"].append(line)
-                
-            elif current_section == 'classes':
-                if line.startswith('class '):
-                    # 新しいクラス定義
-                    class_info = {"name": "", "file": "", "extends": "", "methods": []}
-                    
-                    # クラス名とファイル名を抽出（例: RecognizedText (voice2025.py)）
-                    class_match = re.match(r'class\s+(\w+)(?:\s+<-\s+(\w+))?\s*(?:\((.*?)\))?', line)
-                    if class_match:
-                        class_info["name"] = class_match.group(1)
-                        if class_match.group(2):  # 継承元がある場合
-                            class_info["extends"] = class_match.group(2)
-                        if class_match.group(3):  # ファイル名がある場合
-                            class_info["file"] = class_match.group(3)
-                    
-                    current_class = class_info
-                    result["classes"].append(current_class)
-                    
-                elif line.strip().startswith('メソッド:'):
-                    # メソッドリストの開始
-                    continue
-                    
-                elif line.strip().startswith('def ') and current_class:
-                    # メソッド定義（クラス内のメソッド）
-                    method_match = re.match(r'\s*def\s+([^(]+)', line)
-                    if method_match:
-                        method_name = method_match.group(1).strip()
-                        current_class["methods"].append(method_name)
-                        
-                elif line.strip() and current_class and line.strip()[0].isspace():
-                    # クラス配下のインデントされた行（メソッド定義の可能性）
-                    method_match = re.match(r'\s+([^(]+)\(.*\)', line)
-                    if method_match:
-                        method_name = method_match.group(1).strip()
-                        if method_name not in current_class["methods"]:
-                            current_class["methods"].append(method_name)
-                    
-            elif current_section == 'functions':
-                function_match = re.match(r'(?:def\s+)?([^(]+)(?:\(.*\))?(?:\s+->\s+.*)?', line)
-                if function_match:
-                    func_name = function_match.group(1).strip()
-                    if func_name and not func_name.startswith('#'):
-                        if func_name not in result["functions"]:
-                            result["functions"].append(func_name)
-        
-        return result
-
-    def extract_llm_structured_data(self, text):
-        """拡張解析テキストからLLM向け構造化データを抽出する"""
-        result = {
-            "call_graph": {"data": []},
-            "dependencies": {}
-        }
-        
-        # LLM向け構造化データセクションを探す
-        start_marker = "## LLM向け構造化データ"
-        code_start = "```"
-        code_end = "```"
-        
-        if start_marker in text:
-            # セクション開始位置を見つける
-            start_pos = text.find(start_marker)
-            # コードブロック開始位置を見つける
-            code_start_pos = text.find(code_start, start_pos)
-            if code_start_pos != -1:
-                # コードブロック終了位置を見つける
-                code_end_pos = text.find(code_end, code_start_pos + len(code_start))
-                if code_end_pos != -1:
-                    # コードブロック内のテキストを抽出
-                    code_content = text[code_start_pos + len(code_start):code_end_pos].strip()
-                    
-                    # コード内容を解析して構造化
-                    current_section = None
-                    current_subsection = None
-                    
-                    # コールグラフとデータセクションを格納する変数
-                    call_graph_data = []
-                    dependency_data = {}
-                    current_dependency = None
-                    
-                    for line in code_content.split("\n"):
-                        if line.startswith("# "):
-                            # 新しいメインセクションの開始
-                            current_section = line[2:].strip()
-                            current_subsection = None
-                            current_dependency = None
-                            
-                        elif current_section == "コールグラフ":
-                            # コールグラフの行を追加
-                            if line.strip() and " -> " in line:
-                                call_graph_data.append(line.strip())
-                                
-                        elif current_section == "主要な関数依存関係":
-                            # 関数依存関係の処理
-                            if " -> " in line:
-                                # 新しい依存関係の開始
-                                parts = line.split(" -> ")
-                                if len(parts) == 2:
-                                    current_dependency = parts[0].strip()
-                                    deps = [dep.strip() for dep in parts[1].split(",")]
-                                    dependency_data[current_dependency] = deps
-                            elif current_dependency and line.strip():
-                                # 既存の依存関係の継続
-                                deps = [dep.strip() for dep in line.split(",")]
-                                if current_dependency in dependency_data:
-                                    dependency_data[current_dependency].extend(deps)
-                                else:
-                                    dependency_data[current_dependency] = deps
-                    
-                    # 結果をまとめる
-                    if call_graph_data:
-                        result["call_graph"]["data"] = call_graph_data
-                    if dependency_data:
-                        result["dependencies"] = dependency_data
-        
-        return result
-
-
-    def generate_call_graph(self, python_files):
-        """指定されたPythonファイルからコールグラフを生成する"""
-        try:
-            if not python_files:
-                return "コールグラフ生成対象のPythonファイルがありません。"
-            
-            # 関数/メソッドの呼び出し関係を保存する辞書
-            call_graph = {}
-            
-            # 全てのモジュールをパースして保存
-            modules = {}
-            module_functions = {}  # モジュール内の関数とメソッドを記録
-            
-            # Step 1: すべてのモジュールをパースし、関数とメソッドを登録
-            for file_path in python_files:
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        code = file.read()
-                    
-                    module = astroid.parse(code)
-                    module_name = os.path.basename(file_path).replace('.py', '')
-                    modules[module_name] = module
-                    
-                    # このモジュール内の関数とメソッドを記録
-                    module_functions[module_name] = {}
-                    
-                    # 関数の登録
-                    for node in module.body:
-                        if isinstance(node, astroid.FunctionDef):
-                            full_name = f"{module_name}.{node.name}"
-                            module_functions[module_name][node.name] = full_name
-                            call_graph[full_name] = set()
-                    
-                    # クラスとそのメソッドの登録
-                    for node in module.body:
-                        if isinstance(node, astroid.ClassDef):
-                            class_name = node.name
-                            for method in node.body:
-                                if isinstance(method, astroid.FunctionDef):
-                                    full_name = f"{module_name}.{class_name}.{method.name}"
-                                    module_functions[module_name][f"{class_name}.{method.name}"] = full_name
-                                    call_graph[full_name] = set()
-                
-                except Exception as e:
-                    print(f"ファイル {file_path} のパース中にエラー: {e}")
-            
-            # Step 2: 各モジュールを再度走査して呼び出し関係を構築
-            for module_name, module in modules.items():
-                self._analyze_module_calls(module, module_name, modules, module_functions, call_graph)
-            
-            # Step 3: コールグラフをテキスト形式で整形
-            result = "# コールグラフ\n"
-            
-            # 呼び出し元がある関数のみを表示（外部から呼ばれないユーティリティ関数を除外）
-            has_callers = set()
-            for callee_set in call_graph.values():
-                has_callers.update(callee_set)
-            
-            # 呼び出し元から呼び出し先を整理
-            sorted_callers = sorted(call_graph.keys())
-            for caller in sorted_callers:
-                if caller in has_callers or call_graph[caller]:  # 呼び出される関数か、他の関数を呼び出す関数
-                    callees = sorted(call_graph[caller])
-                    if callees:
-                        result += f"{caller} -> {', '.join(callees)}\n"
-            
-            return result
-        
-        except ImportError:
-            return "astroidライブラリがインストールされていません。\npip install astroid でインストールしてください。"
-        except Exception as e:
-            
-            traceback.print_exc()
-            return f"コールグラフの生成中にエラーが発生しました:\n{str(e)}"
-
-    def _analyze_module_calls(self, module, module_name, modules, module_functions, call_graph):
-        """モジュール内の関数呼び出しを解析する"""
-        
-        def find_calls_in_node(node, caller_name):
-            """ノード内の関数呼び出しを再帰的に検索"""
-            if isinstance(node, astroid.Call):
-                # 直接の関数呼び出し
-                if isinstance(node.func, astroid.Name):
-                    called_name = node.func.name
-                    # 同一モジュール内の関数呼び出し
-                    if called_name in module_functions.get(module_name, {}):
-                        full_called_name = module_functions[module_name][called_name]
-                        call_graph[caller_name].add(full_called_name)
-                
-                # メソッド呼び出し (obj.method())
-                elif isinstance(node.func, astroid.Attribute):
-                    # ここでは単純なケースのみ処理 (self.method())
-                    if isinstance(node.func.expr, astroid.Name) and node.func.expr.name == 'self':
-                        class_name = caller_name.split('.')[-2]  # Assuming format: module.class.method
-                        method_name = node.func.attrname
-                        class_method = f"{class_name}.{method_name}"
-                        if class_method in module_functions.get(module_name, {}):
-                            full_method_name = module_functions[module_name][class_method]
-                            call_graph[caller_name].add(full_method_name)
-            
-            # 子ノードを再帰的に処理
-            for child_node in node.get_children():
-                find_calls_in_node(child_node, caller_name)
-        
-        # 関数定義を処理
-        for node in module.body:
-            if isinstance(node, astroid.FunctionDef):
-                caller_name = f"{module_name}.{node.name}"
-                for child_node in node.body:
-                    find_calls_in_node(child_node, caller_name)
-            
-            # クラス内のメソッドを処理
-            elif isinstance(node, astroid.ClassDef):
-                class_name = node.name
-                for method in node.body:
-                    if isinstance(method, astroid.FunctionDef):
-                        caller_name = f"{module_name}.{class_name}.{method.name}"
-                        for child_node in method.body:
-                            find_calls_in_node(child_node, caller_name)
+                self.update_prompt_list()
+                self.prompt_tree.selection_set(self.current_prompt_id)
+                self.prompt_tree.focus(self.current_prompt_id)
+                self.on_prompt_selected(None)
+            else:
+                messagebox.showinfo("情報", "最後のプロンプトは削除できません。")
 
-    def on_tab_changed(self, event=None):
-        """タブが切り替わったときに文字数を更新する"""
-        # 現在のタブインデックスを取得
-        current_tab_index = self.tab_control.index(self.tab_control.select())
-        
-        # タブに応じてテキストウィジェットを選択
-        if current_tab_index == 0:  # 解析結果タブ
-            text_widget = self.result_text
-        elif current_tab_index == 1:  # 拡張解析タブ
-            text_widget = self.extended_text
-        elif current_tab_index == 2:  # プロンプト入力タブ
-            text_widget = self.prompt_text
-        else:
-            return
+    def update_prompt_list(self):
+        """プロンプト一覧を更新"""
+        # ツリービューをクリア
+        for item in self.prompt_tree.get_children():
+            self.prompt_tree.delete(item)
         
-        # テキスト内容を取得して文字数をカウント
-        text_content = text_widget.get(1.0, tk.END)
-        char_count = len(text_content) - 1  # 最後の改行文字を除く
+        # プロンプト一覧を追加
+        for prompt_id, prompt in self.prompt_manager.get_all_prompts().items():
+            self.prompt_tree.insert("", "end", iid=prompt_id, text="", values=(prompt["name"],))
         
-        # 文字数表示を更新
-        self.char_count_label.config(text=f"文字数: {char_count}")
+        # 現在のプロンプトIDが設定されていて、そのプロンプトが存在する場合に選択
+        if hasattr(self, 'current_prompt_id') and self.current_prompt_id:
+            if self.current_prompt_id in self.prompt_manager.get_all_prompts():
+                self.prompt_tree.selection_set(self.current_prompt_id)
+                self.prompt_tree.focus(self.current_prompt_id)
+                self.prompt_tree.see(self.current_prompt_id)  # 選択項目が見えるようにスクロール
+
+    def save_current_prompt_without_confirm(self):
+        """現在のプロンプトを確認なしで保存（終了時などに使用）"""
+        if hasattr(self, 'prompt_modified') and self.prompt_modified and self.current_prompt_id:
+            prompt_name = self.prompt_name_var.get().strip()
+            prompt_content = self.prompt_text.get(1.0, tk.END).strip()
+            
+            if not prompt_name:
+                prompt_name = "無題のプロンプト"
+            
+            self.prompt_manager.update_prompt(self.current_prompt_id, name=prompt_name, content=prompt_content)
 
     def create_tab_selection_panel(self):
         """タブ選択パネルを作成"""
@@ -3202,31 +2734,39 @@ class CodeAnalyzerApp:
         """選択されたタブの内容をクリップボードにコピー"""
         # 指定されたタブの並びに合わせる
         tab_names = ["解析結果", "拡張解析", "プロンプト入力"]
-        selected_content = []
+        tab_names = [tab_name for tab_name in tab_names if self.tab_checkbox_vars[tab_name].get()]
         
-        # 各タブのチェック状態を確認
-        for tab_name in tab_names:
-            if self.tab_checkbox_vars[tab_name].get():
+        def copy():
+            selected_content = []
+            for tab_name in tab_names:
                 content = self.get_tab_content(tab_name)
                 if content:
                     selected_content.append(f"## {tab_name}\n{content}\n\n")
+            
+            if selected_content:
+                # コンテンツを結合してクリップボードにコピー
+                clipboard_text = "".join(selected_content)
+                import pyperclip
+                pyperclip.copy(clipboard_text)
+                messagebox.showinfo("情報", "選択したタブの内容をクリップボードにコピーしました。")
+            else:
+                messagebox.showinfo("情報", "コピーするタブが選択されていません。")
         
-        if selected_content:
-            # コンテンツを結合してクリップボードにコピー
-            clipboard_text = "".join(selected_content)
-            pyperclip.copy(clipboard_text)
-            messagebox.showinfo("情報", "選択したタブの内容をクリップボードにコピーしました。")
-        else:
-            messagebox.showinfo("情報", "コピーするタブが選択されていません。")
+        # まだ作っていないタブがあれば、作ってからコピーする
+        self.ensure_tabs(self.lazy_tab_keys(tab_names), copy)
+
+    def lazy_tab_keys(self, tab_names):
+        """タブ名のうち、表示・コピーするときに初めて作るタブの内部の名前"""
+        return {self.LAZY_TABS[tab_name] for tab_name in tab_names if tab_name in self.LAZY_TABS}
 
     def get_tab_content(self, tab_name):
         """タブ名に対応する内容を取得"""
         if tab_name == "解析結果":
-            return self.result_text.get(1.0, tk.END).strip()
+            return self.result_view.get_text().strip()
         elif tab_name == "拡張解析":
-            return self.extended_text.get(1.0, tk.END).strip()
+            return self.extended_view.get_text().strip()
         elif tab_name == "JSON出力":
-            return self.json_text.get(1.0, tk.END).strip()
+            return self.json_view.get_text().strip()
         elif tab_name == "プロンプト入力":
             return self.prompt_text.get(1.0, tk.END).strip()
         return ""
@@ -3245,6 +2785,81 @@ class CodeAnalyzerApp:
                 if messagebox.askyesno("確認", "設定を適用するには、現在のディレクトリを再読み込みする必要があります。続行しますか？"):
                     self.dir_tree_view.load_directory(self.current_dir)
 
+    def toggle_use_gitignore(self):
+        """.gitignoreのパターンを除外に使うかどうかの設定を変更"""
+        use_gitignore = self.use_gitignore.get()
+        self.config_manager.set_use_gitignore(use_gitignore)
+        self.dir_tree_view.use_gitignore = use_gitignore
+        
+        # 現在のディレクトリが読み込まれている場合は再読み込み
+        if self.current_dir:
+            self.dir_tree_view.load_directory(self.current_dir)
+
+    def toggle_watch_files(self):
+        """解析したファイルの変更を監視するかどうかの設定を変更"""
+        watch_files = self.watch_files.get()
+        self.config_manager.set_watch_files(watch_files)
+        
+        if not watch_files:
+            self.stop_watching()
+        elif self.analysis_job is None or self.analysis_job.finished:
+            # 実行中の解析があれば、終わったときに監視を始める
+            self.start_watching()
+
+    def start_watching(self):
+        """最後に解析したファイルの変更の監視を始める（監視モードがOFFなら何もしない）"""
+        self.stop_watching()
+        if not self.watch_files.get() or self.analysis_request is None:
+            return
+        
+        python_files, single_file, _ = self.analysis_request
+        if single_file:
+            root, rules = os.path.dirname(python_files[0]), None
+        elif self.dir_tree_view.current_dir:
+            root, rules = self.dir_tree_view.current_dir, self.dir_tree_view.rules
+        else:
+            return
+        
+        try:
+            watcher = FileWatcher(root, python_files, rules, self.dir_tree_view.skip_exe_folders,
+                                  track_new=not single_file)
+        except Exception as e:
+            print(f"ファイルの監視を開始できませんでした: {e}")
+            return
+        print(f"ファイルの変更を監視しています（{watcher.backend.name}）: {root}")
+        self.file_watcher = watcher
+        self.root.after(self.WATCH_POLL_INTERVAL_MS, self.poll_file_watcher, watcher)
+
+    def stop_watching(self):
+        """ファイルの変更の監視をやめる"""
+        if self.file_watcher is not None:
+            self.file_watcher.close()
+            self.file_watcher = None
+
+    def poll_file_watcher(self, watcher):
+        """変更されたファイルがあれば、そのファイルだけを解析し直す（afterで定期的に呼ばれる）"""
+        if watcher is not self.file_watcher:
+            return  # 監視をやめたか、別の解析結果の監視に切り替わった
+        
+        # 解析中は変更を溜めておき、終わってから反映する
+        if self.analysis_job is None or self.analysis_job.finished:
+            changes = watcher.poll()
+            if changes:
+                python_files, single_file, _ = self.analysis_request
+                # 削除されたファイルを外し、追加されたファイルを後ろに加える（残りの順序は変えない）
+                python_files = [f for f in python_files if f not in changes.deleted]
+                python_files.extend(sorted(changes.added))
+                self.project.refresh(changes.paths())
+                if not python_files:
+                    self.stop_watching()
+                    self.file_status.config(text="解析したファイルが削除されました")
+                    return
+                print(f"変更を検出しました: 変更 {len(changes.changed)} / 追加 {len(changes.added)} / "
+                      f"削除 {len(changes.deleted)}")
+                self.start_analysis_job(python_files, single_file, incremental=True)
+        
+        self.root.after(self.WATCH_POLL_INTERVAL_MS, self.poll_file_watcher, watcher)
+
     def setup_text_editor_shortcuts(self):
         """テキストエディタのショートカットとコンテキストメニューを設定"""
         # プロンプトエディタのショートカット設定
@@ -3256,57 +2871,41 @@ class CodeAnalyzerApp:
         # 拡張解析エディタにもショートカットを追加
         self.setup_editor_shortcuts(self.extended_text)
         
-        # テキスト変更イベントをバインド
-        self.prompt_text.bind("<<Modified>>", self.on_text_modified)
-        self.result_text.bind("<<Modified>>", self.on_text_modified)
-        self.extended_text.bind("<<Modified>>", self.on_text_modified)
-
-    def on_text_modified(self, event):
-        """テキストが変更されたときに文字数を更新する"""
-        # イベントが発生したウィジェットを取得
-        text_widget = event.widget
-        
-        # 現在のタブインデックスを取得
+        # 文字数と推定トークン数は、挿入・削除された文字だけから数える（変更のたびにテキスト全体を取り出さない）
+        self.text_counters = {}
+        for view in (self.result_view, self.extended_view, self.json_view):
+            self.text_counters[view.text_widget] = view.counter
+        self.text_counters[self.prompt_text] = TextCounter(self.prompt_text)
+        for counter in self.text_counters.values():
+            counter.add_listener(self.on_text_count_changed)
+        self.prompt_char_count_var.set(self.text_counters[self.prompt_text].format())
+        self.on_tab_changed()
+
+    def current_tab_text(self):
+        """表示中のタブのテキストウィジェット（文字数を数えないタブならNone）"""
         current_tab_index = self.tab_control.index(self.tab_control.select())
-        
-        # 現在のタブに対応するテキストウィジェットがイベントを発生させたものかチェック
-        if (current_tab_index == 0 and text_widget == self.result_text) or \
-           (current_tab_index == 1 and text_widget == self.extended_text) or \
-           (current_tab_index == 2 and text_widget == self.prompt_text):
-            
-            # テキスト内容を取得して文字数をカウント
-            text_content = text_widget.get(1.0, tk.END)
-            char_count = len(text_content) - 1  # 最後の改行文字を除く
-            
-            # 文字数表示を更新
-            self.char_count_label.config(text=f"文字数: {char_count}")
-        
-        # Modifiedフラグをリセット（次のイベント検出のため）
-        text_widget.edit_modified(False)
-        
+        text_widgets = (self.result_text, self.extended_text, self.json_text, self.prompt_text)
+        if current_tab_index < len(text_widgets):
+            return text_widgets[current_tab_index]
+        return None
+
+    def on_text_count_changed(self, counter):
+        """テキストの文字数が変わったときに文字数の表示を更新する（ステータスバーは表示中のタブのみ）"""
+        if counter.text_widget is self.prompt_text:
+            self.prompt_char_count_var.set(counter.format())
+        if counter.text_widget is self.current_tab_text():
+            self.char_count_label.config(text=counter.format())
+
     def on_tab_changed(self, event=None):
-        """タブが切り替わったときに文字数を更新する"""
-        # 現在のタブインデックスを取得
-        current_tab_index = self.tab_control.index(self.tab_control.select())
-        
-        # タブに応じてテキストウィジェットを選択
-        if current_tab_index == 0:  # 解析結果タブ
-            text_widget = self.result_text
-        elif current_tab_index == 1:  # 拡張解析タブ
-            text_widget = self.extended_text
-        elif current_tab_index == 2:  # JSONタブ
-            text_widget = self.json_text
-        elif current_tab_index == 3:  # プロンプト入力タブ
-            text_widget = self.prompt_text
-        else:
+        """タブが切り替わったときに文字数を更新する（拡張解析・JSON出力のタブは、まだ作っていなければ作る）"""
+        text_widget = self.current_tab_text()
+        if text_widget is None:
             return
-        
-        # テキスト内容を取得して文字数をカウント
-        text_content = text_widget.get(1.0, tk.END)
-        char_count = len(text_content) - 1  # 最後の改行文字を除く
-        
-        # 文字数表示を更新
-        self.char_count_label.config(text=f"文字数: {char_count}")
+        self.char_count_label.config(text=self.text_counters[text_widget].format())
+        if text_widget is self.extended_text:
+            self.ensure_tabs({'extended'})
+        elif text_widget is self.json_text:
+            self.ensure_tabs({'json'})
 
     def setup_editor_shortcuts(self, text_widget):
         """テキストウィジェットにショートカットとコンテキストメニューを設定"""
@@ -3489,12 +3088,6 @@ class CodeAnalyzerApp:
                 self.update_prompt_list()
                 messagebox.showinfo("情報", f"プロンプト「{prompt_name}」を保存しました。")
                 
-                # 現在のタブがプロンプト入力タブであれば文字数を更新
-                current_tab_index = self.tab_control.index(self.tab_control.select())
-                if current_tab_index == 2:  # プロンプト入力タブ
-                    char_count = len(prompt_content)
-                    self.char_count_label.config(text=f"文字数: {char_count}")
-                
             return "break"  # イベント伝播を停止（Ctrl+Sなどのショートカットを処理する場合）
 
     def toggle_display_options(self):
@@ -3526,7 +3119,10 @@ class CodeAnalyzerApp:
 
 
     def load_last_session(self):
-        """前回のセッション情報を読み込む"""
+        """前回のセッション情報を読み込む（終了時のスナップショットがあれば、解析し直さずに結果を表示する）"""
+        if self.restore_session():
+            return
+        
         last_file = self.config_manager.get_last_file()
         last_directory = self.config_manager.get_last_directory()
         
@@ -3546,6 +3142,110 @@ class CodeAnalyzerApp:
             # 前回のディレクトリを読み込む
             self.import_directory_path(last_directory)
     
+    def save_session(self):
+        """
+        表示中の解析の状態（走査結果・ファイルごとの解析結果・コールグラフ・タブの内容）を圧縮して保存する
+        最後まで終わった解析の結果を表示していなければ、古いスナップショットを消す
+        """
+        if not self.session_restorable or self.analysis_request is None:
+            remove_session(self.session_file)
+            return
+        
+        python_files, single_file, _ = self.analysis_request
+        state = {
+            'format': SESSION_FORMAT,
+            'versions': analysis_versions(self.project),
+            'current_dir': self.current_dir,
+            'selected_file': self.selected_file,
+            'python_files': python_files,
+            'single_file': single_file,
+            'whole_directory': self.analysis_whole_directory,
+            'display': {
+                'include_imports': self.analyzer.include_imports,
+                'include_docstrings': self.analyzer.include_docstrings
+            },
+            'tabs': {
+                'result': self.result_view.get_text(),
+                'extended': self.extended_view.get_text(),
+                'json': self.json_view.get_text()
+            },
+            'stale_tabs': sorted(self.stale_tabs),
+            'scan': self.dir_tree_view.export_scan(),
+            'analysis': self.project.export_state()
+        }
+        try:
+            start = time.perf_counter()
+            size = save_session(self.session_file, state)
+            print(f"セッションを保存しました: {size / 1024:.0f}KB（{(time.perf_counter() - start) * 1000:.0f}ms）")
+        except Exception as e:
+            print(f"セッションの保存に失敗しました: {e}")
+
+    def restore_session(self):
+        """
+        前回の終了時に保存したスナップショットから解析の状態とタブの内容を戻す（戻せたらTrue）
+        ファイルは読まずに更新時刻とサイズだけを調べ、変更・追加・削除されたファイルがあればそれだけを解析し直す
+        """
+        start = time.perf_counter()
+        state = load_session(self.session_file)
+        if state is None:
+            return False
+        
+        # 前回最後に開いていたディレクトリで、解析の設定とバージョンが同じときだけ使う
+        last_directory = self.config_manager.get_last_directory()
+        current_dir = state['current_dir']
+        if (not current_dir or not last_directory
+                or os.path.normpath(current_dir) != os.path.normpath(last_directory)
+                or not os.path.isdir(current_dir)
+                or state['versions'] != analysis_versions(self.project)):
+            return False
+        
+        python_files, single_file = state['python_files'], state['single_file']
+        self.dir_tree_view.load_directory(current_dir, state['scan'])
+        # ディレクトリ全体を解析していたなら、閉じている間に追加されたファイルも含めるよう、
+        # 走査結果（変わっていれば走査し直したもの）から今の除外ルールで解析対象を集め直す
+        whole_directory = not single_file and state['whole_directory']
+        current_files = self.dir_tree_view.get_included_files(include_python_only=True) if whole_directory else None
+        changes = find_changed_files(python_files, state['analysis']['sources'], current_files)
+        # 削除されたファイルを外し、追加されたファイルを後ろに加える（残りの順序は変えない）
+        python_files = [f for f in python_files if f not in changes.deleted]
+        python_files.extend(sorted(changes.added))
+        if not python_files:
+            return False
+        
+        self.selected_file = state['selected_file']
+        self.current_dir = current_dir
+        self.show_imports.set(state['display']['include_imports'])
+        self.show_docstrings.set(state['display']['include_docstrings'])
+        self.analyzer.include_imports = state['display']['include_imports']
+        self.analyzer.include_docstrings = state['display']['include_docstrings']
+        self.project.restore_state(state['analysis'])
+        self.analysis_whole_directory = whole_directory
+        
+        # 前回の結果をそのまま表示する
+        for view, highlighter, name in ((self.result_view, self.result_highlighter, 'result'),
+                                        (self.extended_view, self.extended_highlighter, 'extended'),
+                                        (self.json_view, self.json_highlighter, 'json')):
+            view.set_text(state['tabs'][name], keep_position=True)
+            highlighter.highlight()
+        self.stale_tabs = set(state['stale_tabs'])
+        self.analysis_request = (python_files, single_file, None)
+        self.session_restorable = True
+        
+        if single_file:
+            self.file_status.config(text=f"ファイル: {os.path.basename(python_files[0])}（前回のセッションを復元しました）")
+        else:
+            self.file_status.config(text=f"{len(python_files)} 個のPythonファイル（前回のセッションを復元しました）")
+        print(f"前回のセッションを復元しました（{(time.perf_counter() - start) * 1000:.0f}ms）: "
+              f"変更 {len(changes.changed)} / 追加 {len(changes.added)} / 削除 {len(changes.deleted)}")
+        
+        if changes:
+            # 変わったファイルだけを解析し直して結果を差し替える（終わったら監視を始める）
+            self.project.refresh(changes.paths())
+            self.start_analysis_job(python_files, single_file, incremental=True)
+        else:
+            self.start_watching()
+        return True
+
     def on_window_resize(self, event):
         """ウィンドウサイズ変更時のイベントハンドラ"""
         # イベントがルートウィンドウからのものかチェック
@@ -3580,6 +3280,17 @@ class CodeAnalyzerApp:
         # タブ選択状態を保存
         self.save_tab_selection_state()
         
+        # 実行中の解析とファイルの監視を止めてワーカープロセスを終了
+        self.stop_watching()
+        self.cancel_analysis()
+        self.project.shutdown()
+        
+        # 次の起動時にすぐ表示できるよう解析の状態を保存する
+        self.save_session()
+        
+        # 保存待ちの設定を書き込む
+        self.config_manager.flush()
+        
         # 終了
         self.root.destroy()
 
@@ -3623,11 +3334,10 @@ class CodeAnalyzerApp:
         self.current_dir = dir_path
         self.dir_tree_view.load_directory(dir_path)
         self.file_status.config(text=f"ディレクトリ: {os.path.basename(dir_path)}")
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, f"ディレクトリ '{dir_path}' を読み込みました。\n"
-                              f"解析したいPythonファイルを選択して、[解析]ボタンをクリックしてください。\n\n"
-                              f"ヒント: Shift+クリックでファイルやディレクトリを解析から除外できます。\n"
-                              f"      ダブルクリックでファイルを選択できます。")
+        self.result_view.set_text(f"ディレクトリ '{dir_path}' を読み込みました。\n"
+                                  f"解析したいPythonファイルを選択して、[解析]ボタンをクリックしてください。\n\n"
+                                  f"ヒント: Shift+クリックでファイルやディレクトリを解析から除外できます。\n"
+                                  f"      ダブルクリックでファイルを選択できます。")
     
     def import_file(self):
         """単一のPythonファイルを選択"""
@@ -3663,11 +3373,8 @@ class CodeAnalyzerApp:
         # 解析結果タブに切り替え
         self.tab_control.select(0)  # 最初のタブ（解析結果タブ）を選択
         
-        # ファイル内容を解析
-        self.analyze_file(file_path)
-        
-        # プロンプトテンプレートを更新
-        self.update_prompt_template(os.path.basename(file_path)) 
+        # ファイル内容を解析（完了後にプロンプトテンプレートを更新）
+        self.analyze_file(file_path, on_complete=lambda: self.update_prompt_template(os.path.basename(file_path)))
         
     def on_dir_selected(self, dir_path):
         """ツリービューでディレクトリが選択されたときのコールバック"""
@@ -3684,11 +3391,8 @@ class CodeAnalyzerApp:
         # 解析結果タブに切り替え
         self.tab_control.select(0)  # 最初のタブ（解析結果タブ）を選択
         
-        # ディレクトリ内のファイルを解析
-        self.analyze_directory(dir_path)
-        
-        # プロンプトテンプレートを更新
-        self.update_prompt_template(os.path.basename(dir_path))        
+        # ディレクトリ内のファイルを解析（完了後にプロンプトテンプレートを更新）
+        self.analyze_directory(dir_path, on_complete=lambda: self.update_prompt_template(os.path.basename(dir_path)))        
 
     def update_prompt_template(self, name):
         """選択されたファイル/ディレクトリ名に基づいてプロンプトテンプレートを更新"""
@@ -3702,12 +3406,17 @@ class CodeAnalyzerApp:
         # 現在のプロンプトテキストを取得
         current_prompt = self.prompt_text.get(1.0, tk.END)
         
+        # JSON出力をまだ作っていなければ、作ってから置換する
+        if "[json出力]" in current_prompt and 'json' in self.stale_tabs:
+            self.ensure_tabs({'json'}, lambda: self.update_prompt_template(name) if 'json' not in self.stale_tabs else None)
+            return
+        
         # 更新フラグ（変更があったかどうか）
         updated = False
         
         # 解析結果とJSON出力を取得
-        analysis_result = self.result_text.get(1.0, tk.END) if hasattr(self, 'result_text') else ""
-        json_output = self.json_text.get(1.0, tk.END) if hasattr(self, 'json_text') else ""
+        analysis_result = self.result_view.get_text() if hasattr(self, 'result_view') else ""
+        json_output = self.json_view.get_text() if hasattr(self, 'json_view') else ""
         
         # 置換処理を開始（複数のプレースホルダーを処理）
         updated_prompt = current_prompt
@@ -3737,18 +3446,9 @@ class CodeAnalyzerApp:
             self.prompt_text.delete(1.0, tk.END)
             self.prompt_text.insert(tk.END, updated_prompt)
             print(f"プロンプトテンプレートを更新しました: {name}")
-            
-            # 文字数も更新
-            char_count = len(updated_prompt) - 1  # 最後の改行文字を除く
-            self.prompt_char_count_var.set(f"文字数: {char_count}")
-            
-            # 現在表示されているタブがプロンプト入力タブであれば文字数ラベルも更新
-            current_tab_index = self.tab_control.index(self.tab_control.select())
-            if current_tab_index == 3:  # プロンプト入力タブ（インデックスが3）
-                self.char_count_label.config(text=f"文字数: {char_count}")
 
-    def analyze_directory(self, dir_path):
-        """指定されたディレクトリ内のPythonファイルを解析"""
+    def analyze_directory(self, dir_path, on_complete=None):
+        """指定されたディレクトリ内のPythonファイルを解析（ワーカースレッドで実行）"""
         if not hasattr(self.dir_tree_view, 'tree') or not self.dir_tree_view.tree or not self.dir_tree_view.tree.winfo_exists():
             return
         
@@ -3766,326 +3466,25 @@ class CodeAnalyzerApp:
             messagebox.showinfo("情報", "解析対象のPythonファイルがありません。")
             return
         
-        # 通常の解析実行
-        result, char_count = self.analyzer.analyze_files(python_files)
-        
-        # 結果表示
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, result)
-        self.result_highlighter.highlight()
-        
-        # 現在表示されているタブが解析結果タブの場合のみ文字数を更新
-        current_tab_index = self.tab_control.index(self.tab_control.select())
-        if current_tab_index == 0:  # 解析結果タブ
-            self.char_count_label.config(text=f"文字数: {char_count}")
-        
-        # ステータス更新
-        self.file_status.config(text=f"{len(python_files)} 個のPythonファイルを解析しました")
-        
-        # astroidによる拡張解析を実行
-        self.perform_extended_analysis(python_files)
-        
-        # JSON出力を生成（追加）
-        self.generate_json_output()
+        # 基本解析・拡張解析・JSON出力をまとめて実行
+        self.analysis_whole_directory = True
+        self.start_analysis_job(python_files, on_complete=on_complete)
 
     def perform_extended_analysis(self, python_files):
-        """astroidによる拡張解析を実行する（全ファイル統合版）"""
-        try:
-            if not python_files:
-                self.extended_text.delete(1.0, tk.END)
-                self.extended_text.insert(tk.END, "拡張解析対象のPythonファイルがありません。")
-                return
-                    
-            # 解析結果を保存する辞書
-            analysis_results = {}
-            module_nodes = {}
-            
-                
-            # プログレスウィンドウを表示
-            progress_window = tk.Toplevel(self.root)
-            progress_window.title("拡張解析中")
-            progress_window.geometry("400x100")
-            progress_window.transient(self.root)
-                
-            progress_label = ttk.Label(progress_window, text=f"ファイルを解析中... (0/{len(python_files)})")
-            progress_label.pack(pady=10)
-                
-            progress_bar = ttk.Progressbar(progress_window, mode="determinate", maximum=100)
-            progress_bar.pack(fill="x", padx=20)
-                
-            # ウィンドウを中央に配置
-            progress_window.update_idletasks()
-            x = self.root.winfo_rootx() + (self.root.winfo_width() - progress_window.winfo_width()) // 2
-            y = self.root.winfo_rooty() + (self.root.winfo_height() - progress_window.winfo_height()) // 2
-            progress_window.geometry(f"+{x}+{y}")
-                
-            # 統合解析レポート用の情報
-            all_classes = []
-            all_functions = []
-            all_dependencies = {}
-            all_inheritance = {}
-            main_file = None
-            
-            # ディレクトリ構造を取得
-            directory_structure = self.get_directory_structure(python_files)
-                
-            # Step 1: 各ファイルを個別に解析する
-            for i, file_path in enumerate(python_files):
-                try:
-                    # プログレス更新
-                    progress_pct = (i / len(python_files)) * 100
-                    progress_bar["value"] = progress_pct
-                    progress_label.config(text=f"ファイルを解析中... ({i+1}/{len(python_files)}): {os.path.basename(file_path)}")
-                    progress_window.update()
-                    
-                    # ファイルを読み込む
-                    with open(file_path, 'r', encoding='utf-8') as file:
-                        code = file.read()
-                    
-                    # main関数やエントリーポイントを探す（大事なファイルを特定）
-                    if 'if __name__ == "__main__"' in code or "main()" in code:
-                        main_file = file_path
-                    
-                    # astroidでモジュールをパース
-                    module = astroid.parse(code)
-                    module_name = os.path.basename(file_path).replace('.py', '')
-                    module_nodes[module_name] = module
-                    
-                    # ファイル個別の解析結果を取得
-                    self.astroid_analyzer.reset()
-                    file_result, _ = self.astroid_analyzer.analyze_code(code, os.path.basename(file_path))
-                    
-                    # 結果を蓄積
-                    analysis_results[file_path] = {
-                        'name': os.path.basename(file_path),
-                        'classes': self.astroid_analyzer.classes.copy(),
-                        'functions': self.astroid_analyzer.functions.copy(),
-                        'dependencies': self.astroid_analyzer.dependencies.copy(),
-                        'inheritance': self.astroid_analyzer.inheritance.copy()
-                    }
-                    
-                    # 全体のリストに追加
-                    all_classes.extend(self.astroid_analyzer.classes)
-                    all_functions.extend(self.astroid_analyzer.functions)
-                    all_dependencies.update(self.astroid_analyzer.dependencies)
-                    all_inheritance.update(self.astroid_analyzer.inheritance)
-                    
-                except Exception as e:
-                    print(f"ファイル {file_path} の解析中にエラー: {e}")
-                    
-                    traceback.print_exc()
-            
-            # プログレスウィンドウを閉じる
-            progress_window.destroy()
-            
-            # Step 2: ファイル間の依存関係を解析
-            # インポート関係を追跡
-            file_dependencies = {}
-            for module_name, module in module_nodes.items():
-                file_dependencies[module_name] = set()
-                for node in module.body:
-                    if isinstance(node, astroid.Import):
-                        for name in node.names:
-                            imported_name = name[0].split('.')[0]
-                            if imported_name in module_nodes:
-                                file_dependencies[module_name].add(imported_name)
-                    elif isinstance(node, astroid.ImportFrom):
-                        if node.modname in module_nodes:
-                            file_dependencies[module_name].add(node.modname)
-            
-            # 依存関係を解析する際にスキップすべき標準ライブラリや組み込み関数のリスト
-            SKIP_DEPENDENCIES = {
-                'print', 'len', 'str', 'int', 'float', 'list', 'dict', 'set', 'tuple',
-                'open', 'range', 'enumerate', 'zip', 'map', 'filter',
-                'os.path.join', 'os.path.exists', 'os.path.basename', 'os.path.dirname',
-                'logging.info', 'logging.debug', 'logging.warning', 'logging.error'
-                # GUI要素はスキップしない
-            }
-            
-            # 依存関係をフィルタリング
-            filtered_dependencies = {}
-            for caller, callees in all_dependencies.items():
-                filtered_callees = {callee for callee in callees if callee not in SKIP_DEPENDENCIES}
-                if filtered_callees:  # 空でない場合のみ追加
-                    filtered_dependencies[caller] = filtered_callees
-            
-            # フィルタリングした依存関係を使用
-            all_dependencies = filtered_dependencies
-            
-            # ファイル間の依存関係もフィルタリング
-            for module_name in file_dependencies:
-                file_dependencies[module_name] = {
-                    dep for dep in file_dependencies[module_name] 
-                    if dep not in SKIP_DEPENDENCIES
-                }
-            
-            # Step 3: 統合レポートの生成 - すべての詳細情報を省略してLLM向け構造化データのみ出力
-            report = "# プロジェクト全体の拡張解析レポート\n\n"
-            
-            # LLM向け構造化データの出力
-            report += "## LLM向け構造化データ\n"
-            report += "```\n"
-            
-            # ディレクトリ構造を冒頭に挿入
-            report += "# ディレクトリ構造\n"
-            report += directory_structure
-            report += "\n"
-            
-            # コンパクトなフォーマットでデータを出力
-            compact_data = "# クラス一覧\n"
-            for cls in all_classes:
-                base_info = f" <- {', '.join(cls['base_classes'])}" if cls['base_classes'] else ""
-                file_info = next((os.path.basename(f) for f, r in analysis_results.items() 
-                               if any(c["name"] == cls["name"] for c in r["classes"])), "unknown")
-                compact_data += f"{cls['name']}{base_info} ({file_info})\n"
-                
-                if cls['methods']:
-                    compact_data += "  メソッド:\n"
-                    for m in cls['methods']:
-                        params = ", ".join(p['name'] for p in m['parameters'])
-                        ret_type = f" -> {m['return_type']}" if m['return_type'] and m['return_type'] != "unknown" else ""
-                        compact_data += f"    {m['name']}({params}){ret_type}\n"
-                compact_data += "\n"
-
-            compact_data += "# 関数一覧\n"
-            for func in all_functions:
-                params = ", ".join(p['name'] for p in func['parameters'])
-                ret_type = f" -> {func['return_type']}" if func['return_type'] and func['return_type'] != "unknown" else ""
-                file_info = next((os.path.basename(f) for f, r in analysis_results.items() 
-                               if any(fn["name"] == func["name"] for fn in r["functions"])), "unknown")
-                compact_data += f"{func['name']}({params}){ret_type} ({file_info})\n"
-            compact_data += "\n"
-
-            # 関数間の依存関係（主要なもののみ）
-            if all_dependencies:
-                compact_data += "# 主要な関数依存関係\n"
-                # 依存の多いもの順に表示
-                important_dependencies = sorted([(k, v) for k, v in all_dependencies.items() if v], 
-                                             key=lambda x: len(x[1]), reverse=True)[:10]
-                for caller, callees in important_dependencies:
-                    compact_data += f"{caller} -> {', '.join(callees)}\n"
-                compact_data += "\n"
-            
-            # コールグラフの生成と追加
-            call_graph_text = self.generate_call_graph(python_files)
-            # compact_data += "# コールグラフ\n"
-            compact_data += call_graph_text
-            compact_data += "\n"
-
-            report += compact_data
-            report += "```\n"
-            
-            # 拡張解析の結果を表示
-            self.extended_text.delete(1.0, tk.END)
-            self.extended_text.insert(tk.END, report)
-            self.extended_highlighter.highlight()
-            
-            # 現在表示されているタブが拡張解析タブの場合のみ文字数を更新
-            current_tab_index = self.tab_control.index(self.tab_control.select())
-            if current_tab_index == 1:  # 拡張解析タブ
-                char_count = len(report)
-                self.char_count_label.config(text=f"文字数: {char_count}")
-            
-            # JSON出力を生成（拡張解析の後に呼び出し）
-            self.generate_json_output()
-            
-        except ImportError:
-            self.extended_text.delete(1.0, tk.END)
-            self.extended_text.insert(tk.END, "astroidライブラリがインストールされていません。\n"
-                                    "pip install astroid でインストールしてください。")
-        except Exception as e:
-            self.extended_text.delete(1.0, tk.END)
-            error_msg = f"拡張解析中にエラーが発生しました:\n{str(e)}"
-            print(error_msg)
-            
-            traceback.print_exc()
-            self.extended_text.insert(tk.END, error_msg)
+        """astroidによる拡張解析を実行して結果を表示する（全ファイル統合版）"""
+        report = self.project.build_extended_report(python_files)
+        self.show_extended_report(report)
 
-    def get_directory_structure(self, python_files):
-        """ファイルリストからディレクトリ構造を生成する"""
-        # ファイルのディレクトリを取得する
-        if not python_files:
-            return "ファイルがありません"
-        
-        # 共通のルートディレクトリを見つける
-        file_dirs = [os.path.dirname(f) for f in python_files]
-        common_root = os.path.commonpath(file_dirs) if file_dirs else ""
-        
-        # ディレクトリツリーを構築
-        tree = {}
-        for file_path in python_files:
-            # ルートからの相対パスを取得
-            rel_path = os.path.relpath(file_path, common_root)
-            parts = rel_path.split(os.sep)
-            
-            # ツリー構造に追加
-            current = tree
-            for i, part in enumerate(parts):
-                if i == len(parts) - 1:  # ファイル
-                    if "_files" not in current:
-                        current["_files"] = []
-                    current["_files"].append(part)
-                else:  # ディレクトリ
-                    if part not in current:
-                        current[part] = {}
-                    current = current[part]
-        
-        # ツリー構造を文字列に変換
-        result = []
-        
-        def print_tree(node, prefix="", is_last=True, indent=""):
-            # ディレクトリ内のファイルとサブディレクトリを取得
-            dirs = sorted([k for k in node.keys() if k != "_files"])
-            files = sorted(node.get("_files", []))
-            
-            # 現在のディレクトリのファイルを出力
-            for i, f in enumerate(files):
-                is_last_file = (i == len(files) - 1) and not dirs
-                result.append(f"{indent}{'└── ' if is_last_file else '├── '}{f}")
-            
-            # サブディレクトリを出力
-            for i, d in enumerate(dirs):
-                is_last_dir = (i == len(dirs) - 1)
-                result.append(f"{indent}{'└── ' if is_last_dir else '├── '}{d}/")
-                # 次のレベルのインデント
-                next_indent = indent + ("    " if is_last_dir else "│   ")
-                print_tree(node[d], prefix + d + "/", is_last_dir, next_indent)
-        
-        # ルートディレクトリ名を出力
-        root_name = os.path.basename(common_root) or "root"
-        result.append(f"{root_name}/")
-        # ルート以下のツリーを出力
-        print_tree(tree, indent="")
-        
-        return "\n".join(result)
-
-    def analyze_file(self, file_path):
-        """単一のファイルを解析"""
-        try:
-            # 通常の解析
-            result, char_count = self.analyzer.analyze_file(file_path)
-            
-            # 結果表示
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, result)
-            self.result_highlighter.highlight()
-            
-            # 現在表示されているタブが解析結果タブの場合のみ文字数を更新
-            current_tab_index = self.tab_control.index(self.tab_control.select())
-            if current_tab_index == 0:
-                self.char_count_label.config(text=f"文字数: {char_count}")
-            
-            # ステータス更新
-            self.file_status.config(text=f"ファイル: {os.path.basename(file_path)}")
-            
-            # 単一ファイルの拡張解析を実行
-            self.perform_extended_analysis([file_path])
-            
-            # JSON出力を生成（追加）
-            self.generate_json_output()
-            
-        except Exception as e:
-            messagebox.showerror("エラー", f"ファイルの解析中にエラーが発生しました:\n{str(e)}")
+    def show_extended_report(self, report):
+        """拡張解析の結果を表示する（JSON出力は拡張解析の結果を含むので、次に表示・コピーするときに作り直す）"""
+        self.extended_view.set_text(report, keep_position=True)
+        self.extended_highlighter.highlight()
+        self.stale_tabs.discard('extended')
+        self.stale_tabs.add('json')
+
+    def analyze_file(self, file_path, on_complete=None):
+        """単一のファイルを解析（ワーカースレッドで実行）"""
+        self.start_analysis_job([file_path], single_file=True, on_complete=on_complete)
 
 
     def analyze_selected(self):
@@ -4108,19 +3507,305 @@ class CodeAnalyzerApp:
             return
         
         # 解析実行
-        result, char_count = self.analyzer.analyze_files(included_files)
+        self.analysis_whole_directory = True
+        self.start_analysis_job(included_files)
+
+    def analyze_git_changes(self):
+        """gitの基準のrefから変更されたファイルだけを解析する（ツリーの除外設定も適用する）"""
+        dir_path = self.dir_tree_view.current_dir
+        if not dir_path:
+            messagebox.showinfo("情報", "先にディレクトリを読み込んでください。")
+            return
+        
+        settings = self.config_manager.get_git_changes_settings()
+        base_ref = simpledialog.askstring(
+            "変更分の解析",
+            "基準にするgitのref（ブランチ・タグ・コミット）を入力してください:",
+            initialvalue=settings["base_ref"]
+        )
+        if not base_ref or not base_ref.strip():
+            return  # キャンセルされた
+        base_ref = base_ref.strip()
+        include_importers = messagebox.askyesno(
+            "変更分の解析",
+            "変更されたモジュールを直接インポートしているファイルも解析しますか？",
+            default=messagebox.YES if settings["include_importers"] else messagebox.NO
+        )
+        self.config_manager.set_git_changes_settings(base_ref, include_importers)
+        
+        # ファイルはgitの出力から選び、ツリーで除外されているファイルは含めない
+        included_files = set(self.dir_tree_view.get_included_files(include_python_only=True))
+        try:
+            python_files = select_changed_files(dir_path, base_ref, include_importers, included_files.__contains__)
+        except GitError as e:
+            messagebox.showerror("エラー", str(e))
+            return
+        
+        if not python_files:
+            messagebox.showinfo("情報", f"{base_ref} から変更された解析対象のPythonファイルはありません。")
+            return
+        
+        print(f"{base_ref} から変更されたファイル: {len(python_files)} 個")
+        self.selected_file = None
+        self.tab_control.select(0)  # 解析結果タブ
+        self.analysis_whole_directory = False
+        self.start_analysis_job(python_files)
+
+    def start_analysis_job(self, python_files, single_file=False, on_complete=None, incremental=False):
+        """
+        解析ジョブをワーカースレッドで開始する（Tkのメインループは止めない）
+        実行中のジョブがあればキャンセルし、そのジョブが終わってから新しいジョブを始める
+        on_completeは解析が最後まで終わったときにUIスレッドで呼ばれる
+        incrementalなら監視モードで変更されたファイルだけを解析し直し（呼び出し側でproject.refresh済み）、
+        進捗ウィンドウは出さずに表示中の結果をその場で置き換える
+        """
+        if not incremental:
+            # 解析するファイルが変わるので、監視は解析が終わってから作り直す
+            self.stop_watching()
+        if self.analysis_job is not None and not self.analysis_job.finished:
+            self.analysis_job.cancel()
+            self.pending_analysis = (python_files, single_file, on_complete)
+            return
+        
+        # 解析対象ファイルをパイプラインに登録（読み込み・パースは各ファイル一度だけ）
+        if not incremental:
+            self.project.load(python_files)
+        self.analysis_cache.reset_stats()
+        
+        job = AnalysisJob()
+        self.analysis_job = job
+        self.analysis_request = (python_files, single_file, on_complete)
+        self.analysis_incremental = incremental
+        self.tab_job_request = None
+        self.session_restorable = False
+        
+        # 拡張解析・JSON出力は表示・コピーするときに作り直す
+        self.stale_tabs = {'extended', 'json'}
+        if not incremental:
+            # 途中結果を順に表示するため前回の結果をクリア
+            self.result_view.set_text("")
+            self.extended_view.set_text(self.LAZY_TAB_PLACEHOLDERS['extended'])
+            self.json_view.set_text(self.LAZY_TAB_PLACEHOLDERS['json'])
+            self.show_progress_window(len(python_files))
+        
+        worker = threading.Thread(target=self.run_analysis_job, args=(job, python_files, single_file), daemon=True)
+        worker.start()
+        self.root.after(self.ANALYSIS_POLL_INTERVAL_MS, self.poll_analysis_job)
+
+    def run_analysis_job(self, job, python_files, single_file):
+        """ワーカースレッドで基本解析を実行し、結果をイベントとしてUIスレッドに送る（拡張解析はタブを開いたときに実行する）"""
+        try:
+            result, _ = self.project.analyze_basic(python_files, single_file, job)
+            job.post("basic", result)
+            job.post("done")
+        except AnalysisCancelled:
+            job.post("cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            job.post("error", str(e))
+
+    def poll_analysis_job(self):
+        """ワーカースレッドから届いたイベントをUIに反映する（afterで定期的に呼ばれる）"""
+        job = self.analysis_job
+        if job is None or job.finished:
+            return
+        
+        for kind, payload in job.get_events():
+            if kind == "progress":
+                self.update_progress_window(payload[0])
+            elif kind == "partial":
+                # 解析の終わったファイルから順に表示（変更分の解析では前回の結果を表示したままにする）
+                if not self.analysis_incremental:
+                    self.result_view.append(payload[0])
+            elif kind == "basic":
+                self.show_basic_result(*payload)
+            elif kind == "extended":
+                self.show_extended_report(payload[0])
+            else:
+                self.finish_analysis_job(kind, payload)
+                return
         
-        # 結果表示
-        self.result_text.delete(1.0, tk.END)
-        self.result_text.insert(tk.END, result)
+        self.root.after(self.ANALYSIS_POLL_INTERVAL_MS, self.poll_analysis_job)
+
+    def show_basic_result(self, result):
+        """基本解析の結果を表示する"""
+        self.result_view.set_text(result, keep_position=True)
         self.result_highlighter.highlight()
-        self.char_count_label.config(text=f"文字数: {char_count}")
         
         # ステータス更新
-        self.file_status.config(text=f"{len(included_files)} 個のPythonファイルを解析しました")
+        python_files, single_file, _ = self.analysis_request
+        if single_file:
+            self.file_status.config(text=f"ファイル: {os.path.basename(python_files[0])}")
+        else:
+            self.file_status.config(text=f"{len(python_files)} 個のPythonファイルを解析しました")
+
+    def finish_analysis_job(self, kind, payload):
+        """解析ジョブの終了処理（完了・キャンセル・エラー）"""
+        self.analysis_job.finished = True
+        self.close_progress_window()
+        python_files, single_file, on_complete = self.analysis_request
+        
+        if self.tab_job_request is not None:
+            self.finish_tab_job(kind, payload)
+        elif kind == "done":
+            self.session_restorable = True
+            if self.analysis_incremental:
+                self.file_status.config(text=f"{len(python_files)} 個のPythonファイルを解析しました（変更を反映）")
+            # キャッシュの利用状況を表示
+            self.show_cache_stats()
+            if on_complete is not None:
+                on_complete()
+            # 監視中の変更分の解析でなければ（新しい解析や、復元したセッションの変更分の解析なら）監視を始める
+            if self.file_watcher is None and self.pending_analysis is None:
+                self.start_watching()
+        elif kind == "cancelled":
+            self.file_status.config(text="解析をキャンセルしました（途中までの結果を表示しています）")
+        else:
+            target = "ファイル" if single_file else "ディレクトリ"
+            messagebox.showerror("エラー", f"{target}の解析中にエラーが発生しました:\n{payload[0]}")
+        
+        # 実行中に新しい解析が要求されていれば開始（待っている操作はその解析が終わってから処理する）
+        if self.pending_analysis is not None:
+            request = self.pending_analysis
+            self.pending_analysis = None
+            self.start_analysis_job(*request)
+        elif kind == "done":
+            self.run_deferred_tab_requests()
+        elif self.deferred_tab_requests:
+            self.deferred_tab_requests = []
+            messagebox.showinfo("情報", "解析が最後まで終わらなかったため、待っていたコピーなどの操作は実行しませんでした。")
+
+    def run_deferred_tab_requests(self):
+        """解析の実行中に要求された操作を、必要なタブを作ってから順に実行する（タブを作るジョブを始めたら、その終了後に続ける）"""
+        while self.deferred_tab_requests and (self.analysis_job is None or self.analysis_job.finished):
+            tabs, on_ready = self.deferred_tab_requests.pop(0)
+            self.ensure_tabs(tabs, on_ready)
+        # 拡張解析・JSON出力のタブを表示していれば、その内容を作る
+        if self.analysis_job is None or self.analysis_job.finished:
+            self.on_tab_changed()
+
+    def ensure_tabs(self, tabs, on_ready=None):
+        """
+        tabs（'extended'・'json'）のうち、今の解析でまだ作っていないタブの内容を作ってからon_readyを呼ぶ
+        拡張解析はワーカースレッドで実行する（JSON出力は拡張解析の結果を含むので、先に拡張解析を作る）
+        解析の実行中は、タブが途中までの内容なので、解析が終わってから作り直してon_readyを呼ぶ
+        """
+        if self.analysis_job is not None and not self.analysis_job.finished:
+            if on_ready is not None:
+                self.deferred_tab_requests.append((set(tabs), on_ready))
+                self.file_status.config(text="解析の実行中です。終わってから続きを実行します")
+            return
+        
+        tabs = set(tabs) & self.stale_tabs
+        if self.analysis_request is None or not tabs:
+            if on_ready is not None:
+                on_ready()
+            return
+        
+        if 'extended' not in self.stale_tabs:
+            # 拡張解析の結果はあるので、JSON出力だけをその場で作る
+            self.generate_json_output()
+            if on_ready is not None:
+                on_ready()
+            return
+        
+        python_files = self.analysis_request[0]
+        job = AnalysisJob()
+        self.analysis_job = job
+        self.tab_job_request = (tabs, on_ready)
+        self.show_progress_window(len(python_files))
+        
+        worker = threading.Thread(target=self.run_tab_job, args=(job, python_files), daemon=True)
+        worker.start()
+        self.root.after(self.ANALYSIS_POLL_INTERVAL_MS, self.poll_analysis_job)
+
+    def run_tab_job(self, job, python_files):
+        """ワーカースレッドで拡張解析を実行し、結果をイベントとしてUIスレッドに送る"""
+        try:
+            report = self.project.build_extended_report(python_files, job)
+            job.post("extended", report)
+            job.post("done")
+        except AnalysisCancelled:
+            job.post("cancelled")
+        except Exception as e:
+            traceback.print_exc()
+            job.post("error", str(e))
+
+    def finish_tab_job(self, kind, payload):
+        """タブを作るジョブの終了処理（完了したら残りのタブを作ってからon_readyを呼ぶ）"""
+        tabs, on_ready = self.tab_job_request
+        self.tab_job_request = None
+        if kind == "done":
+            if 'json' in tabs:
+                self.generate_json_output()
+            if on_ready is not None:
+                on_ready()
+        elif kind == "cancelled":
+            self.file_status.config(text="拡張解析をキャンセルしました")
+        else:
+            messagebox.showerror("エラー", f"拡張解析中にエラーが発生しました:\n{payload[0]}")
+
+    def cancel_analysis(self):
+        """実行中の解析ジョブをキャンセルする（現在のファイルの解析が終わった時点で止まる）"""
+        self.pending_analysis = None
+        if self.analysis_job is not None and not self.analysis_job.finished:
+            self.analysis_job.cancel()
+            if self.progress_window is not None:
+                self.progress_label.config(text="キャンセルしています...")
+
+    def show_progress_window(self, file_count):
+        """解析の進捗ウィンドウを表示する（モーダルにはせず、キャンセルボタンを付ける）"""
+        self.close_progress_window()
+        
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("解析中")
+        progress_window.geometry("420x150")
+        progress_window.transient(self.root)
+        progress_window.protocol("WM_DELETE_WINDOW", self.cancel_analysis)
+        
+        self.progress_label = ttk.Label(progress_window, text=f"ファイルを解析中... (0/{file_count})")
+        self.progress_label.pack(pady=10)
+        
+        self.progress_bar = ttk.Progressbar(progress_window, mode="determinate", maximum=100)
+        self.progress_bar.pack(fill="x", padx=20)
+        
+        self.progress_eta_label = ttk.Label(progress_window, text=format_eta(None))
+        self.progress_eta_label.pack(pady=5)
+        
+        cancel_button = ttk.Button(progress_window, text="キャンセル", command=self.cancel_analysis)
+        cancel_button.pack(pady=5)
         
-        # 拡張解析を実行
-        self.perform_extended_analysis(included_files)
+        # ウィンドウを中央に配置
+        progress_window.update_idletasks()
+        x = self.root.winfo_rootx() + (self.root.winfo_width() - progress_window.winfo_width()) // 2
+        y = self.root.winfo_rooty() + (self.root.winfo_height() - progress_window.winfo_height()) // 2
+        progress_window.geometry(f"+{x}+{y}")
+        
+        self.progress_window = progress_window
+
+    def update_progress_window(self, progress):
+        """進捗イベントの内容を進捗ウィンドウに反映する"""
+        if self.progress_window is None or self.analysis_job.cancelled:
+            return
+        total = progress['total']
+        self.progress_bar["value"] = (progress['done'] / total) * 100 if total else 100
+        self.progress_label.config(text=f"{progress['stage']}中... ({progress['done']}/{total}): {progress['current']}")
+        self.progress_eta_label.config(text=format_eta(progress['eta']))
+
+    def close_progress_window(self):
+        """進捗ウィンドウを閉じる"""
+        if self.progress_window is not None:
+            self.progress_window.destroy()
+            self.progress_window = None
+
+    def show_cache_stats(self):
+        """解析キャッシュのヒット/ミス数をステータスバーに追記する"""
+        if not self.analysis_cache.enabled:
+            return
+        stats_text = self.analysis_cache.get_stats_text()
+        print(stats_text)
+        status_text = self.file_status.cget("text")
+        self.file_status.config(text=f"{status_text}（{stats_text}）")
     
     def copy_to_clipboard(self):
         """解析結果とプロンプトをクリップボードにコピーする（選択されたタブに基づく）"""
@@ -4153,23 +3838,28 @@ class CodeAnalyzerApp:
         # 残りのタブを追加
         selected_tabs_ordered.extend(selected_tabs)
         
-        # 選択されたタブの内容を結合
-        combined_content = []
-        for tab_name in selected_tabs_ordered:
-            content = self.get_tab_content(tab_name)
-            if content:
-                if len(selected_tabs_ordered) > 1:  # 複数のタブが選択されている場合のみ見出しを追加
-                    combined_content.append(f"## {tab_name}\n{content}\n\n")
-                else:
-                    combined_content.append(content)
+        def copy():
+            # 選択されたタブの内容を結合
+            combined_content = []
+            for tab_name in selected_tabs_ordered:
+                content = self.get_tab_content(tab_name)
+                if content:
+                    if len(selected_tabs_ordered) > 1:  # 複数のタブが選択されている場合のみ見出しを追加
+                        combined_content.append(f"## {tab_name}\n{content}\n\n")
+                    else:
+                        combined_content.append(content)
+            
+            if combined_content:
+                # コンテンツを結合してクリップボードにコピー
+                clipboard_text = "".join(combined_content)
+                import pyperclip
+                pyperclip.copy(clipboard_text)
+                messagebox.showinfo("情報", "選択したタブの内容をクリップボードにコピーしました。")
+            else:
+                messagebox.showinfo("情報", "コピーする内容がありません。")
         
-        if combined_content:
-            # コンテンツを結合してクリップボードにコピー
-            clipboard_text = "".join(combined_content)
-            pyperclip.copy(clipboard_text)
-            messagebox.showinfo("情報", "選択したタブの内容をクリップボードにコピーしました。")
-        else:
-            messagebox.showinfo("情報", "コピーする内容がありません。")
+        # まだ作っていないタブがあれば、作ってからコピーする
+        self.ensure_tabs(self.lazy_tab_keys(selected_tabs_ordered), copy)
 
     def on_file_selected(self, file_path):
         """ツリービューでファイルが選択されたときのコールバック"""
@@ -4182,11 +3872,8 @@ class CodeAnalyzerApp:
         # 解析結果タブに切り替え
         self.tab_control.select(0)  # 最初のタブ（解析結果タブ）を選択
         
-        # ファイル内容を解析
-        self.analyze_file(file_path)
-        
-        # プロンプトテンプレートを更新
-        self.update_prompt_template(os.path.basename(file_path))
+        # ファイル内容を解析（完了後にプロンプトテンプレートを更新）
+        self.analyze_file(file_path, on_complete=lambda: self.update_prompt_template(os.path.basename(file_path)))
 
     def on_dir_selected(self, dir_path):
         """ツリービューでディレクトリが選択されたときのコールバック"""
@@ -4203,11 +3890,8 @@ class CodeAnalyzerApp:
         # 解析結果タブに切り替え
         self.tab_control.select(0)  # 最初のタブ（解析結果タブ）を選択
         
-        # ディレクトリ内のファイルを解析
-        self.analyze_directory(dir_path)
-        
-        # プロンプトテンプレートを更新
-        self.update_prompt_template(os.path.basename(dir_path))
+        # ディレクトリ内のファイルを解析（完了後にプロンプトテンプレートを更新）
+        self.analyze_directory(dir_path, on_complete=lambda: self.update_prompt_template(os.path.basename(dir_path)))
 
     def export_to_json(self):
         """解析結果をJSONファイルにエクスポート"""
@@ -4215,7 +3899,7 @@ class CodeAnalyzerApp:
         import simple_json_converter
         
         # 現在の解析結果を取得
-        result_text = self.result_text.get(1.0, "end-1c")
+        result_text = self.result_view.get_text()
         
         if not result_text.strip():
             messagebox.showinfo("情報", "JSONに変換する解析結果がありません。")
@@ -4238,81 +3922,65 @@ class CodeAnalyzerApp:
         if not file_path:
             return  # キャンセルされた場合
         
-        try:
-            # テキストをJSON構造に変換
-            json_data = simple_json_converter.text_to_json_structure(result_text)
-            
-            # 拡張解析タブの内容があれば追加
-            extended_text = self.extended_text.get(1.0, "end-1c")
-            if extended_text.strip():
-                json_data["extended_analysis"] = extended_text
-            
-            # JSONファイルとして保存
-            message = simple_json_converter.save_as_json(json_data, file_path)
-            messagebox.showinfo("情報", message)
-            
-        except Exception as e:
-            messagebox.showerror("エラー", f"JSONエクスポート中にエラーが発生しました: {str(e)}")
+        def export():
+            try:
+                # テキストをJSON構造に変換
+                json_data = simple_json_converter.text_to_json_structure(self.result_view.get_text())
+                
+                # 拡張解析タブの内容があれば追加（作れなかった場合は、タブの説明文を書き出さない）
+                extended_text = self.extended_view.get_text()
+                if extended_text.strip() and 'extended' not in self.stale_tabs:
+                    json_data["extended_analysis"] = extended_text
+                
+                # JSONファイルとして保存
+                message = simple_json_converter.save_as_json(json_data, file_path)
+                messagebox.showinfo("情報", message)
+                
+            except Exception as e:
+                messagebox.showerror("エラー", f"JSONエクスポート中にエラーが発生しました: {str(e)}")
+        
+        # 拡張解析をまだ実行していなければ、実行してから書き出す
+        self.ensure_tabs({'extended'}, export)
 
     def generate_json_output(self):
         """現在の解析結果からJSON出力を生成してJSONタブに表示する"""
         
         # 現在の解析結果を取得
-        result_text = self.result_text.get(1.0, "end-1c")
-        extended_text = self.extended_text.get(1.0, "end-1c")
+        result_text = self.result_view.get_text()
+        extended_text = self.extended_view.get_text()
         
         if not result_text.strip():
-            self.json_text.delete(1.0, tk.END)
-            self.json_text.insert(tk.END, "JSONに変換する解析結果がありません。")
+            self.json_view.set_text("JSONに変換する解析結果がありません。")
             return
         
         try:
-            # テキストをJSON構造に変換
-            json_data = self.text_to_json_structure(result_text)
-            
             # ディレクトリ構造をJSONの冒頭に追加
-            if self.selected_file:
+            if self.analysis_request is not None:
+                # 最後に解析したファイル（監視モードで追加・削除されたファイルも反映されている）
+                python_files = self.analysis_request[0]
+            elif self.selected_file:
                 # ファイルモードの場合は、そのファイルを含むディレクトリを取得
                 python_files = [self.selected_file]
             else:
                 # ディレクトリモードの場合は含まれるPythonファイルを取得
                 python_files = self.dir_tree_view.get_included_files(include_python_only=True)
             
-            # ディレクトリ構造を取得して行ごとの配列に変換
-            if python_files:
-                dir_structure_text = self.get_directory_structure(python_files)
-                dir_structure_lines = dir_structure_text.split('\n')
-                
-                # 既存のディレクトリ構造を上書き
-                json_data["directory_structure"] = dir_structure_lines
-            
-            # 拡張解析テキストがあれば追加
-            if extended_text.strip():
-                # LLM構造化データ部分を抽出して構造化
-                extended_data = self.extract_llm_structured_data(extended_text)
-                if extended_data:
-                    json_data["extended_analysis"] = extended_data
+            # テキストをJSON構造に変換（ディレクトリ構造と拡張解析のデータを含む）
+            json_data = self.project.build_json_output(result_text, extended_text, python_files)
             
             # JSON形式の文字列に変換して整形
             json_string = json.dumps(json_data, indent=2, ensure_ascii=False)
             
             # JSONタブに表示
-            self.json_text.delete(1.0, tk.END)
-            self.json_text.insert(tk.END, json_string)
+            self.json_view.set_text(json_string, keep_position=True)
+            self.stale_tabs.discard('json')
             
             # シンタックスハイライトを適用
             self.json_highlighter.highlight()
             
-            # 現在表示されているタブがJSONタブの場合のみ文字数を更新
-            current_tab_index = self.tab_control.index(self.tab_control.select())
-            if current_tab_index == 2:  # JSONタブ (JSONタブが3番目)
-                char_count = len(json_string)
-                self.char_count_label.config(text=f"文字数: {char_count}")
-            
         except Exception as e:
             traceback.print_exc()
-            self.json_text.delete(1.0, tk.END)
-            self.json_text.insert(tk.END, f"JSON変換中にエラーが発生しました: {str(e)}")
+            self.json_view.set_text(f"JSON変換中にエラーが発生しました: {str(e)}")
 
 class PromptManager:
     """プロンプトを管理するクラス"""
@@ -4450,8 +4118,12 @@ JSON構造化データは、astroidライブラリによって抽出された型
         return self.prompts
 
 def main():
+    startup_timer = StartupTimer()
+    startup_timer.mark("モジュールの読み込み")
+    
     try:
         # ThemedTkを使用して洗練されたテーマを適用
+        from ttkthemes import ThemedTk
         root = ThemedTk(theme="arc")  # 'arc'テーマを使用
     except Exception:
         # ThemedTkが利用できない場合は通常のTkを使用
@@ -4460,21 +4132,20 @@ def main():
                            "ttkthemesライブラリがインストールされていないため、デフォルトテーマを使用します。\n"
                            "pip install ttkthemes でインストールすると、より洗練されたUIになります。")
     
-    # 依存ライブラリのチェック
+    startup_timer.mark("ルートウィンドウの作成")
+    
+    # 依存ライブラリのチェック（起動を速くするため、ここでは読み込まずに有無だけを確認する）
     missing_libs = []
     
     # astroidライブラリのチェック
-    try:
-        
-        print(f"astroidライブラリが利用可能です: バージョン {astroid.__version__}")
-    except ImportError:
+    if importlib.util.find_spec("astroid") is not None:
+        print("astroidライブラリが利用可能です（拡張解析の初回実行時に読み込みます）")
+    else:
         missing_libs.append("astroid")
         print("astroidライブラリがインストールされていません。拡張解析機能は無効になります。")
     
     # PILライブラリのチェック
-    try:
-        from PIL import Image, ImageTk
-    except ImportError:
+    if importlib.util.find_spec("PIL") is None:
         missing_libs.append("Pillow")
         print("PILライブラリ (Pillow) がインストールされていません。テキストアイコンを使用します。")
     
@@ -4543,13 +4214,22 @@ def main():
         
         # アイコンパスの存在確認
         if icon_path and os.path.exists(icon_path):
-            # PILが利用可能な場合
             try:
-                from PIL import Image, ImageTk
-                icon_image = Image.open(icon_path)
-                icon_photo = ImageTk.PhotoImage(icon_image)
+                # Tk 8.6以降はPNGを直接読み込めるので、起動時にPILを読み込まずに済ませる
+                icon_photo = tk.PhotoImage(file=icon_path)
                 root.iconphoto(True, icon_photo)
                 print(f"アイコンを設定しました: {icon_path}")
+            except tk.TclError:
+                icon_photo = None
+            
+            # PILが利用可能な場合
+            try:
+                if icon_photo is None:
+                    from PIL import Image, ImageTk
+                    icon_image = Image.open(icon_path)
+                    icon_photo = ImageTk.PhotoImage(icon_image)
+                    root.iconphoto(True, icon_photo)
+                    print(f"アイコンを設定しました: {icon_path}")
             except ImportError:
                 # PILがない場合はiconbitmapを試す（.icoファイル用）
                 if icon_path.lower().endswith('.ico'):
@@ -4562,7 +4242,9 @@ def main():
     except Exception as e:
         print(f"アイコン設定エラー: {e}")
     
-    app = CodeAnalyzerApp(root)
+    startup_timer.mark("依存ライブラリの確認とアイコンの設定")
+    
+    app = CodeAnalyzerApp(root, startup_timer)
     root.mainloop()
 
 if __name__ == "__main__":
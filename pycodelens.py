@@ -0,0 +1,294 @@
+# pycodelens.py
+"""
+PyCodeLensのコマンドライン版（GUIなしで解析結果を出力する）
+
+使い方:
+    python pycodelens.py analyze <path> [--format text|json] [--extended] [--jobs N] [-o OUT]
+                                 [--inference off|annotations|full] [--exclude PATTERN] [--gitignore]
+                                 [--scan-workers N] [--watch] [--since REF [--with-importers]]
+    python pycodelens.py diff <path> <base> [<target>] [--format text|json] [-o OUT]
+
+tkinter・PIL・ttkthemes・pyperclipは読み込まないため、ディスプレイのないCI環境でも動作する
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+# プロジェクト内モジュール（GUI関連のモジュールは読み込まない）
+from analysis_cache import AnalysisCache
+from analysis_watchdog import DEFAULT_FILE_TIMEOUT, DEFAULT_MEMORY_LIMIT_MB
+from directory_scanner import DEFAULT_SCAN_WORKERS, is_included_file
+from exclusion_rules import IGNORE_FILE_NAME, ExclusionRules
+from file_watcher import FileWatcher
+from git_changes import GitError, select_changed_files
+from structure_diff import diff_revisions, diff_to_json, format_diff_text
+from code_analyzer import (
+    DEFAULT_FUNCTION_INFERENCE_NODES, DEFAULT_FUNCTION_INFERENCE_TIME, DEFAULT_INFERENCE_LEVEL,
+    DEFAULT_RUN_INFERENCE_TIME, INFERENCE_LEVELS, InferenceBudget, ProjectAnalyzer, collect_python_files
+)
+
+# 監視モードで変更を確かめる間隔（秒）
+WATCH_POLL_INTERVAL = 0.1
+
+
+def build_parser():
+    """コマンドライン引数の定義"""
+    parser = argparse.ArgumentParser(
+        prog="pycodelens",
+        description="Pythonコードを解析してLLM向けのコンテキストを出力します"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    analyze_parser = subparsers.add_parser("analyze", help="ファイルまたはディレクトリを解析する")
+    analyze_parser.add_argument("path", help="解析するPythonファイルまたはディレクトリ")
+    analyze_parser.add_argument("--format", choices=["text", "json"], default="text",
+                                help="出力形式（デフォルト: text）")
+    analyze_parser.add_argument("--extended", action="store_true",
+                                help="astroidによる拡張解析（型推論・依存関係・コールグラフ）も行う")
+    analyze_parser.add_argument("--jobs", type=int, default=1,
+                                help="並列解析のプロセス数（0ならCPU数、デフォルト: 1）")
+    analyze_parser.add_argument("-o", "--output", help="出力先ファイル（省略時は標準出力）")
+    analyze_parser.add_argument("--no-cache", action="store_true", help="解析キャッシュを使わない")
+    analyze_parser.add_argument("--inference", choices=INFERENCE_LEVELS, default=DEFAULT_INFERENCE_LEVEL,
+                                help="拡張解析の型推論（off: なし / annotations: 型アノテーションのみ / full: 推論も行う、"
+                                     f"デフォルト: {DEFAULT_INFERENCE_LEVEL}）")
+    analyze_parser.add_argument("--inference-timeout", type=float, default=DEFAULT_FUNCTION_INFERENCE_TIME,
+                                help="1関数あたりの型推論の上限秒数（0なら無制限、"
+                                     f"デフォルト: {DEFAULT_FUNCTION_INFERENCE_TIME}）")
+    analyze_parser.add_argument("--inference-max-nodes", type=int, default=DEFAULT_FUNCTION_INFERENCE_NODES,
+                                help="1関数あたりの推論ノード数の上限（0なら無制限、"
+                                     f"デフォルト: {DEFAULT_FUNCTION_INFERENCE_NODES}）")
+    analyze_parser.add_argument("--inference-total-timeout", type=float, default=DEFAULT_RUN_INFERENCE_TIME,
+                                help="解析全体の型推論の上限秒数（超えた後の関数は推論しない、0なら無制限、"
+                                     f"デフォルト: {DEFAULT_RUN_INFERENCE_TIME}）")
+    analyze_parser.add_argument("--file-timeout", type=float, default=DEFAULT_FILE_TIMEOUT,
+                                help="拡張解析で1ファイルにかけられる秒数（超えたファイルはスキップ、0なら無制限、"
+                                     f"デフォルト: {DEFAULT_FILE_TIMEOUT}）")
+    analyze_parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                                help="拡張解析のワーカープロセスが使えるメモリ（MB、超えたファイルはスキップ、"
+                                     f"0なら無制限、デフォルト: {DEFAULT_MEMORY_LIMIT_MB}）")
+    analyze_parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                                help="除外するパス（ルートからの相対パス、.gitignoreと同じ書式のグロブも可、複数指定可。"
+                                     f"ルートの{IGNORE_FILE_NAME}も常に読み込む）")
+    analyze_parser.add_argument("--gitignore", action="store_true",
+                                help="ルートの.gitignoreのパターンも除外に使う")
+    analyze_parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS,
+                                help="ディレクトリを読むスレッド数（ネットワークドライブなどで増やす、0ならCPU数、"
+                                     f"デフォルト: {DEFAULT_SCAN_WORKERS}）")
+    analyze_parser.add_argument("--watch", action="store_true",
+                                help="解析後もファイルの変更を監視し、変更されたファイルだけを解析し直して出力ファイルを更新する"
+                                     "（-oが必要、Ctrl+Cで終了）")
+    analyze_parser.add_argument("--since", metavar="REF",
+                                help="gitのREF（ブランチならHEADとの分岐点）から変更されたファイルだけを解析する"
+                                     "（ディレクトリは走査せずgitの出力から選び、除外ルールは通常どおり適用する）")
+    analyze_parser.add_argument("--with-importers", action="store_true",
+                                help="--sinceで、変更されたモジュールを直接インポートしているファイルも解析する")
+
+    diff_parser = subparsers.add_parser("diff", help="gitの2つのリビジョンの構造の差分を出力する（チェックアウトしない）")
+    diff_parser.add_argument("path", help="比べるディレクトリ（gitの作業ツリー内）")
+    diff_parser.add_argument("base", help="比べる元のリビジョン（ブランチ・タグ・コミット）")
+    diff_parser.add_argument("target", nargs="?", default="HEAD", help="比べる先のリビジョン（デフォルト: HEAD）")
+    diff_parser.add_argument("--format", choices=["text", "json"], default="text",
+                             help="出力形式（デフォルト: text）")
+    diff_parser.add_argument("-o", "--output", help="出力先ファイル（省略時は標準出力）")
+    diff_parser.add_argument("--no-cache", action="store_true", help="解析キャッシュを使わない")
+    diff_parser.add_argument("--inference", choices=INFERENCE_LEVELS, default=DEFAULT_INFERENCE_LEVEL,
+                             help=f"戻り値の型推論のレベル（デフォルト: {DEFAULT_INFERENCE_LEVEL}）")
+    diff_parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                             help="比べないパス（analyzeの--excludeと同じ書式、複数指定可）")
+    diff_parser.add_argument("--gitignore", action="store_true",
+                             help="ルートの.gitignoreのパターンも除外に使う")
+    return parser
+
+
+def format_text(result, extended):
+    """テキスト形式の出力を作る（拡張解析がある場合はタブのコピーと同じ見出しで区切る）"""
+    if not extended:
+        return result.strip() + "\n"
+    return f"## 解析結果\n{result.strip()}\n\n## 拡張解析\n{extended.strip()}\n"
+
+
+def build_output(project, python_files, args, single_file):
+    """解析を実行して出力する文字列を作る（解析中のメッセージは標準エラーに出す）"""
+    with contextlib.redirect_stdout(sys.stderr):
+        result, _ = project.analyze_basic(python_files, single_file=single_file)
+        extended = project.build_extended_report(python_files) if args.extended else ""
+        json_data = project.build_json_output(result, extended, python_files) if args.format == "json" else None
+
+    if json_data is not None:
+        return json.dumps(json_data, indent=2, ensure_ascii=False) + "\n"
+    return format_text(result, extended)
+
+
+def write_output(path, output):
+    """出力ファイルを書き換える（一時ファイルに書いてから置き換えるので、読む側が書きかけの内容を見ることはない）"""
+    output_dir = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".pycodelens-", suffix=".tmp", dir=output_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(output)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def watch_and_update(project, python_files, args, path, rules):
+    """ファイルの変更を監視し、変更されたファイルだけを解析し直して出力ファイルを更新する（Ctrl+Cで終了）"""
+    single_file = os.path.isfile(path)
+    root = os.path.dirname(path) if single_file else path
+    watcher = FileWatcher(root, python_files, rules, track_new=not single_file)
+    print(f"変更を監視しています（{watcher.backend.name}、Ctrl+Cで終了）: {root}", file=sys.stderr)
+    try:
+        while True:
+            changes = watcher.poll()
+            if not changes:
+                time.sleep(WATCH_POLL_INTERVAL)
+                continue
+
+            start = time.perf_counter()
+            # 削除されたファイルを外し、追加されたファイルを後ろに加える（残りの順序は変えない）
+            python_files = [f for f in python_files if f not in changes.deleted]
+            python_files.extend(sorted(changes.added))
+            project.refresh(changes.paths())
+            if not python_files:
+                print("解析対象のPythonファイルがなくなりました。", file=sys.stderr)
+                continue
+
+            try:
+                write_output(args.output, build_output(project, python_files, args, single_file))
+            except OSError as e:
+                print(f"エラー: 出力ファイルに書き込めません: {e}", file=sys.stderr)
+                continue
+            print(f"更新: 変更 {len(changes.changed)} / 追加 {len(changes.added)} / 削除 {len(changes.deleted)} "
+                  f"個のファイルを解析し直しました（{time.perf_counter() - start:.2f}秒）", file=sys.stderr)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+
+
+def run_analyze(args):
+    """analyzeコマンドを実行する"""
+    path = os.path.abspath(args.path)
+    if not os.path.exists(path):
+        print(f"エラー: パスが見つかりません: {args.path}", file=sys.stderr)
+        return 2
+    if args.watch and not args.output:
+        print("エラー: --watch には出力先ファイル（-o）を指定してください。", file=sys.stderr)
+        return 2
+    if args.with_importers and not args.since:
+        print("エラー: --with-importers は --since と一緒に指定してください。", file=sys.stderr)
+        return 2
+    if args.since and not os.path.isdir(path):
+        print("エラー: --since にはgitの作業ツリー内のディレクトリを指定してください。", file=sys.stderr)
+        return 2
+
+    rules = None
+    if os.path.isdir(path):
+        rules = ExclusionRules.from_directory(path, args.exclude, use_gitignore=args.gitignore)
+    if args.since:
+        # 変更されたファイルはgitから求め、ディレクトリを走査したときと同じ規則で絞り込む
+        listings = {}
+        try:
+            python_files = select_changed_files(
+                path, args.since, args.with_importers,
+                lambda file_path: is_included_file(path, file_path, rules, listings=listings)
+            )
+        except GitError as e:
+            print(f"エラー: {e}", file=sys.stderr)
+            return 2
+        if not python_files:
+            print(f"{args.since} から変更されたPythonファイルはありません。", file=sys.stderr)
+            return 0
+    else:
+        scan_workers = args.scan_workers if args.scan_workers > 0 else (os.cpu_count() or 1)
+        python_files = collect_python_files(path, rules=rules, workers=scan_workers)
+    if not python_files:
+        print("エラー: 解析対象のPythonファイルがありません。", file=sys.stderr)
+        return 1
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    inference = InferenceBudget(args.inference, args.inference_timeout,
+                                args.inference_max_nodes, args.inference_total_timeout)
+    project = ProjectAnalyzer(AnalysisCache(enabled=not args.no_cache), jobs, inference,
+                              args.file_timeout, args.memory_limit)
+
+    # 解析中のメッセージは標準エラーに出し、標準出力には結果だけを書く
+    try:
+        project.load(python_files)
+        output = build_output(project, python_files, args, os.path.isfile(path))
+
+        if not args.output:
+            sys.stdout.write(output)
+            return 0
+        try:
+            write_output(args.output, output)
+        except OSError as e:
+            print(f"エラー: 出力ファイルに書き込めません: {e}", file=sys.stderr)
+            return 1
+        print(f"{len(python_files)} 個のPythonファイルを解析しました: {args.output}", file=sys.stderr)
+
+        if args.watch:
+            return watch_and_update(project, python_files, args, path, rules)
+        return 0
+    finally:
+        project.shutdown()
+
+
+def run_diff(args):
+    """diffコマンドを実行する"""
+    path = os.path.abspath(args.path)
+    if not os.path.isdir(path):
+        print(f"エラー: ディレクトリが見つかりません: {args.path}", file=sys.stderr)
+        return 2
+
+    rules = ExclusionRules.from_directory(path, args.exclude, use_gitignore=args.gitignore)
+    project = ProjectAnalyzer(AnalysisCache(enabled=not args.no_cache), inference=InferenceBudget(args.inference))
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = diff_revisions(project, path, args.base, args.target, rules)
+    except GitError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 2
+    finally:
+        project.shutdown()
+
+    if args.format == "json":
+        output = json.dumps(diff_to_json(result), indent=2, ensure_ascii=False) + "\n"
+    else:
+        output = format_diff_text(result)
+
+    if args.output:
+        try:
+            write_output(args.output, output)
+        except OSError as e:
+            print(f"エラー: 出力ファイルに書き込めません: {e}", file=sys.stderr)
+            return 1
+        print(f"{len(result['files'])} 個のファイルの構造の差分を出力しました: {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(output)
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "analyze":
+        return run_analyze(args)
+    if args.command == "diff":
+        return run_diff(args)
+    parser.print_help()
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
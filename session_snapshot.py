@@ -0,0 +1,110 @@
+# session_snapshot.py
+
+import os
+import pickle
+import tempfile
+import zlib
+from importlib import metadata
+
+from code_analyzer import AstroidAnalyzer, CodeAnalyzer
+from file_watcher import FileChanges, file_signature
+
+# 前回のセッションのスナップショットのファイル名（設定ファイルと同じディレクトリに置く）
+SESSION_FILE_NAME = "last_session.snapshot"
+
+# スナップショットの形式を変えたら上げる（古いスナップショットは読み込まない）
+SESSION_FORMAT = 3
+
+# ファイルの先頭に置く目印
+_MAGIC = b"PYCODELENS-SESSION\n"
+
+# zlibの圧縮レベル（終了時に書き込むので、最高レベルにはせず速さとの釣り合いをとる）
+COMPRESS_LEVEL = 6
+
+
+def analysis_versions(project):
+    """スナップショットの解析結果をそのまま使えるか判断するための、解析のバージョンと型推論の設定"""
+    # astroid自体は読み込まずにバージョンだけを調べる（起動を遅くしないため）
+    try:
+        astroid_version = metadata.version("astroid")
+    except metadata.PackageNotFoundError:
+        astroid_version = None
+    return (SESSION_FORMAT, CodeAnalyzer.CACHE_VERSION, AstroidAnalyzer.CACHE_VERSION, astroid_version,
+            project.astroid_analyzer.inference.cache_token())
+
+
+def save_session(path, state):
+    """
+    セッションの状態をpickleしてzlibで圧縮し、pathに書き込む（書き込んだバイト数を返す）
+    途中で失敗しても前回のスナップショットが壊れないよう、一時ファイルに書いてから置き換える
+    """
+    data = _MAGIC + zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".session-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+def load_session(path):
+    """save_sessionで書き込んだ状態を読み込む（なければ、または読めなければNone）"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        print(f"セッションのスナップショットを読み込めません: {e}")
+        return None
+    if not data.startswith(_MAGIC):
+        print(f"セッションのスナップショットの形式が違います: {path}")
+        return None
+    try:
+        state = pickle.loads(zlib.decompress(data[len(_MAGIC):]))
+    except Exception as e:
+        print(f"セッションのスナップショットが壊れています: {e}")
+        return None
+    if not isinstance(state, dict) or state.get('format') != SESSION_FORMAT:
+        return None
+    return state
+
+
+def remove_session(path):
+    """スナップショットを削除する（なければ何もしない）"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"セッションのスナップショットを削除できません: {e}")
+
+
+def find_changed_files(python_files, sources, current_files=None):
+    """
+    スナップショットを取ったときから変更・追加・削除されたファイルを、更新時刻とサイズで調べる（内容は読まない）
+    sourcesはAnalysisPipeline.export_stateの結果。そこにないファイル（読み込めなかったファイル）は変更されたものとして扱う
+    current_filesは今の解析対象のファイルの一覧（ディレクトリを解析した場合）。python_filesにないものは追加、
+    current_filesにないもの（削除されたか、除外されるようになったファイル）は削除されたものとして扱う
+    """
+    changes = FileChanges()
+    current = None if current_files is None else set(current_files)
+    for path in python_files:
+        if current is not None and path not in current:
+            changes.deleted.add(path)
+            continue
+        signature = file_signature(path)
+        if signature is None:
+            changes.deleted.add(path)
+        elif path not in sources or sources[path]['signature'] != signature:
+            changes.changed.add(path)
+    if current is not None:
+        changes.added.update(current.difference(python_files))
+    return changes
@@ -0,0 +1,208 @@
+# structure_diff.py
+
+import os
+
+from code_analyzer import SourceFile
+from directory_scanner import SKIP_FOLDERS, tree_order_key
+from git_changes import GitBlobReader, find_git_root, list_revision_python_files
+
+
+def _signature(info, owner=None):
+    """関数・メソッドの解析結果からシグネチャの文字列を作る"""
+    params = []
+    for param in info.get('parameters', []):
+        params.append(f"{param['name']}: {param['type']}" if param.get('type') else param['name'])
+    name = f"{owner}.{info['name']}" if owner else info['name']
+    return_type = info.get('return_type')
+    ret = f" -> {return_type}" if return_type and return_type != "unknown" else ""
+    return f"{name}({', '.join(params)}){ret}"
+
+
+def _split_imports(imports):
+    """基本解析のインポート文（from X import a, b）を名前ごとに分ける"""
+    names = set()
+    for statement in imports:
+        if statement.startswith("from ") and " import " in statement:
+            head, _, imported = statement.partition(" import ")
+            names.update(f"{head} import {name.strip()}" for name in imported.split(","))
+        else:
+            names.add(statement)
+    return names
+
+
+def file_structure(project, code, rel_path):
+    """
+    1ファイルの内容を解析して、比較に使う構造を返す（構文エラーならNone）
+    {'symbols': {名前: シグネチャ}, 'imports': インポートの集合, 'calls': (呼び出し元, 呼び出し先)の集合}
+    """
+    source = SourceFile(rel_path, code=code)
+    if source.get_ast_tree() is None:
+        return None
+
+    # 基本解析（インポート）
+    project.analyzer.analyze_code(code, source.name, source=source)
+    imports = _split_imports(project.analyzer.imports)
+
+    # 拡張解析（クラス・関数・シグネチャ）とコールグラフ
+    # 同じ関数でも呼び出し先がリビジョンごとに違いうるので、前のファイル・リビジョンの型推論の結果は使わない
+    project.astroid_analyzer.clear_inference_cache()
+    project.astroid_analyzer.analyze_code(code, source.name, source=source)
+    symbols = {}
+    for cls in project.astroid_analyzer.classes:
+        bases = f"({', '.join(cls['base_classes'])})" if cls.get('base_classes') else ""
+        symbols[cls['name']] = f"class {cls['name']}{bases}"
+        for method in cls['methods']:
+            symbols[f"{cls['name']}.{method['name']}"] = _signature(method, cls['name'])
+    for func in project.astroid_analyzer.functions:
+        symbols[func['name']] = _signature(func)
+
+    _, edges = project.astroid_analyzer.get_module_call_info(source, source.module_name)
+    calls = {(caller, callee) for caller, callees in edges.items() for callee in callees}
+    return {'symbols': symbols, 'imports': imports, 'calls': calls}
+
+
+def diff_structures(before, after):
+    """2つの構造の差分（変化がなければNone）"""
+    before = before or {'symbols': {}, 'imports': set(), 'calls': set()}
+    after = after or {'symbols': {}, 'imports': set(), 'calls': set()}
+    old_symbols, new_symbols = before['symbols'], after['symbols']
+    delta = {
+        'added': sorted(new_symbols[name] for name in new_symbols.keys() - old_symbols.keys()),
+        'removed': sorted(old_symbols[name] for name in old_symbols.keys() - new_symbols.keys()),
+        'changed': sorted(
+            (old_symbols[name], new_symbols[name]) for name in old_symbols.keys() & new_symbols.keys()
+            if old_symbols[name] != new_symbols[name]
+        ),
+        'imports_added': sorted(after['imports'] - before['imports']),
+        'imports_removed': sorted(before['imports'] - after['imports']),
+        'calls_gained': sorted(after['calls'] - before['calls']),
+        'calls_lost': sorted(before['calls'] - after['calls'])
+    }
+    if not any(delta.values()):
+        return None
+    return delta
+
+
+def diff_revisions(project, path, base, target="HEAD", rules=None):
+    """
+    gitの2つのリビジョンで、path以下のPythonファイルの構造（クラス・関数・シグネチャ・インポート・呼び出し関係）を比べる
+    どちらもチェックアウトせず、内容の違うファイルだけを1つの git cat-file --batch で読み出して解析する
+    rules（pathからの相対パスに対するExclusionRules）に一致するファイルとスキップするフォルダの中は比べない
+    """
+    path = os.path.normpath(os.path.abspath(path))
+    git_root = find_git_root(path)
+    old_files = list_revision_python_files(git_root, base, path)
+    new_files = list_revision_python_files(git_root, target, path)
+
+    def included(git_path):
+        rel_path = os.path.relpath(os.path.join(git_root, git_path), path).replace(os.sep, "/")
+        if any(part in SKIP_FOLDERS for part in rel_path.split("/")[:-1]):
+            return False
+        return not (rules and rules.is_excluded(rel_path, False))
+
+    # blobのIDが同じファイルは内容も同じなので解析しない
+    paths = [p for p in old_files.keys() | new_files.keys()
+             if old_files.get(p) != new_files.get(p) and included(p)]
+    paths.sort(key=lambda p: tree_order_key(os.path.relpath(os.path.join(git_root, p), path)))
+
+    result = {
+        'base': base,
+        'target': target,
+        'files': [],
+        'unchanged_structure': 0,
+        'errors': []
+    }
+    project.astroid_analyzer.inference.start_run()
+    with GitBlobReader(git_root) as reader:
+        for git_path in paths:
+            structures = []
+            status = "modified"
+            failed = False
+            for revision, files in ((base, old_files), (target, new_files)):
+                object_id = files.get(git_path)
+                if object_id is None:
+                    status = "added" if files is old_files else "removed"
+                    structures.append(None)
+                    continue
+                try:
+                    code = reader.read(object_id).decode("utf-8")
+                except UnicodeDecodeError as e:
+                    result['errors'].append((git_path, f"{revision}: 読み込みエラー: {e}"))
+                    failed = True
+                    break
+                structure = file_structure(project, code, git_path)
+                if structure is None:
+                    result['errors'].append((git_path, f"{revision}: 構文エラー"))
+                    failed = True
+                    break
+                structures.append(structure)
+
+            # どちらかを解析できなければ、空の構造と比べた誤った差分を出さない
+            if failed:
+                continue
+            delta = diff_structures(*structures)
+            if delta is None:
+                result['unchanged_structure'] += 1
+                continue
+            delta['path'] = git_path
+            delta['status'] = status
+            result['files'].append(delta)
+    return result
+
+
+def format_diff_text(result):
+    """差分をLLMに渡しやすいコンパクトなテキストにする"""
+    status_labels = {'added': "追加", 'removed': "削除", 'modified': "変更"}
+    text = f"# 構造の差分: {result['base']}..{result['target']}\n"
+    text += (f"構造が変わったファイル: {len(result['files'])} 個"
+             f"（内容のみ変わったファイル: {result['unchanged_structure']} 個）\n")
+
+    for delta in result['files']:
+        text += f"\n## {delta['path']} ({status_labels[delta['status']]})\n"
+        for signature in delta['added']:
+            text += f"+ {signature}\n"
+        for signature in delta['removed']:
+            text += f"- {signature}\n"
+        for old, new in delta['changed']:
+            text += f"~ {old} => {new}\n"
+        for statement in delta['imports_added']:
+            text += f"+ {statement}\n"
+        for statement in delta['imports_removed']:
+            text += f"- {statement}\n"
+        for caller, callee in delta['calls_gained']:
+            text += f"+ {caller} -> {callee}\n"
+        for caller, callee in delta['calls_lost']:
+            text += f"- {caller} -> {callee}\n"
+
+    if result['errors']:
+        text += "\n# 解析できなかったファイル\n"
+        for git_path, reason in result['errors']:
+            text += f"{git_path}: {reason}\n"
+    return text
+
+
+def diff_to_json(result):
+    """差分をJSON出力用のデータにする"""
+    return {
+        "base": result['base'],
+        "target": result['target'],
+        "unchanged_structure": result['unchanged_structure'],
+        "files": [
+            {
+                "path": delta['path'],
+                "status": delta['status'],
+                "symbols": {
+                    "added": delta['added'],
+                    "removed": delta['removed'],
+                    "changed": [{"before": old, "after": new} for old, new in delta['changed']]
+                },
+                "imports": {"added": delta['imports_added'], "removed": delta['imports_removed']},
+                "calls": {
+                    "gained": [f"{caller} -> {callee}" for caller, callee in delta['calls_gained']],
+                    "lost": [f"{caller} -> {callee}" for caller, callee in delta['calls_lost']]
+                }
+            }
+            for delta in result['files']
+        ],
+        "errors": [{"path": git_path, "reason": reason} for git_path, reason in result['errors']]
+    }
@@ -0,0 +1,144 @@
+# syntax_lexer.py
+
+import bisect
+import re
+
+
+class LexResult:
+    """
+    lexの結果
+    tokens: (タグ, 開始行, 開始列, 終了行, 終了列) のリスト（テキストの中の順）
+    open_lines: 行末が複数行にわたるトークンの途中にある行の (行, 状態) のリスト
+    end_state: 最後の行の行末の状態（次の行のlexに渡す。トークンの途中でなければNone）
+    """
+    def __init__(self, tokens, open_lines, end_state):
+        self.tokens = tokens
+        self.open_lines = open_lines
+        self.end_state = end_state
+
+
+class _LineIndex:
+    """テキストの中の文字位置を (行, 列) に直す（行の先頭の位置を二分探索する）"""
+    def __init__(self, text, first_line):
+        self.first_line = first_line
+        self.starts = [0]
+        position = text.find("\n")
+        while position != -1:
+            self.starts.append(position + 1)
+            position = text.find("\n", position + 1)
+        self.last_line = first_line + len(self.starts) - 1
+
+    def line(self, offset):
+        return self.first_line + bisect.bisect_right(self.starts, offset) - 1
+
+    def position(self, offset):
+        index = bisect.bisect_right(self.starts, offset) - 1
+        return self.first_line + index, offset - self.starts[index]
+
+
+class PythonLexer:
+    """
+    Pythonコードのlexer（すべての規則を1つの正規表現にまとめ、テキストを1回だけ走査する）
+    三重引用符の文字列は複数行にわたるので、その引用符を行末の状態として次の行に引き継ぐ
+    """
+    name = "python"
+    TAGS = ('keywords', 'builtins', 'strings', 'comments', 'functions', 'classes', 'docstrings')
+    STATES = ('"""', "'''")
+
+    KEYWORDS = ['and', 'as', 'assert', 'break', 'class', 'continue', 'def',
+                'del', 'elif', 'else', 'except', 'False', 'finally', 'for',
+                'from', 'global', 'if', 'import', 'in', 'is', 'lambda', 'None',
+                'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'True',
+                'try', 'while', 'with', 'yield']
+
+    BUILTINS = ['abs', 'all', 'any', 'ascii', 'bin', 'bool', 'bytearray',
+                'bytes', 'callable', 'chr', 'classmethod', 'compile', 'complex',
+                'delattr', 'dict', 'dir', 'divmod', 'enumerate', 'eval', 'exec',
+                'filter', 'float', 'format', 'frozenset', 'getattr', 'globals',
+                'hasattr', 'hash', 'help', 'hex', 'id', 'input', 'int', 'isinstance',
+                'issubclass', 'iter', 'len', 'list', 'locals', 'map', 'max', 'memoryview',
+                'min', 'next', 'object', 'oct', 'open', 'ord', 'pow', 'print', 'property',
+                'range', 'repr', 'reversed', 'round', 'set', 'setattr', 'slice', 'sorted',
+                'staticmethod', 'str', 'sum', 'super', 'tuple', 'type', 'vars', 'zip']
+
+    def __init__(self):
+        # 先に一致したものを優先する。三重引用符の文字列は、閉じていなければテキストの終わりまでとする
+        self.pattern = re.compile(
+            r'(?P<comments>#[^\n]*)'
+            r'|(?P<docstrings>"""[\s\S]*?(?:"""|\Z)|\'\'\'[\s\S]*?(?:\'\'\'|\Z))'
+            r'|(?P<strings>"[^"\\\n]*(?:\\.[^"\\\n]*)*"|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\')'
+            r'|\b(?P<definition>class|def)[ \t]+(?P<name>\w+)'
+            r'|\b(?P<keywords>' + '|'.join(self.KEYWORDS) + r')\b'
+            r'|\b(?P<builtins>' + '|'.join(self.BUILTINS) + r')\b'
+        )
+
+    def lex(self, text, first_line=1, state=None):
+        """
+        textをトークンに分ける（textはfirst_line行目から始まる行の並び）
+        stateは前の行の行末の状態（前の行が三重引用符の文字列の途中なら、その引用符）
+        """
+        lines = _LineIndex(text, first_line)
+        tokens = []
+        open_lines = []
+
+        def add(tag, start, end):
+            tokens.append((tag, *lines.position(start), *lines.position(end)))
+
+        def add_string(start, end, quote, closed):
+            # 閉じていない文字列は最後の行の改行も含める（次の行の先頭まで）
+            if closed:
+                add('docstrings', start, end)
+            else:
+                tokens.append(('docstrings', *lines.position(start), lines.last_line + 1, 0))
+            last = lines.line(end) if closed else lines.last_line + 1
+            open_lines.extend((line, quote) for line in range(lines.line(start), last))
+            return None if closed else quote
+
+        # 前の行から続く三重引用符の文字列
+        position = 0
+        end_state = None
+        if state is not None:
+            close = text.find(state)
+            if close == -1:
+                end_state = add_string(0, len(text), state, False)
+                position = len(text)
+            else:
+                add_string(0, close + 3, state, True)
+                position = close + 3
+
+        for match in self.pattern.finditer(text, position):
+            kind = match.lastgroup
+            if kind == 'name':
+                add('keywords', match.start('definition'), match.end('definition'))
+                add('classes' if match.group('definition') == 'class' else 'functions',
+                    match.start('name'), match.end('name'))
+            elif kind == 'docstrings':
+                token = match.group()
+                quote = token[:3]
+                end_state = add_string(match.start(), match.end(), quote,
+                                       len(token) >= 6 and token.endswith(quote))
+            else:
+                add(kind, match.start(), match.end())
+        return LexResult(tokens, open_lines, end_state)
+
+
+class JsonLexer:
+    """JSONのlexer（キー・文字列・数値・true/false/null。複数行にわたるトークンはない）"""
+    name = "json"
+    TAGS = ('keys', 'strings', 'numbers', 'constants')
+    STATES = ()
+
+    def __init__(self):
+        self.pattern = re.compile(
+            r'(?P<keys>"[^"\\\n]*(?:\\.[^"\\\n]*)*"(?=[ \t]*:))'
+            r'|(?P<strings>"[^"\\\n]*(?:\\.[^"\\\n]*)*")'
+            r'|(?P<numbers>(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.]))'
+            r'|\b(?P<constants>true|false|null)\b'
+        )
+
+    def lex(self, text, first_line=1, state=None):
+        """textをトークンに分ける（stateはPythonLexerと形をそろえるためのもので、使わない）"""
+        lines = _LineIndex(text, first_line)
+        tokens = [(match.lastgroup, *lines.position(match.start()), *lines.position(match.end()))
+                  for match in self.pattern.finditer(text)]
+        return LexResult(tokens, [], None)